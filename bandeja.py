@@ -0,0 +1,209 @@
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Callable
+
+import pandas as pd
+
+import config
+
+
+def normalizar_ciclos(raw: list[dict]) -> list[dict]:
+    """Normaliza las filas de ciclo_ejecucion al esquema interno (ventana_inicio/fin desde fecha+hora)"""
+    ciclos = []
+    for row in raw:
+        try:
+            vi = datetime.strptime(f"{row['fecha']}T{row['hora']}", "%Y-%m-%dT%H:%M:%S")
+        except Exception:
+            try:
+                vi = datetime.strptime(f"{row['fecha']}T{row['hora']}", "%Y-%m-%dT%H:%M")
+            except Exception:
+                vi = datetime.now(config.TIMEZONE).replace(tzinfo=None)
+        vf = vi + timedelta(hours=1)
+        ciclos.append({
+            "ciclo_id":       row["ciclo_id"],
+            "banco_codigo":   row["banco_codigo"],
+            "ventana_inicio": vi.strftime("%Y-%m-%dT%H:%M:%S"),
+            "ventana_fin":    vf.strftime("%Y-%m-%dT%H:%M:%S"),
+            "cuenta_origen":  row.get("cuenta"),
+            "estado":         row["estado"],
+            "created_at":     row["created_at"],
+        })
+    return ciclos
+
+
+def tabla_ciclos(ciclos: list[dict], ahora: datetime) -> pd.DataFrame:
+    """Ciclos como tabla para la vista compacta, ordenados por urgencia (cálculo vectorizado).
+
+    `ahora` debe venir con zona horaria; las ventanas se interpretan en config.TIMEZONE y
+    created_at en UTC si no trae zona.
+    """
+    df = pd.DataFrame(ciclos, columns=["ciclo_id", "banco_codigo", "ventana_inicio", "ventana_fin",
+                                       "cuenta_origen", "created_at"])
+    inicio = pd.to_datetime(df["ventana_inicio"], errors="coerce")
+    fin = pd.to_datetime(df["ventana_fin"], errors="coerce").dt.tz_localize(config.TIMEZONE, ambiguous="NaT",
+                                                                            nonexistent="NaT")
+    creado = pd.to_datetime(df["created_at"], errors="coerce", utc=True, format="ISO8601")
+    restante = (fin - ahora).dt.total_seconds().clip(lower=0).fillna(0)
+    minutos = ((ahora - creado).dt.total_seconds() // 60)
+    detectado = minutos.map(lambda m: "?" if pd.isna(m) else f"{int(m)} min" if m < 60 else f"{int(m) // 60}h {int(m) % 60}min")
+    tabla = pd.DataFrame({
+        "ciclo_id":       df["ciclo_id"],
+        "Banco":          df["banco_codigo"],
+        "Cuenta":         df["cuenta_origen"].fillna("—"),
+        "Monitoreo":      inicio.dt.strftime("%H:%M").fillna("?"),
+        "Detectado hace": detectado,
+        "Restante":       (restante // 60).astype(int).astype(str).str.zfill(2) + ":"
+                          + (restante % 60).astype(int).astype(str).str.zfill(2),
+        "segundos":       restante,
+    })
+    return tabla.sort_values(["segundos", "ciclo_id"], kind="stable").reset_index(drop=True)
+
+
+COLUMNAS_CICLO: str = "ciclo_id,banco_codigo,fecha,hora,cuenta,estado,created_at"
+
+
+def _literal(valor) -> str:
+    """Valor entre comillas para filtros or= de PostgREST"""
+    return '"' + str(valor).replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+
+def params_pagina(marca: tuple[str, str] | None, limite: int, columna: str,
+                  solo_fallidos: bool = True) -> dict:
+    """Página de ciclos posteriores a la marca (valor de `columna`, ciclo_id), en orden estable.
+    Con `solo_fallidos=False` trae cualquier estado (para ver también los que salieron de FALLIDO)."""
+    params = {
+        "select": COLUMNAS_CICLO if columna in COLUMNAS_CICLO.split(",") else f"{COLUMNAS_CICLO},{columna}",
+        "order":  f"{columna}.asc,ciclo_id.asc",
+        "limit":  str(limite),
+    }
+    if solo_fallidos:
+        params["estado"] = "eq.FALLIDO"
+    if marca is not None:
+        valor, ciclo_id = marca
+        params["or"] = (f"({columna}.gt.{_literal(valor)},"
+                        f"and({columna}.eq.{_literal(valor)},ciclo_id.gt.{_literal(ciclo_id)}))")
+    return params
+
+
+def params_ultimo_cambio(columna: str) -> dict:
+    """La fila cambiada más recientemente, en cualquier estado (marca de partida tras una recarga)"""
+    return {"select": f"ciclo_id,{columna}", "order": f"{columna}.desc,ciclo_id.desc", "limit": "1"}
+
+
+class BandejaFallos:
+    """Instantánea de los ciclos FALLIDO compartida por todas las sesiones del servidor.
+
+    Un único hilo en segundo plano consulta Supabase cada `intervalo_segundos` y reemplaza la
+    instantánea; las sesiones solo la leen. Si nadie abrió la bandeja en `inactividad_segundos`
+    el hilo deja de consultar hasta la próxima lectura.
+
+    Con `columna_cambio` (columna de último cambio de ciclo_ejecucion, p. ej. updated_at) la
+    consulta es incremental: guarda un índice por ciclo_id y la marca (columna_cambio,
+    ciclo_id) del último cambio visto, y cada refresco trae solo las filas que cambiaron
+    después, en cualquier estado: las FALLIDO entran o se actualizan en el índice y el resto
+    sale. El costo sigue a la cantidad de cambios y no al tamaño de la bandeja. Cada
+    `resincronizar_cada` refrescos se recarga todo (filas borradas). Sin `columna_cambio`
+    cada refresco recarga todos los FALLIDO.
+    `consultar(params)` hace el GET a ciclo_ejecucion con esos parámetros de PostgREST.
+    """
+
+    def __init__(self, consultar: Callable[[dict], list[dict]], intervalo_segundos: float,
+                 inactividad_segundos: float | None = None, filas_por_pagina: int = 500,
+                 resincronizar_cada: int = 40, columna_cambio: str | None = None):
+        self._consultar = consultar
+        self.intervalo_segundos = intervalo_segundos
+        self.inactividad_segundos = inactividad_segundos or 4 * intervalo_segundos
+        self.filas_por_pagina = filas_por_pagina
+        self.resincronizar_cada = resincronizar_cada
+        self.columna_cambio = columna_cambio
+        # solo lo toca el hilo de consulta
+        self._indice: dict = {}
+        self._marca: tuple[str, str] | None = None
+        self._refrescos = 0
+        self._ciclos: tuple[dict, ...] = ()
+        self._actualizado: float | None = None   # time.time() de la última consulta exitosa
+        self._error: str | None = None
+        self._ultima_lectura = time.monotonic()
+        self._dormido = False   # el hilo dejó de consultar por inactividad
+        self._despertar = threading.Event()
+        self._nueva = threading.Condition()
+        self._hilo = threading.Thread(target=self._bucle, name="bandeja-fallos", daemon=True)
+        self._hilo.start()
+
+    def _bucle(self) -> None:
+        while True:
+            if time.monotonic() - self._ultima_lectura <= self.inactividad_segundos:
+                self._actualizar()
+                self._despertar.wait(self.intervalo_segundos)
+            else:
+                self._dormido = True
+                self._despertar.wait()
+                self._dormido = False
+            self._despertar.clear()
+
+    def _traer(self, indice: dict, marca: tuple[str, str] | None,
+               solo_fallidos: bool) -> tuple[str, str] | None:
+        """Aplica al índice las filas posteriores a la marca, página por página; devuelve la nueva marca"""
+        columna = self.columna_cambio or "created_at"
+        while True:
+            filas = self._consultar(params_pagina(marca, self.filas_por_pagina, columna, solo_fallidos))
+            fallidas = [f for f in filas if f["estado"] == "FALLIDO"]
+            for fila in filas:
+                indice.pop(fila["ciclo_id"], None)
+            for ciclo in normalizar_ciclos(fallidas):
+                indice[ciclo["ciclo_id"]] = ciclo
+            if filas:
+                marca = (filas[-1][columna], str(filas[-1]["ciclo_id"]))
+            if len(filas) < self.filas_por_pagina:
+                return marca
+
+    def _actualizar(self) -> None:
+        completo = (self.columna_cambio is None or self._marca is None
+                    or self._refrescos % self.resincronizar_cada == 0)
+        try:
+            if completo:
+                indice: dict = {}
+                marca = None
+                if self.columna_cambio is not None:
+                    # la marca se toma antes de la recarga: lo que cambie durante ella entra en el próximo refresco
+                    ultima = self._consultar(params_ultimo_cambio(self.columna_cambio))
+                    if ultima:
+                        marca = (ultima[0][self.columna_cambio], str(ultima[0]["ciclo_id"]))
+                self._traer(indice, None, solo_fallidos=True)
+            else:
+                indice = dict(self._indice)
+                marca = self._traer(indice, self._marca, solo_fallidos=False)
+            ciclos = tuple(sorted(indice.values(), key=lambda c: (c["created_at"], str(c["ciclo_id"]))))
+        except Exception as e:
+            # el hilo sigue vivo: el error se muestra en la bandeja y el próximo refresco reintenta
+            with self._nueva:
+                self._error = str(e)
+                self._nueva.notify_all()
+            return
+        self._indice, self._marca = indice, marca
+        self._refrescos += 1
+        with self._nueva:
+            self._ciclos, self._actualizado, self._error = ciclos, time.time(), None
+            self._nueva.notify_all()
+
+    def instantanea(self, esperar_segundos: float = 0) -> tuple[list[dict], float | None, str | None]:
+        """(ciclos, antigüedad en segundos, último error). Si aún no hay datos espera hasta
+        `esperar_segundos` a la primera consulta."""
+        self._ultima_lectura = time.monotonic()
+        # solo se despierta al hilo dormido: con consultas en curso o fallando manda intervalo_segundos
+        if self._dormido:
+            self._despertar.set()
+        with self._nueva:
+            if self._actualizado is None and self._error is None and esperar_segundos:
+                self._nueva.wait(esperar_segundos)
+            edad = None if self._actualizado is None else time.time() - self._actualizado
+            return list(self._ciclos), edad, self._error
+
+    def refrescar(self, esperar_segundos: float = 0) -> None:
+        """Pide una consulta inmediata; opcionalmente espera a que termine"""
+        self._ultima_lectura = time.monotonic()
+        with self._nueva:
+            self._despertar.set()
+            if esperar_segundos:
+                self._nueva.wait(esperar_segundos)
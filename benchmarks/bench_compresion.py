@@ -0,0 +1,137 @@
+"""Benchmark de compresión de los cuerpos enviados a los webhooks.
+
+Uso (desde la raíz del repo):
+    python -m benchmarks.bench_compresion --filas 10000 100000 --mbps 10
+    python -m benchmarks.bench_compresion --filas 100000 --mbps 2 --salida /tmp/compresion.json
+
+Arma los cuerpos reales de EECC y PayIns Online con datos sintéticos y los envía con
+cliente_http.post_json a un servidor HTTP local que descomprime y parsea el JSON. El servidor
+simula el enlace de subida (--mbps) esperando bytes / ancho de banda, así la latencia
+extremo a extremo incluye compresión, transferencia y descompresión.
+"""
+import argparse
+import gzip
+import json
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import cliente_http
+import ingesta
+import motor_conciliacion
+import validacion_eecc
+from benchmarks import generadores
+
+# (nombre, compresión, nivel fijo o None = adaptativo)
+VARIANTES: list[tuple[str, str | None, int | None]] = [
+    ("sin_compresion", None, None),
+    ("gzip_adaptativo", "gzip", None),
+    ("gzip_1", "gzip", 1),
+    ("gzip_9", "gzip", 9),
+    ("zstd_adaptativo", "zstd", None),
+]
+
+
+def _servidor(mbps: float) -> ThreadingHTTPServer:
+    """Servidor local que simula el enlace de subida y descomprime/parsea el cuerpo"""
+    class Manejador(BaseHTTPRequestHandler):
+        def do_POST(self):
+            cuerpo = self.rfile.read(int(self.headers["Content-Length"]))
+            time.sleep(len(cuerpo) * 8 / (mbps * 1_000_000))
+            encoding = self.headers.get("Content-Encoding")
+            if encoding == "gzip":
+                cuerpo = gzip.decompress(cuerpo)
+            elif encoding == "zstd":
+                import zstandard
+                cuerpo = zstandard.ZstdDecompressor().decompress(cuerpo, max_output_size=1 << 31)
+            json.loads(cuerpo)
+            self.send_response(200)
+            self.send_header("Content-Length", "2")
+            self.end_headers()
+            self.wfile.write(b"{}")
+
+        def log_message(self, *args):
+            pass
+
+    servidor = ThreadingHTTPServer(("127.0.0.1", 0), Manejador)
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    return servidor
+
+
+def _cuerpos(filas: int, semilla: int) -> dict[str, bytes]:
+    """Cuerpos JSON de los webhooks EECC y PayIns Online para `filas` operaciones"""
+    ventana_inicio = datetime(2026, 3, 20, 11, 0, 0)
+    ciclo = {"ciclo_id": "BENCH", "banco_codigo": "GMONEY", "cuenta_origen": "****0000",
+             "ventana_inicio": ventana_inicio.isoformat(), "ventana_fin": (ventana_inicio + timedelta(hours=1)).isoformat()}
+    df_eecc = ingesta.leer_eecc("eecc.csv", generadores.a_csv(generadores.gmoney_eecc(filas, ventana_inicio, semilla)))
+    df_mapeado, _ = validacion_eecc.validar_y_mapear_eecc(df_eecc, "GMONEY", ciclo, ahora=ventana_inicio + timedelta(hours=1))
+
+    # PayIns Online: `filas` operaciones concentradas en la hora conciliada
+    df_met = generadores.metabase(generadores.ids_operaciones(filas, semilla), ventana_inicio, semilla + 1)
+    df_met["PC_create_date_GMT_Peru"] = ventana_inicio.strftime("%d/%m/%Y, %H:%M:%S")
+    df_panda = ingesta.leer_panda_cashin(generadores.a_csv(generadores.panda(df_met, semilla + 2), sep=";"))
+    df_met_hora = motor_conciliacion.filtrar_hora(df_met, motor_conciliacion.fechas_metabase(df_met), ventana_inicio.hour)
+    df_panda_hora = motor_conciliacion.filtrar_hora(df_panda, motor_conciliacion.fechas_panda(df_panda), ventana_inicio.hour)
+    df_filas = motor_conciliacion.construir_filas_payins_online(df_met_hora, df_panda_hora, "bench")
+
+    return {
+        "eecc": cliente_http.codificar(validacion_eecc.payload_eecc(df_mapeado, ciclo, "bench")),
+        "payins_online": motor_conciliacion.cuerpo_payins_online("bench", ventana_inicio.hour, df_filas, ventana_inicio.isoformat()),
+    }
+
+
+def _enviar(url: str, cuerpo: bytes, compresion: str | None, nivel: int | None) -> tuple[int, float]:
+    """Envía el cuerpo y devuelve (bytes en el cable, segundos extremo a extremo)"""
+    inicio = time.perf_counter()
+    if nivel is None:
+        resp = cliente_http.post_json(url, cuerpo, timeout=600, compresion=compresion)
+    else:
+        niveles = cliente_http.NIVELES_COMPRESION
+        cliente_http.NIVELES_COMPRESION = [(float("inf"), nivel, nivel)]
+        try:
+            resp = cliente_http.post_json(url, cuerpo, timeout=600, compresion=compresion)
+        finally:
+            cliente_http.NIVELES_COMPRESION = niveles
+    resp.raise_for_status()
+    return len(resp.request.body), time.perf_counter() - inicio
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compresión de cuerpos a webhooks: bytes y latencia")
+    parser.add_argument("--filas", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--mbps", type=float, default=10.0, help="ancho de banda de subida simulado")
+    parser.add_argument("--repeticiones", type=int, default=3)
+    parser.add_argument("--semilla", type=int, default=42)
+    parser.add_argument("--salida", help="archivo JSON de resultados")
+    args = parser.parse_args()
+
+    servidor = _servidor(args.mbps)
+    url = f"http://127.0.0.1:{servidor.server_address[1]}/webhook"
+    variantes = [v for v in VARIANTES if v[1] != "zstd" or cliente_http.zstandard is not None]
+
+    resultados = []
+    for filas in args.filas:
+        for endpoint, cuerpo in _cuerpos(filas, args.semilla).items():
+            for nombre, compresion, nivel in variantes:
+                mediciones = [_enviar(url, cuerpo, compresion, nivel) for _ in range(args.repeticiones)]
+                en_cable = mediciones[0][0]
+                segundos = min(s for _, s in mediciones)
+                resultados.append({
+                    "filas": filas, "endpoint": endpoint, "variante": nombre,
+                    "bytes_json": len(cuerpo), "bytes_en_cable": en_cable,
+                    "ratio": round(len(cuerpo) / en_cable, 2), "segundos": round(segundos, 3),
+                })
+                print(f"{filas:>9,} · {endpoint:<14} {nombre:<16} {en_cable / 1024 ** 2:>9.2f} MB "
+                      f"(x{len(cuerpo) / en_cable:>5.1f})  {segundos:>8.3f} s")
+    servidor.shutdown()
+
+    if args.salida:
+        os.makedirs(os.path.dirname(os.path.abspath(args.salida)), exist_ok=True)
+        with open(args.salida, "w") as f:
+            json.dump({"mbps": args.mbps, "resultados": resultados}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+"""Benchmark por etapa de los pipelines de conciliación.
+
+Uso (desde la raíz del repo):
+    python -m benchmarks.bench_etapas --filas 10000 100000 1000000
+    python -m benchmarks.bench_etapas --filas 10000000 --sin-xlsx
+    python -m benchmarks.bench_etapas --comparar benchmarks/resultados/<commit_anterior>.json
+
+Cada etapa se mide por separado (mejor de --repeticiones) y el resultado se escribe en JSON
+(por defecto benchmarks/resultados/<commit>.json) para comparar entre commits.
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import time
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+import config
+import ingesta
+import motor_conciliacion
+import validacion_eecc
+from benchmarks import generadores
+
+# xlsx tiene un máximo de 1.048.576 filas y generarlo es lento: por encima se omite
+LIMITE_FILAS_XLSX: int = 200_000
+DIR_RESULTADOS: str = os.path.join(os.path.dirname(__file__), "resultados")
+
+
+def _commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True).strip()
+    except Exception:
+        return "sin_git"
+
+
+def _medir(funcion, repeticiones: int):
+    """Ejecuta `funcion` varias veces y devuelve (mejor tiempo en segundos, último resultado)"""
+    mejor, resultado = float("inf"), None
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        resultado = funcion()
+        mejor = min(mejor, time.perf_counter() - inicio)
+    return mejor, resultado
+
+
+def correr(filas: int, repeticiones: int, con_xlsx: bool, semilla: int) -> list[dict]:
+    """Genera los archivos para `filas` operaciones y mide cada etapa"""
+    ventana_inicio = datetime(2026, 3, 20, 11, 0, 0)
+    ahora = ventana_inicio + timedelta(hours=1, minutes=5)
+    ciclo = {"ciclo_id": "BENCH", "banco_codigo": "GMONEY", "cuenta_origen": "****0000",
+             "ventana_inicio": ventana_inicio.isoformat(), "ventana_fin": (ventana_inicio + timedelta(hours=1)).isoformat()}
+
+    # --- Archivos sintéticos ---
+    df_eecc_src = generadores.gmoney_eecc(filas, ventana_inicio, semilla)
+    df_met_src = generadores.metabase(generadores.ids_operaciones(filas, semilla), ventana_inicio.replace(hour=0), semilla + 1)
+    df_panda_src = generadores.panda(df_met_src, semilla + 2)
+    eecc_csv = generadores.a_csv(df_eecc_src)
+    met_csv = generadores.a_csv(df_met_src)
+    panda_csv = generadores.a_csv(df_panda_src, sep=";")
+    del df_eecc_src, df_panda_src
+
+    resultados = []
+
+    def registrar(etapa, segundos, n, bytes_entrada=None):
+        resultados.append({
+            "etapa": etapa,
+            "filas": filas,
+            "filas_etapa": n,
+            "segundos": round(segundos, 4),
+            "filas_por_segundo": round(n / segundos) if segundos > 0 else None,
+            "bytes_entrada": bytes_entrada,
+        })
+        print(f"{filas:>10,} · {etapa:<28} {segundos:>9.3f} s  ({n:,} filas)")
+
+    # --- Parseo ---
+    t, df_eecc = _medir(lambda: ingesta.leer_eecc("eecc.csv", eecc_csv), repeticiones)
+    registrar("parseo_eecc_csv", t, len(df_eecc), len(eecc_csv))
+
+    t, (df_met, _) = _medir(lambda: ingesta.leer_metabase([("metabase.csv", met_csv)]), repeticiones)
+    registrar("parseo_metabase_csv", t, len(df_met), len(met_csv))
+
+    if con_xlsx and filas <= LIMITE_FILAS_XLSX:
+        met_xlsx = generadores.a_xlsx(df_met_src)
+        t, (df_x, _) = _medir(lambda: ingesta.leer_metabase([("metabase.xlsx", met_xlsx)]), repeticiones)
+        registrar(f"parseo_metabase_xlsx_{ingesta.motor_excel()}", t, len(df_x), len(met_xlsx))
+        del met_xlsx, df_x
+    del df_met_src
+
+    t, df_panda = _medir(lambda: ingesta.leer_panda_cashin(panda_csv), repeticiones)
+    registrar("parseo_panda_cashin", t, len(df_panda), len(panda_csv))
+
+    # --- EECC ---
+    t, df_pre = _medir(lambda: config._preprocesar_gmoney(df_eecc), repeticiones)
+    registrar("preprocesar_gmoney", t, len(df_pre))
+
+    t, (df_mapeado, errores) = _medir(
+        lambda: validacion_eecc.validar_y_mapear_eecc(df_eecc.copy(), "GMONEY", ciclo, ahora=ahora), repeticiones
+    )
+    registrar("validar_y_mapear_eecc", t, len(df_mapeado))
+
+    # --- PayIns Online ---
+    t, dt_met = _medir(lambda: motor_conciliacion.fechas_metabase(df_met), repeticiones)
+    registrar("fechas_metabase", t, len(df_met))
+    t, dt_panda = _medir(lambda: motor_conciliacion.fechas_panda(df_panda), repeticiones)
+    registrar("fechas_panda", t, len(df_panda))
+
+    hora = ventana_inicio.hour
+    df_met_hora = motor_conciliacion.filtrar_hora(df_met, dt_met, hora)
+    df_panda_hora = motor_conciliacion.filtrar_hora(df_panda, dt_panda, hora)
+
+    t, filas_payload = _medir(
+        lambda: motor_conciliacion.construir_filas_payins_online(df_met_hora, df_panda_hora, "bench"), repeticiones
+    )
+    registrar("construir_payload", t, len(filas_payload))
+    t, cuerpo = _medir(
+        lambda: motor_conciliacion.cuerpo_payins_online("bench", hora, filas_payload, ahora.isoformat()), repeticiones
+    )
+    registrar("codificar_payload_json", t, len(filas_payload), len(cuerpo))
+    del filas_payload, cuerpo
+
+    t, df_det = _medir(lambda: motor_conciliacion.conciliar_payins_online(df_met_hora, df_panda_hora), repeticiones)
+    registrar("conciliar_payins_online", t, len(df_det))
+
+    t, df_hora = _medir(
+        lambda: motor_conciliacion.conciliar_por_hora(df_met, dt_met, df_panda, dt_panda), repeticiones
+    )
+    registrar("agrupacion_por_hora", t, len(df_met) + len(df_panda))
+
+    return resultados
+
+
+def comparar(actual: dict, anterior: dict) -> None:
+    """Imprime la razón de tiempos etapa por etapa contra una corrida anterior"""
+    previos = {(r["etapa"], r["filas"]): r["segundos"] for r in anterior["resultados"]}
+    print(f"\nComparación {anterior['commit']} → {actual['commit']}")
+    for r in actual["resultados"]:
+        antes = previos.get((r["etapa"], r["filas"]))
+        if antes:
+            print(f"{r['filas']:>10,} · {r['etapa']:<28} {antes:>9.3f} s → {r['segundos']:>9.3f} s  (x{antes / r['segundos']:.2f})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark por etapa de la conciliación GMoney")
+    parser.add_argument("--filas", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--repeticiones", type=int, default=3)
+    parser.add_argument("--semilla", type=int, default=42)
+    parser.add_argument("--sin-xlsx", action="store_true", help="no medir el parseo de xlsx")
+    parser.add_argument("--salida", help="archivo JSON de resultados (default: benchmarks/resultados/<commit>.json)")
+    parser.add_argument("--comparar", help="JSON de una corrida anterior para comparar")
+    args = parser.parse_args()
+
+    commit = _commit()
+    resultados = []
+    for filas in args.filas:
+        resultados.extend(correr(filas, args.repeticiones, not args.sin_xlsx, args.semilla))
+
+    informe = {
+        "commit": commit,
+        "fecha": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "cpus": os.cpu_count(),
+        "resultados": resultados,
+    }
+    salida = args.salida or os.path.join(DIR_RESULTADOS, f"{commit}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(salida)), exist_ok=True)
+    with open(salida, "w") as f:
+        json.dump(informe, f, indent=2)
+    print(f"\nResultados en {salida}")
+
+    if args.comparar:
+        with open(args.comparar) as f:
+            comparar(informe, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
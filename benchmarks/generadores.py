@@ -0,0 +1,132 @@
+"""Generadores de archivos sintéticos (con semilla) para los benchmarks.
+
+Producen GMONEY EECC, exports de Metabase y CSV de Panda Empresas con las mismas columnas y
+formatos que suben los operadores. Las operaciones de Metabase y Panda comparten ids para que
+el cruce tenga coincidencias, diferencias de monto y faltantes en ambos lados.
+"""
+from datetime import datetime
+from io import BytesIO
+
+import numpy as np
+import pandas as pd
+
+MONEDAS = np.array(["PEN", "PEN", "PEN", "USD"])
+ENTIDADES = np.array(["BCP", "BBVA", "INTERBANK", "SCOTIABANK"])
+NOMBRES = np.array(["JUAN PEREZ", "MARIA QUISPE", "LUIS TORRES", "ANA FLORES", "CARLOS RAMOS"])
+COMERCIOS = np.array(["COMERCIO A", "COMERCIO B", "COMERCIO C"])
+
+
+def _digitos(rng: np.random.Generator, n: int, largo: int) -> pd.Series:
+    """Ids numéricos de `largo` dígitos como texto (se arman en bloques de 14 dígitos)"""
+    partes = []
+    restante = largo
+    while restante > 0:
+        ancho = min(14, restante)
+        bloque = rng.integers(0, 10 ** ancho, size=n, dtype=np.int64)
+        partes.append(pd.Series(bloque).astype(str).str.zfill(ancho))
+        restante -= ancho
+    ids = partes[0]
+    for parte in partes[1:]:
+        ids = ids + parte
+    return ids
+
+
+def _momentos(rng: np.random.Generator, n: int, inicio: datetime, segundos: int) -> pd.Series:
+    """Fechas aleatorias en [inicio, inicio + segundos)"""
+    return pd.Series(pd.Timestamp(inicio) + pd.to_timedelta(rng.integers(0, segundos, size=n), unit="s"))
+
+
+def ids_operaciones(n: int, semilla: int = 0) -> pd.Series:
+    """Ids de operación (instruction_id / PPY_external_id) compartidos entre fuentes"""
+    return _digitos(np.random.default_rng(semilla), n, 28)
+
+
+def gmoney_eecc(n: int, ventana_inicio: datetime, semilla: int = 0) -> pd.DataFrame:
+    """EECC GMONEY (ids como ="…"): ~90% de las filas dentro de la hora de la ventana, el resto en la hora previa"""
+    rng = np.random.default_rng(semilla)
+    momentos = _momentos(rng, n, ventana_inicio - pd.Timedelta(minutes=6), 3600 + 360)
+    ids = _digitos(rng, n, 28)
+    df = pd.DataFrame({
+        "instruction_id":   '="' + ids + '"',
+        "movement_day":     momentos.dt.strftime("%d/%m/%Y"),
+        "movement_hour":    momentos.dt.strftime("%H:%M:%S"),
+        "amount":           rng.integers(100, 500_000, size=n) / 100,
+        "currency":         rng.choice(MONEDAS, size=n),
+        "external_core_id": '="' + _digitos(rng, n, 28) + '"',
+        "created_at":       momentos.dt.strftime("%Y-%m-%d %H:%M:%S"),
+        "updated_at":       momentos.dt.strftime("%Y-%m-%d %H:%M:%S"),
+        "origin_name":      rng.choice(NOMBRES, size=n),
+        "origin_type":      "DNI",
+        "origin_document":  _digitos(rng, n, 8),
+        "operation":        "CASHIN",
+        "fee":              rng.integers(0, 300, size=n) / 100,
+        "status":           "COM",
+    })
+    # ~0.1% de filas con errores de validación
+    malas = rng.random(n) < 0.001
+    df.loc[malas, "currency"] = "pen"
+    return df
+
+
+def metabase(ids: pd.Series, dia: datetime, semilla: int = 1) -> pd.DataFrame:
+    """Export de Metabase PayIns para un día (PC_create_date_GMT_Peru como dd/mm/yyyy, HH:MM:SS)"""
+    rng = np.random.default_rng(semilla)
+    n = len(ids)
+    momentos = _momentos(rng, n, dia, 24 * 3600)
+    return pd.DataFrame({
+        "PPY_external_id":         ids.to_numpy(),
+        "amount":                  rng.integers(100, 500_000, size=n) / 100,
+        "currency_code":           rng.choice(MONEDAS, size=n),
+        "PC_create_date_GMT_Peru": momentos.dt.strftime("%d/%m/%Y, %H:%M:%S"),
+        "Comercio_Nombre":         rng.choice(COMERCIOS, size=n),
+        "Deudor_Nombre":           rng.choice(NOMBRES, size=n),
+        "Deudor_Documento":        _digitos(rng, n, 8),
+        "Deuda_public_id":         _digitos(rng, n, 12),
+        "Deuda_Estado":            "PAGADA",
+    })
+
+
+def panda(df_metabase: pd.DataFrame, semilla: int = 2) -> pd.DataFrame:
+    """Panda Empresas a partir de Metabase: 98% coincide, 1% con monto distinto, 1% falta; +2% propias y CASHOUT"""
+    rng = np.random.default_rng(semilla)
+    n = len(df_metabase)
+    base = df_metabase[rng.random(n) >= 0.01]
+    amount = base["amount"].to_numpy().copy()
+    cambia = rng.random(len(base)) < 0.01
+    amount[cambia] += 1.0
+    fechas = pd.to_datetime(base["PC_create_date_GMT_Peru"].str.replace(",", "", regex=False), dayfirst=True)
+
+    extra = max(1, n // 50)
+    dia = fechas.min() if len(fechas) else pd.Timestamp("2026-01-01")
+    fechas_extra = _momentos(rng, extra, dia.normalize(), 24 * 3600)
+    operaciones = np.where(rng.random(extra) < 0.5, "CASHIN", "CASHOUT")
+
+    ids = pd.concat([base["PPY_external_id"], _digitos(rng, extra, 28)], ignore_index=True)
+    todas = pd.concat([fechas.reset_index(drop=True), fechas_extra], ignore_index=True)
+    total = len(ids)
+    return pd.DataFrame({
+        "instruction_id":  '="' + ids + '"',
+        "operation":       np.concatenate([np.full(len(base), "CASHIN"), operaciones]),
+        "amount":          np.concatenate([amount, rng.integers(100, 500_000, size=extra) / 100]),
+        "currency":        rng.choice(MONEDAS, size=total),
+        "fee":             rng.integers(0, 300, size=total) / 100,
+        "movement_day":    todas.dt.strftime("%d/%m/%Y"),
+        "movement_hour":   todas.dt.strftime("%H:%M:%S"),
+        "origin_name":     rng.choice(NOMBRES, size=total),
+        "origin_document": _digitos(rng, total, 8),
+        "target_name":     rng.choice(COMERCIOS, size=total),
+        "entity":          rng.choice(ENTIDADES, size=total),
+        "status":          "COM",
+    })
+
+
+def a_csv(df: pd.DataFrame, sep: str = ",") -> bytes:
+    """Serializa a CSV en bytes (como llega desde st.file_uploader)"""
+    return df.to_csv(index=False, sep=sep).encode("utf-8")
+
+
+def a_xlsx(df: pd.DataFrame) -> bytes:
+    """Serializa a xlsx en bytes"""
+    buffer = BytesIO()
+    df.to_excel(buffer, index=False)
+    return buffer.getvalue()
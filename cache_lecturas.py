@@ -0,0 +1,107 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Callable
+
+import pandas as pd
+
+# Columnas de texto con menos de esta proporción de valores distintos se guardan como category
+UMBRAL_CATEGORIA: float = 0.5
+
+
+def huella(contenidos: list[bytes], lector: str, opciones: dict | None = None) -> str:
+    """Llave del caché: hash del contenido de los archivos + lector + opciones de lectura"""
+    h = hashlib.blake2b(digest_size=20)
+    h.update(lector.encode())
+    h.update(repr(sorted((opciones or {}).items())).encode())
+    for contenido in contenidos:
+        h.update(len(contenido).to_bytes(8, "little"))
+        h.update(contenido)
+    return h.hexdigest()
+
+
+def compactar(df: pd.DataFrame) -> tuple[pd.DataFrame, dict]:
+    """Convierte las columnas de texto repetitivas a category; devuelve el frame y los dtypes originales"""
+    tipos = {}
+    compacto = {}
+    for col in df.columns:
+        serie = df[col]
+        texto = serie.dtype == object or pd.api.types.is_string_dtype(serie)
+        if texto and len(serie) and not isinstance(serie.dtype, pd.CategoricalDtype):
+            if serie.nunique(dropna=True) < UMBRAL_CATEGORIA * len(serie):
+                tipos[col] = serie.dtype
+                serie = serie.astype("category")
+        compacto[col] = serie
+    return pd.DataFrame(compacto, index=df.index), tipos
+
+
+def concatenar(partes: list[tuple[pd.DataFrame, dict]]) -> tuple[pd.DataFrame, dict]:
+    """Concatena frames ya compactados sin expandirlos: una columna compactada en todas las partes
+    queda como category (union_categoricals); en el resto, las partes vuelven a su dtype original"""
+    if len(partes) == 1:
+        return partes[0]
+    categoricas = [c for c in partes[0][0].columns if all(c in tipos for _, tipos in partes)]
+    frames = [df.astype({c: t for c, t in tipos.items() if c not in categoricas}) for df, tipos in partes]
+    df = pd.concat(frames, ignore_index=True)
+    for col in categoricas:
+        df[col] = pd.api.types.union_categoricals([f[col] for f in frames])
+    return df, {c: partes[0][1][c] for c in categoricas}
+
+
+def expandir(df: pd.DataFrame, tipos: dict) -> pd.DataFrame:
+    """Devuelve una copia del frame con los dtypes originales (cada lector recibe su propio frame)"""
+    if not tipos:
+        return df.copy()
+    return df.astype(tipos)
+
+
+class CacheLecturas:
+    """Caché LRU de archivos parseados, compartido por todas las sesiones del servidor.
+
+    Cada entrada se guarda compactada y se expulsa la menos usada cuando se supera el
+    presupuesto de memoria del proceso.
+    """
+
+    def __init__(self, presupuesto_bytes: int):
+        self.presupuesto_bytes = presupuesto_bytes
+        self.uso_bytes = 0
+        self._entradas: OrderedDict[str, tuple[pd.DataFrame, dict, int]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def obtener(self, contenidos: list[bytes], lector: str, opciones: dict | None,
+                cargar: Callable[[], pd.DataFrame | tuple[pd.DataFrame, dict]],
+                compactado: bool = False) -> pd.DataFrame:
+        """Devuelve el frame parseado de `contenidos`; si no está en caché lo parsea con `cargar()`.
+        Con `compactado`, `cargar()` ya devuelve (frame compactado, dtypes) armado en el worker."""
+        llave = huella(contenidos, lector, opciones)
+        with self._lock:
+            entrada = self._entradas.get(llave)
+            if entrada is not None:
+                self._entradas.move_to_end(llave)
+        if entrada is not None:
+            return expandir(entrada[0], entrada[1])
+
+        if compactado:
+            compacto, tipos = cargar()
+            df = expandir(compacto, tipos)
+        else:
+            df = cargar()
+            compacto, tipos = compactar(df)
+        tamano = int(compacto.memory_usage(deep=True).sum())
+        with self._lock:
+            if tamano <= self.presupuesto_bytes and llave not in self._entradas:
+                self._entradas[llave] = (compacto, tipos, tamano)
+                self.uso_bytes += tamano
+                while self.uso_bytes > self.presupuesto_bytes:
+                    _, (_, _, liberado) = self._entradas.popitem(last=False)
+                    self.uso_bytes -= liberado
+        return df
+
+    def estadisticas(self) -> dict:
+        """Entradas y memoria usada por el caché"""
+        with self._lock:
+            return {
+                "entradas": len(self._entradas),
+                "uso_mb": round(self.uso_bytes / 1024 ** 2, 1),
+                "presupuesto_mb": round(self.presupuesto_bytes / 1024 ** 2, 1),
+            }
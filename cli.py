@@ -0,0 +1,259 @@
+"""Ejecución sin interfaz de los modos de conciliación (cron, backfills, jobs nocturnos).
+
+Uso (desde la raíz del repo):
+    python cli.py eecc --archivo eecc.csv --banco GMONEY --ciclo-id C123 --ventana-fin "2026-03-20 12:00"
+    python cli.py payouts_diaria --metabase metabase_1.xlsx metabase_2.xlsx --gmoney gmoney.txt
+    python cli.py payins_diaria --metabase metabase.csv --gmoney gmoney.txt
+    python cli.py payins_online --metabase metabase.csv --panda panda.csv --hora 11
+    python cli.py payins_online --metabase metabase.csv --panda panda.csv --desde "2026-03-20 00:00" --hasta "2026-03-20 11:00"
+    python cli.py payins_online --metabase metabase.csv --panda panda.csv --fecha 2026-03-20 --horas 3 4 5
+
+Los resultados se escriben como CSV en --salida y los tiempos por etapa en config.LOG_TIEMPOS.
+Código de salida: 0 sin novedades, 1 con errores de validación o diferencias, 2 si falla el envío
+(o alguna hora del backfill).
+"""
+import argparse
+import os
+import random
+import sys
+from datetime import datetime, timedelta
+
+import pandas as pd
+import requests
+
+import cliente_http
+import config
+import envio_eecc
+import ingesta
+import motor_conciliacion
+import tiempos
+import validacion_eecc
+
+MODOS_DIARIA: dict[str, str] = {"payouts_diaria": "payout_diaria", "payins_diaria": "payin_diaria"}
+
+
+def _session_id() -> str:
+    """Mismo formato que los session_id de la app (timestamp + 6 dígitos)"""
+    return f"{datetime.now().strftime('%Y%m%d%H%M%S')}_{random.randint(0, 999_999):06d}"
+
+
+def _leer(ruta: str) -> bytes:
+    with open(ruta, "rb") as f:
+        return f.read()
+
+
+def _escribir(df: pd.DataFrame, salida: str, nombre: str) -> None:
+    os.makedirs(salida, exist_ok=True)
+    ruta = os.path.join(salida, nombre)
+    df.to_csv(ruta, index=False)
+    print(f"  {nombre:<24} {len(df):>10,} filas → {ruta}")
+
+
+def _post(medicion: tiempos.Medicion, etapa: str, url: str, payload: dict | bytes, timeout: float | tuple,
+          filas: int | None = None, webhook: str | None = None) -> bool:
+    """POST JSON (dict o cuerpo ya serializado) al webhook registrando bytes y tiempo; devuelve si n8n lo aceptó"""
+    try:
+        with medicion.etapa(etapa, filas=filas) as et:
+            resp = cliente_http.post_json(url, payload, timeout=timeout, **config.compresion_webhook(webhook))
+            et["bytes_enviados"], et["bytes_recibidos"] = tiempos.bytes_respuesta(resp)
+        resp.raise_for_status()
+        return True
+    except requests.exceptions.RequestException as e:
+        print(f"Error enviando a n8n: {e}", file=sys.stderr)
+        return False
+
+
+def correr_eecc(args, medicion: tiempos.Medicion) -> int:
+    ventana_fin = pd.Timestamp(args.ventana_fin).to_pydatetime() if args.ventana_fin else None
+    ventana_inicio = ventana_fin - timedelta(hours=1) if ventana_fin else None
+    ciclo = {
+        "ciclo_id":       args.ciclo_id,
+        "banco_codigo":   args.banco,
+        "cuenta_origen":  args.cuenta_origen,
+        "ventana_inicio": ventana_inicio.isoformat() if ventana_inicio else "-",
+        "ventana_fin":    ventana_fin.isoformat() if ventana_fin else "-",
+    }
+
+    with medicion.etapa("lectura_eecc") as et:
+        contenido = _leer(args.archivo)
+        df = ingesta.leer_eecc(args.archivo, contenido)
+        et["filas"], et["bytes_recibidos"] = len(df), len(contenido)
+    with medicion.etapa("validar_y_mapear_eecc", filas=len(df)):
+        df_mapeado, errores = validacion_eecc.validar_y_mapear_eecc(df, args.banco, ciclo, ahora=ventana_fin)
+
+    _escribir(df_mapeado, args.salida, "eecc_mapeado.csv")
+    if errores:
+        _escribir(pd.DataFrame(errores), args.salida, "eecc_errores.csv")
+        print(f"{len(errores)} errores de validación: no se envía a n8n", file=sys.stderr)
+        return 1
+
+    if args.enviar:
+        payloads = envio_eecc.payloads_lotes(df_mapeado, ciclo, args.operador, config.EECC_FILAS_POR_LOTE)
+        confirmados = set()
+
+        def _post_lote(payload):
+            resp = cliente_http.post_json(
+                config.N8N_WEBHOOK_EECC, payload, timeout=config.TIMEOUTS_HTTP["eecc"],
+                headers={"Idempotency-Key": payload["idempotency_key"]}, **config.compresion_webhook("eecc"),
+            )
+            resp.raise_for_status()
+            return True
+
+        with medicion.etapa("post_n8n_eecc", filas=len(df_mapeado)):
+            errores_envio = envio_eecc.enviar_lotes(payloads, _post_lote, confirmados, config.EECC_LOTES_CONCURRENTES)
+        if errores_envio:
+            for secuencia, error in sorted(errores_envio.items()):
+                print(f"Lote {secuencia + 1}/{len(payloads)} sin confirmar: {error}", file=sys.stderr)
+            return 2
+    return 0
+
+
+def correr_diaria(args, medicion: tiempos.Medicion) -> int:
+    with medicion.etapa("lectura_metabase") as et:
+        archivos = [(os.path.basename(r), _leer(r)) for r in args.metabase]
+        df_metabase, _ = ingesta.leer_metabase(archivos)
+        et["filas"], et["bytes_recibidos"] = len(df_metabase), sum(len(c) for _, c in archivos)
+    with medicion.etapa("lectura_txt_gmoney") as et:
+        contenido = _leer(args.gmoney)
+        df_gmoney = motor_conciliacion.leer_txt_gmoney(contenido)
+        et["filas"], et["bytes_recibidos"] = len(df_gmoney), len(contenido)
+
+    with medicion.etapa("conciliar_diaria", filas=len(df_metabase) + len(df_gmoney)):
+        resultado = motor_conciliacion.conciliar_diaria(
+            df_metabase, df_gmoney, config.COLUMNAS_DIARIA[MODOS_DIARIA[args.modo]]
+        )
+
+    importes = pd.DataFrame(resultado["importes"])
+    detalle = pd.DataFrame(resultado["detalle"])
+    _escribir(importes, args.salida, "importes.csv")
+    _escribir(detalle, args.salida, "detalle.csv")
+    return 1 if len(importes) or len(detalle) else 0
+
+
+def _horas_backfill(args) -> list | None:
+    """Horas (fecha, hora) pedidas por --desde/--hasta o --fecha/--horas; None = una sola hora"""
+    if args.desde:
+        hasta = (pd.Timestamp(args.hasta).to_pydatetime() if args.hasta
+                 else datetime.now(config.TIMEZONE).replace(tzinfo=None))
+        return motor_conciliacion.horas_rango(pd.Timestamp(args.desde).to_pydatetime(), hasta)
+    if args.horas:
+        fecha = pd.Timestamp(args.fecha).date() if args.fecha else datetime.now(config.TIMEZONE).date()
+        return [(fecha, hora) for hora in sorted(set(args.horas))]
+    return None
+
+
+def correr_payins_online(args, medicion: tiempos.Medicion) -> int:
+    ahora = datetime.now(config.TIMEZONE)
+    fecha_filtro, hora_filtro = motor_conciliacion.hora_anterior(ahora.replace(tzinfo=None))
+    if args.hora is not None:
+        fecha_filtro = pd.Timestamp(args.fecha).date() if args.fecha else ahora.date()
+        hora_filtro = args.hora
+    horas_backfill = _horas_backfill(args)
+
+    with medicion.etapa("lectura_metabase") as et:
+        archivos = [(os.path.basename(r), _leer(r)) for r in args.metabase]
+        df_met, _ = ingesta.leer_metabase(archivos)
+        et["filas"], et["bytes_recibidos"] = len(df_met), sum(len(c) for _, c in archivos)
+    with medicion.etapa("lectura_panda_cashin") as et:
+        contenido = _leer(args.panda)
+        df_panda = ingesta.leer_panda_cashin(contenido)
+        et["filas"], et["bytes_recibidos"] = len(df_panda), len(contenido)
+
+    if horas_backfill is not None:
+        with medicion.etapa("fechas_metabase", filas=len(df_met)):
+            dt_met = motor_conciliacion.fechas_metabase(df_met)
+        with medicion.etapa("fechas_panda", filas=len(df_panda)):
+            dt_panda = motor_conciliacion.fechas_panda(df_panda)
+        with medicion.etapa("conciliar_backfill", filas=len(df_met) + len(df_panda)):
+            detalle, estado = motor_conciliacion.conciliar_backfill(df_met, dt_met, df_panda, dt_panda, horas_backfill)
+        _escribir(detalle, args.salida, "detalle_backfill.csv")
+        _escribir(estado, args.salida, "estado_por_hora.csv")
+        if (estado["estado"] == motor_conciliacion.ESTADO_HORA_ERROR).any():
+            return 2
+        return 1 if len(detalle) else 0
+
+    with medicion.etapa("fechas_metabase", filas=len(df_met)):
+        dt_met = motor_conciliacion.fechas_metabase(df_met)
+        df_met_hora = motor_conciliacion.filtrar_hora(df_met, dt_met, hora_filtro, fecha_filtro)
+    with medicion.etapa("fechas_panda", filas=len(df_panda)):
+        dt_panda = motor_conciliacion.fechas_panda(df_panda)
+        df_panda_hora = motor_conciliacion.filtrar_hora(df_panda, dt_panda, hora_filtro, fecha_filtro)
+
+    with medicion.etapa("conciliar_payins_online", filas=len(df_met_hora) + len(df_panda_hora)):
+        detalle = motor_conciliacion.diferencias(
+            motor_conciliacion.conciliar_payins_online(df_met_hora, df_panda_hora)
+        )
+    with medicion.etapa("conciliacion_por_hora", filas=len(df_met) + len(df_panda)):
+        por_hora = motor_conciliacion.conciliar_por_hora(df_met, dt_met, df_panda, dt_panda)
+
+    _escribir(detalle, args.salida, f"detalle_hora_{hora_filtro:02d}.csv")
+    _escribir(por_hora, args.salida, "conciliacion_por_hora.csv")
+
+    if args.enviar:
+        with medicion.etapa("construir_payload", filas=len(df_met_hora) + len(df_panda_hora)) as et:
+            df_filas = motor_conciliacion.construir_filas_payins_online(df_met_hora, df_panda_hora, medicion.session_id)
+            cuerpo = motor_conciliacion.cuerpo_payins_online(medicion.session_id, hora_filtro, df_filas, ahora.isoformat())
+            et["bytes_enviados"] = len(cuerpo)
+        if not _post(medicion, "post_n8n_payins_online", config.N8N_PAYINS_ONLINE_V2, cuerpo,
+                     timeout=config.TIMEOUTS_HTTP["payins_online"], filas=len(df_filas), webhook="payins_online"):
+            return 2
+    return 1 if len(detalle) else 0
+
+
+def _parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Conciliación GMoney sin interfaz")
+    sub = parser.add_subparsers(dest="modo", required=True)
+
+    comun = argparse.ArgumentParser(add_help=False)
+    comun.add_argument("--salida", default="salida", help="carpeta de resultados (default: salida)")
+    comun.add_argument("--usuario", default=os.environ.get("USER", "cli"))
+
+    p = sub.add_parser("eecc", parents=[comun], help="valida y mapea un EECC y opcionalmente lo envía a n8n")
+    p.add_argument("--archivo", required=True)
+    p.add_argument("--banco", required=True, choices=sorted(config.COLUMNAS_BANCO))
+    p.add_argument("--ciclo-id", required=True)
+    p.add_argument("--cuenta-origen")
+    p.add_argument("--ventana-fin", help="fin de la ventana (se valida la hora previa); default: hora actual")
+    p.add_argument("--operador", default="cli")
+    p.add_argument("--enviar", action="store_true", help="enviar a N8N_WEBHOOK_EECC si no hay errores")
+
+    for modo in MODOS_DIARIA:
+        p = sub.add_parser(modo, parents=[comun], help="conciliación diaria Metabase vs TXT GMoney")
+        p.add_argument("--metabase", required=True, nargs="+")
+        p.add_argument("--gmoney", required=True)
+
+    p = sub.add_parser("payins_online", parents=[comun], help="conciliación de una hora Metabase vs Panda")
+    p.add_argument("--metabase", required=True, nargs="+")
+    p.add_argument("--panda", required=True)
+    p.add_argument("--hora", type=int, choices=range(24), help="hora a conciliar; default: hora previa")
+    p.add_argument("--fecha", help="fecha de --hora / --horas (YYYY-MM-DD); default: hoy")
+    p.add_argument("--horas", type=int, nargs="+", choices=range(24), metavar="HORA",
+                   help="backfill: lista de horas de --fecha")
+    p.add_argument("--desde", help="backfill: primera hora a conciliar (YYYY-MM-DD HH:MM)")
+    p.add_argument("--hasta", help="backfill: última hora a conciliar; default: hora actual")
+    p.add_argument("--enviar", action="store_true", help="persistir las filas en N8N_PAYINS_ONLINE_V2")
+    return parser
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = _parser().parse_args(argv)
+    cliente_http.configurar(conexiones_por_host=config.HTTP_CONEXIONES_POR_HOST,
+                            reintentos_get=config.HTTP_REINTENTOS_GET, backoff=config.HTTP_BACKOFF_SEGUNDOS)
+    medicion = tiempos.Medicion(args.modo, _session_id(), args.usuario)
+
+    if args.modo == "eecc":
+        codigo = correr_eecc(args, medicion)
+    elif args.modo in MODOS_DIARIA:
+        codigo = correr_diaria(args, medicion)
+    else:
+        codigo = correr_payins_online(args, medicion)
+
+    medicion.guardar(config.LOG_TIEMPOS)
+    for e in medicion.etapas:
+        print(f"  {e['etapa']:<24} {e['segundos']:>9.3f} s")
+    print(f"  {'total':<24} {medicion.total_segundos():>9.3f} s")
+    return codigo
+
+
+if __name__ == "__main__":
+    sys.exit(main())
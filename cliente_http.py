@@ -0,0 +1,251 @@
+"""Cliente HTTP JSON para n8n y Supabase.
+
+Las llamadas salen por sesiones con pool de conexiones keep-alive por host (ClienteHTTP).
+Codifica con orjson si está instalado (si no, con json de la librería estándar), convierte
+NaN/NaT/pd.NA a null y los escalares/arreglos numpy a tipos JSON, y decodifica las respuestas
+directo a objetos Python o a DataFrames.
+"""
+import gzip
+import json
+import math
+import threading
+from datetime import date, datetime
+from decimal import Decimal
+from urllib.parse import urlsplit
+
+import numpy as np
+import pandas as pd
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util import Retry
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+CONTENT_TYPE_JSON: str = "application/json"
+
+# Nivel de compresión según tamaño del cuerpo: (hasta bytes, nivel gzip, nivel zstd).
+# Los cuerpos grandes bajan de nivel para que el tiempo de CPU no se coma lo ganado en la red.
+NIVELES_COMPRESION: list[tuple[float, int, int]] = [
+    (1 * 1024 ** 2,  9, 12),
+    (16 * 1024 ** 2, 6, 6),
+    (float("inf"),   1, 3),
+]
+
+
+def _por_defecto(obj):
+    """Tipos que ni orjson ni json saben serializar"""
+    if obj is None or obj is pd.NaT or obj is pd.NA:
+        return None
+    if isinstance(obj, (pd.Timestamp, datetime, date)):
+        return obj.isoformat()
+    if isinstance(obj, np.ndarray):
+        return _sin_nan(obj.tolist())
+    if isinstance(obj, np.generic):
+        valor = obj.item()
+        return None if isinstance(valor, float) and not math.isfinite(valor) else valor
+    if isinstance(obj, Decimal):
+        return float(obj)
+    if isinstance(obj, (pd.Series, pd.Index)):
+        return obj.astype(object).where(obj.notna(), None).tolist()
+    raise TypeError(f"Tipo no serializable a JSON: {type(obj).__name__}")
+
+
+def _sin_nan(obj):
+    """NaN/inf → None recorriendo dicts y listas (solo para el fallback de la librería estándar)"""
+    if isinstance(obj, float):
+        return obj if math.isfinite(obj) else None
+    if isinstance(obj, dict):
+        return {k: _sin_nan(v) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [_sin_nan(v) for v in obj]
+    return obj
+
+
+def codificar(obj) -> bytes:
+    """Serializa a JSON (UTF-8). Un DataFrame se serializa como lista de registros."""
+    if isinstance(obj, pd.DataFrame):
+        if obj.empty:
+            return b"[]"
+        return obj.to_json(orient="records", force_ascii=False, double_precision=15, date_format="iso").encode("utf-8")
+    if orjson is not None:
+        return orjson.dumps(obj, default=_por_defecto,
+                            option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+    return json.dumps(_sin_nan(obj), default=_por_defecto, ensure_ascii=False, allow_nan=False).encode("utf-8")
+
+
+def decodificar(contenido: bytes | str):
+    """Parsea un cuerpo JSON"""
+    if orjson is not None:
+        return orjson.loads(contenido)
+    return json.loads(contenido)
+
+
+def a_dataframe(datos, clave: str | None = None) -> pd.DataFrame:
+    """Convierte una respuesta JSON en DataFrame.
+
+    Acepta una lista de registros, un dict con la lista en `clave` o la forma que devuelve n8n
+    (una lista con un único dict que trae `clave`).
+    """
+    if clave is not None:
+        if isinstance(datos, list) and len(datos) == 1 and isinstance(datos[0], dict):
+            datos = datos[0]
+        datos = datos.get(clave, []) if isinstance(datos, dict) else []
+    return pd.DataFrame.from_records(datos) if datos else pd.DataFrame()
+
+
+def json_respuesta(response: requests.Response):
+    """Cuerpo de la respuesta decodificado (equivale a response.json())"""
+    return decodificar(response.content)
+
+
+def dataframe_respuesta(response: requests.Response, clave: str | None = None) -> pd.DataFrame:
+    """Cuerpo de la respuesta decodificado directo a DataFrame"""
+    return a_dataframe(json_respuesta(response), clave)
+
+
+def nivel_compresion(tamano: int, compresion: str) -> int:
+    """Nivel gzip/zstd para un cuerpo de `tamano` bytes"""
+    for limite, nivel_gzip, nivel_zstd in NIVELES_COMPRESION:
+        if tamano <= limite:
+            return nivel_zstd if compresion == "zstd" else nivel_gzip
+    return 1
+
+
+def comprimir(cuerpo: bytes, compresion: str | None, min_bytes: int = 0) -> tuple[bytes, str | None]:
+    """Comprime el cuerpo y devuelve (bytes, Content-Encoding). Sin compresión (o cuerpo menor a
+    `min_bytes`) lo devuelve tal cual; zstd baja a gzip si zstandard no está instalado."""
+    if not compresion or len(cuerpo) < min_bytes:
+        return cuerpo, None
+    if compresion == "zstd" and zstandard is not None:
+        nivel = nivel_compresion(len(cuerpo), "zstd")
+        return zstandard.ZstdCompressor(level=nivel).compress(cuerpo), "zstd"
+    if compresion not in ("gzip", "zstd"):
+        raise ValueError(f"Compresión no soportada: {compresion}")
+    return gzip.compress(cuerpo, compresslevel=nivel_compresion(len(cuerpo), "gzip"), mtime=0), "gzip"
+
+
+def _con_compresion(cuerpo: bytes, headers: dict, compresion: str | None, min_bytes: int) -> bytes:
+    cuerpo, encoding = comprimir(cuerpo, compresion, min_bytes)
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    return cuerpo
+
+
+class ClienteHTTP:
+    """Sesiones HTTP con pool de conexiones keep-alive, una por host.
+
+    Los GET (idempotentes) se reintentan ante errores de conexión y 429/5xx con backoff
+    exponencial con jitter; los POST nunca se reintentan automáticamente.
+    """
+
+    def __init__(self, conexiones_por_host: int = 10, reintentos_get: int = 3, backoff: float = 0.5):
+        self.conexiones_por_host = conexiones_por_host
+        self.reintentos_get = reintentos_get
+        self.backoff = backoff
+        self._sesiones: dict[str, requests.Session] = {}
+        self._lock = threading.Lock()
+
+    def _reintentos(self) -> Retry:
+        opciones = dict(
+            total=self.reintentos_get,
+            allowed_methods=frozenset({"GET", "HEAD"}),
+            status_forcelist=(429, 500, 502, 503, 504),
+            backoff_factor=self.backoff,
+            raise_on_status=False,
+        )
+        try:
+            return Retry(backoff_jitter=self.backoff, **opciones)
+        except TypeError:  # urllib3 < 2 no tiene jitter
+            return Retry(**opciones)
+
+    def sesion(self, url: str) -> requests.Session:
+        """Sesión del host de `url` (se crea la primera vez)"""
+        partes = urlsplit(url)
+        host = f"{partes.scheme}://{partes.netloc}"
+        with self._lock:
+            sesion = self._sesiones.get(host)
+            if sesion is None:
+                sesion = requests.Session()
+                adaptador = HTTPAdapter(
+                    pool_connections=1,
+                    pool_maxsize=self.conexiones_por_host,
+                    max_retries=self._reintentos(),
+                )
+                sesion.mount(host, adaptador)
+                self._sesiones[host] = sesion
+        return sesion
+
+    def post_json(self, url: str, payload, timeout: float | tuple = 30, headers: dict | None = None,
+                  compresion: str | None = None, min_bytes: int = 0, **kwargs) -> requests.Response:
+        """POST con cuerpo JSON; `payload` puede ser un objeto, un DataFrame o bytes ya codificados.
+        Con `compresion` ("gzip"/"zstd") el cuerpo viaja comprimido con su Content-Encoding."""
+        cuerpo = payload if isinstance(payload, (bytes, bytearray)) else codificar(payload)
+        headers = {"Content-Type": CONTENT_TYPE_JSON, **(headers or {})}
+        cuerpo = _con_compresion(bytes(cuerpo), headers, compresion, min_bytes)
+        return self.sesion(url).post(url, data=cuerpo, timeout=timeout, headers=headers, **kwargs)
+
+    def post_multipart(self, url: str, files: dict, data: dict | None = None, timeout: float | tuple = 180,
+                       compresion: str | None = None, min_bytes: int = 0, **kwargs) -> requests.Response:
+        """POST multipart/form-data; con `compresion` se comprime el cuerpo multipart completo"""
+        if not compresion:
+            return self.sesion(url).post(url, files=files, data=data, timeout=timeout, **kwargs)
+        preparado = requests.Request("POST", url, files=files, data=data).prepare()
+        headers = dict(preparado.headers)
+        headers.pop("Content-Length", None)
+        cuerpo = _con_compresion(preparado.body, headers, compresion, min_bytes)
+        return self.sesion(url).post(url, data=cuerpo, timeout=timeout, headers=headers, **kwargs)
+
+    def get_json(self, url: str, headers: dict | None = None, params: dict | None = None,
+                 timeout: float | tuple = 10):
+        """GET que exige 2xx y devuelve el cuerpo JSON decodificado (lanza requests.HTTPError si no)"""
+        resp = self.sesion(url).get(
+            url, headers={"Accept": CONTENT_TYPE_JSON, **(headers or {})}, params=params, timeout=timeout
+        )
+        resp.raise_for_status()
+        return json_respuesta(resp)
+
+    def cerrar(self) -> None:
+        with self._lock:
+            for sesion in self._sesiones.values():
+                sesion.close()
+            self._sesiones.clear()
+
+
+_cliente: ClienteHTTP | None = None
+
+
+def cliente() -> ClienteHTTP:
+    """Cliente compartido del proceso (CLI, scripts); la app usa el suyo como recurso de Streamlit"""
+    global _cliente
+    if _cliente is None:
+        _cliente = ClienteHTTP()
+    return _cliente
+
+
+def configurar(**opciones) -> None:
+    """Reemplaza el cliente compartido por uno con estas opciones (la CLI le pasa las de config).
+    El módulo no importa config para que las páginas de prueba lo usen sin los secretos."""
+    global _cliente
+    if _cliente is not None:
+        _cliente.cerrar()
+    _cliente = ClienteHTTP(**opciones)
+
+
+def post_json(url: str, payload, **kwargs) -> requests.Response:
+    return cliente().post_json(url, payload, **kwargs)
+
+
+def post_multipart(url: str, files: dict, **kwargs) -> requests.Response:
+    return cliente().post_multipart(url, files, **kwargs)
+
+
+def get_json(url: str, **kwargs):
+    return cliente().get_json(url, **kwargs)
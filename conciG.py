@@ -1,12 +1,24 @@
 import streamlit as st
 import pandas as pd
 import requests
-from datetime import datetime, timedelta
+from datetime import datetime
 import pytz
-from io import BytesIO
 import time
-import re
+import functools
+from contextlib import contextmanager, nullcontext
 import config
+import bandeja
+import datos_referencia
+import envio_eecc
+import cache_lecturas
+import cliente_http
+import ingesta
+import motor_conciliacion
+import planificador
+import procesos
+import tiempos
+import trabajos
+import validacion_eecc
 
 
 def cargar_css(ruta: str):
@@ -23,7 +35,7 @@ st.set_page_config(
 
 cargar_css("style.css")
 
-TIMEZONE = pytz.timezone('America/Lima')
+TIMEZONE = config.TIMEZONE
 
 # Inicializar session_state
 if "authenticated" not in st.session_state:
@@ -34,14 +46,68 @@ if "authenticated" not in st.session_state:
     st.session_state.modulo = None
     st.session_state.ciclo_seleccionado = None
 
+@st.cache_resource
+def obtener_cliente_http():
+    """Cliente HTTP del proceso: pool keep-alive por host compartido entre sesiones y reruns"""
+    return cliente_http.ClienteHTTP(config.HTTP_CONEXIONES_POR_HOST, config.HTTP_REINTENTOS_GET,
+                                    config.HTTP_BACKOFF_SEGUNDOS)
+
+def _cargar_colaboradores(cliente):
+    filas = cliente.get_json(
+        f"{config.BBDD_COLABORADORES_URL}/rest/v1/{config.TABLA_COLABORADORES}",
+        headers={
+            "apikey": config.BBDD_COLABORADORES_KEY,
+            "Authorization": f"Bearer {config.BBDD_COLABORADORES_KEY}",
+        },
+        params={
+            "select": config.COLUMNA_COLABORADORES,
+            "order":  f"{config.COLUMNA_COLABORADORES}.asc",
+        },
+        timeout=config.TIMEOUTS_HTTP["colaboradores"],
+    )
+    return [row[config.COLUMNA_COLABORADORES] for row in filas]
+
+@st.cache_resource
+def obtener_datos_referencia():
+    """Datos de referencia compartidos por todas las sesiones; se recargan en segundo plano al vencer"""
+    referencia = datos_referencia.DatosReferencia()
+    # el cliente se toma aquí: las cargas corren en hilos sin contexto de Streamlit
+    cliente = obtener_cliente_http()
+    # fallback al hardcode mientras carga o si la BBDD externa no responde
+    referencia.registrar("colaboradores", lambda: _cargar_colaboradores(cliente),
+                         config.TTL_COLABORADORES_SEGUNDOS, respaldo=config.OPERADORES)
+    # por ahora estática; cuando exista en BBDD basta con cambiar la función de carga
+    referencia.registrar("colores_banco", lambda: dict(config.COLORES_BANCO),
+                         config.TTL_METADATA_BANCOS_SEGUNDOS, respaldo=config.COLORES_BANCO)
+    return referencia
+
+def _consultar_ciclos(cliente, params):
+    return cliente.get_json(
+        f"{config.SUPABASE_URL}/rest/v1/ciclo_ejecucion",
+        headers={
+            "apikey": config.SUPABASE_KEY,
+            "Authorization": f"Bearer {config.SUPABASE_KEY}",
+            "Accept-Profile": config.SCHEMA,
+        },
+        params=params,
+        timeout=config.TIMEOUTS_HTTP["supabase"],
+    )
+
+@st.cache_resource
+def obtener_bandeja():
+    """Bandeja de fallos del servidor: un solo hilo consulta Supabase y todas las sesiones leen la instantánea"""
+    cliente = obtener_cliente_http()
+    return bandeja.BandejaFallos(lambda params: _consultar_ciclos(cliente, params),
+                                 config.BANDEJA_REFRESCO_SEGUNDOS,
+                                 filas_por_pagina=config.BANDEJA_FILAS_POR_PAGINA,
+                                 resincronizar_cada=config.BANDEJA_RESINCRONIZAR_CADA,
+                                 columna_cambio=config.BANDEJA_COLUMNA_CAMBIO)
+
 def send_to_n8n(endpoint, data):
     """Envía datos al webhook de n8n"""
     try:
-        response = requests.post(
-            endpoint,
-            json=data,
-            timeout=5,
-            headers={'Content-Type': 'application/json'}
+        response = obtener_cliente_http().post_json(
+            endpoint, data, timeout=config.TIMEOUTS_HTTP["login"], **config.compresion_webhook("login")
         )
         return response.status_code == 200
     except Exception:
@@ -93,131 +159,177 @@ def extraer_origen_de_codigo(codigo_unico):
         return "GMONEY"
     return "DESCONOCIDO"
 
-def validar_y_mapear_eecc(df, banco_codigo, ciclo):
-    # Verificar que el banco tiene mapeo definido
-    if banco_codigo not in config.COLUMNAS_BANCO:
-        return df, [{"fila": "-", "columna": banco_codigo, "valor": None,
-                     "motivo": "Banco sin mapeo de columnas definido — contactar al equipo técnico"}]
-
-    mapa = config.COLUMNAS_BANCO[banco_codigo]
-
-    # Columnas que deben venir del archivo (valor != None)
-    cols_archivo = {k: v for k, v in mapa.items() if v is not None}
+def enviar_a_n8n(df_mapeado, ciclo, operador, medicion=None):
+    """Envía el EECC mapeado por lotes; un reintento solo reenvía los lotes que n8n no confirmó"""
+    medicion = medicion or tiempos.Medicion("eecc", st.session_state.get("session_id"))
+    with medicion.etapa("serializar_csv", filas=len(df_mapeado)):
+        payloads = envio_eecc.payloads_lotes(df_mapeado, ciclo, operador, config.EECC_FILAS_POR_LOTE)
+
+    # progreso por envío (ciclo + contenido), sobrevive a los reruns y al "Reintentar"
+    huella = envio_eecc.huella_envio(df_mapeado, ciclo["ciclo_id"])
+    confirmados = st.session_state.setdefault("progreso_envio_eecc", {}).setdefault(huella, set())
+    tamanos = []
+    cliente = obtener_cliente_http()   # _post corre en hilos sin contexto de Streamlit
+
+    def _post(payload):
+        resp = cliente.post_json(
+            config.N8N_WEBHOOK_EECC, payload, timeout=config.TIMEOUTS_HTTP["eecc"],
+            headers={"Idempotency-Key": payload["idempotency_key"]},
+            **config.compresion_webhook("eecc"),
+        )
+        tamanos.append(tiempos.bytes_respuesta(resp))
+        return resp.status_code in (200, 201)
+
+    with medicion.etapa("post_n8n_eecc", filas=len(df_mapeado)) as et:
+        errores = envio_eecc.enviar_lotes(payloads, _post, confirmados, config.EECC_LOTES_CONCURRENTES)
+        et["bytes_enviados"] = sum(e for e, _ in tamanos)
+        et["bytes_recibidos"] = sum(r for _, r in tamanos)
+    if errores:
+        primero = min(errores)
+        return False, f"{len(errores)} de {len(payloads)} lotes sin confirmar, desde el lote {primero + 1}: {errores[primero]}"
+    return True, 200
+
+def conciliar_diaria_local(df_metabase, df_gmoney, columnas, medicion, ejecutar):
+    """Conciliación diaria en el servidor (corre como trabajo; el cálculo, en el pool de procesos)"""
+    with medicion.etapa("conciliar_diaria", filas=len(df_metabase) + len(df_gmoney)):
+        return [ejecutar(motor_conciliacion.conciliar_diaria, df_metabase, df_gmoney, columnas)]
+
+def post_conciliacion_n8n(cliente, files, session_metadata, medicion):
+    """Conciliación diaria en n8n (corre como trabajo); los errores vuelven como mensaje para el operador"""
+    try:
+        with medicion.etapa("post_n8n_conciliacion") as et:
+            response = cliente.post_multipart(
+                config.N8N_CONCILIACION,
+                files=files,
+                data=session_metadata,
+                timeout=config.TIMEOUTS_HTTP["conciliacion"],
+                **config.compresion_webhook("conciliacion"),
+            )
+            et["bytes_enviados"], et["bytes_recibidos"] = tiempos.bytes_respuesta(response)
+        response.raise_for_status()
+    except requests.exceptions.Timeout:
+        raise RuntimeError("La solicitud tardó demasiado. Intenta nuevamente.") from None
+    except requests.exceptions.RequestException as e:
+        raise RuntimeError(f"Error al conectar con n8n: {e}") from None
+    try:
+        with medicion.etapa("decodificar_json"):
+            return cliente_http.json_respuesta(response)
+    except ValueError:
+        raise RuntimeError(f"El webhook no devolvió un JSON válido: {response.text[:500]}") from None
+
+def registrar_payins_online_n8n(cliente, cuerpo, medicion):
+    """Persistencia opcional de PayIns Online en n8n (corre como trabajo)"""
+    with medicion.etapa("post_n8n_payins_online") as et:
+        response = cliente.post_json(
+            config.N8N_PAYINS_ONLINE_V2, cuerpo, timeout=config.TIMEOUTS_HTTP["payins_online"],
+            **config.compresion_webhook("payins_online"),
+        )
+        et["bytes_enviados"], et["bytes_recibidos"] = tiempos.bytes_respuesta(response)
+    response.raise_for_status()
+
+@st.cache_resource
+def obtener_planificador():
+    """Control de admisión de operaciones pesadas, compartido por todas las sesiones del servidor"""
+    return planificador.Planificador(
+        config.PLANIFICADOR_LIMITES, config.PLANIFICADOR_LIMITE_USUARIO,
+        config.PLANIFICADOR_MEMORIA_MB * 1024 ** 2,
+    )
 
-    # Verificar columnas nativas requeridas
-    df.columns = df.columns.str.strip()
-    if banco_codigo in config.PREPROCESADORES_BANCO:
+def memoria_estimada(*archivos):
+    """Memoria pico estimada de procesar los archivos subidos (acepta archivos o listas de archivos)"""
+    planos = [a for grupo in archivos for a in (grupo if isinstance(grupo, list) else [grupo]) if a is not None]
+    return planificador.estimar_memoria([(a.name, a.size) for a in planos], config.PLANIFICADOR_FACTOR_MEMORIA)
+
+@contextmanager
+def turno_operacion(tipo, memoria_bytes):
+    """Espera turno en el planificador mostrando la posición en la cola; el bloque corre ya admitido"""
+    aviso = st.empty()
+    with obtener_planificador().turno(
+        tipo, st.session_state.get("user"), memoria_bytes,
+        al_esperar=lambda pos: aviso.info(f"⏳ En cola (posición {pos}): el servidor está procesando otras conciliaciones"),
+    ):
+        aviso.empty()
+        yield
+
+@st.cache_resource
+def obtener_pool_procesos():
+    """Pool de procesos del servidor para parseo, validación y conciliación (libera el GIL de la UI)"""
+    return procesos.PoolProcesos(config.PROCESOS_CPU, config.PROCESOS_EN_VUELO)
+
+def en_proceso(funcion, *args, **kwargs):
+    """Corre una etapa pesada de CPU en el pool de procesos; se cancela al cerrar la sesión"""
+    return obtener_pool_procesos().ejecutar(st.session_state.get("session_id"), funcion, *args, **kwargs)
+
+def en_proceso_compactado(funcion, *args, **kwargs):
+    """`en_proceso` para un lector: devuelve (frame compactado, dtypes) tal como lo compactó el worker"""
+    return obtener_pool_procesos().ejecutar_compactado(st.session_state.get("session_id"), funcion, *args, **kwargs)
+
+def mapear_en_procesos(funcion, lista_args):
+    """`funcion(*args)` para cada tupla de `lista_args` en el pool de procesos, en paralelo"""
+    return obtener_pool_procesos().mapear(st.session_state.get("session_id"), funcion, lista_args)
+
+def ejecutor_de_trabajo():
+    """`en_proceso` para usar dentro de un trabajo (sus hilos no ven st.session_state)"""
+    return functools.partial(obtener_pool_procesos().ejecutar, st.session_state.get("session_id"))
+
+@st.cache_resource
+def obtener_trabajos():
+    """Trabajos en segundo plano del servidor; sobreviven a recargas del navegador y re-logins"""
+    return trabajos.GestorTrabajos(config.TRABAJOS_HILOS, config.TRABAJOS_RETENCION_SEGUNDOS)
+
+def lanzar_trabajo(flujo, funcion, *args, medicion=None, memoria_bytes=0):
+    """Encola `funcion(*args)` como trabajo del flujo y devuelve su id; la medición pasa al trabajo.
+    Dentro del trabajo se espera turno en el planificador antes de correr."""
+    if medicion is not None:
+        st.session_state.setdefault("mediciones_en_curso", {}).pop(medicion.flujo, None)
+    plan = obtener_planificador()
+    usuario = st.session_state.get("user")
+    extra = {"medicion": medicion, "turno": None}
+
+    def _ejecutar():
+        # el turno se pide ya dentro del hilo: un turno admitido siempre tiene hilo que lo corra
+        extra["turno"] = plan.solicitar(flujo, usuario, memoria_bytes)
         try:
-            df = config.PREPROCESADORES_BANCO[banco_codigo](df)
-        except ValueError as e:
-            return df, [{"fila": "-", "columna": "preprocesador", "valor": None, "motivo": str(e)}]
-    faltantes = [v for v in cols_archivo.values() if v not in df.columns]
-    if faltantes:
-        cols_reales = ", ".join(str(c) for c in df.columns.tolist())
-        return df, [{"fila": "-", "columna": ", ".join(faltantes), "valor": None,
-                     "motivo": f"Columnas requeridas ausentes. Columnas reales del archivo: {cols_reales}"}]
-
-    # Renombrar al esquema eecc_unificado
-    df = df.rename(columns={v: k for k, v in cols_archivo.items()})
-
-    # Agregar columnas hardcodeadas
-    df["banco_codigo"]  = ciclo["banco_codigo"]
-    df["cuenta_origen"] = ciclo.get("cuenta_origen")
-    df["pais"]          = "PE"
-
-    # Ventana dinámica: hora anterior a la hora actual en Lima
-    ahora       = datetime.now(TIMEZONE).replace(tzinfo=None)
-    hora_fin    = ahora.replace(minute=0, second=0, microsecond=0)
-    hora_inicio = hora_fin - timedelta(hours=1)
-
-    df["_datetime_op"] = pd.to_datetime(
-        df["fecha_operacion"].astype(str).str.strip(),
-        dayfirst=True, errors="coerce"
+            plan.esperar(extra["turno"])
+            return funcion(*args)
+        finally:
+            plan.liberar(extra["turno"])
+            if medicion is not None:
+                medicion.guardar(config.LOG_TIEMPOS)
+
+    return obtener_trabajos().enviar(
+        flujo, st.session_state.get("session_id"), usuario, _ejecutar, extra=extra,
     )
 
-    df = df[(df["_datetime_op"] >= hora_inicio) & (df["_datetime_op"] < hora_fin)].copy()
-    df["fecha_operacion"] = df["_datetime_op"].dt.strftime("%Y-%m-%d %H:%M:%S")
-    df = df.drop(columns=["_datetime_op"], errors="ignore")
-
-    if df.empty:
-        return df, [{"fila": "-", "columna": "ventana",
-                     "valor": f"{ciclo['ventana_inicio']} → {ciclo['ventana_fin']}",
-                     "motivo": "Ningún registro del archivo corresponde a la fecha de esta ventana"}]
-
-    # Validar por fila
-    errores = []
-    for i, fila in df.iterrows():
-        nro = i + 2
-
-        def err(col, val, motivo, _nro=nro):
-            errores.append({"fila": _nro, "columna": col, "valor": val, "motivo": motivo})
-
-        v = fila.get("operacion_id")
-        if pd.isna(v):
-            err("operacion_id", v, "Campo obligatorio ausente")
-
-        fecha = fila.get("fecha_operacion")
-        if pd.isna(fecha):
-            err("fecha_operacion", fecha, "Campo obligatorio ausente")
-        else:
-            try:
-                pd.to_datetime(fecha)
-            except Exception:
-                err("fecha_operacion", fecha, "No es una fecha válida")
-
-        monto = fila.get("amount")
-        if pd.isna(monto):
-            err("amount", monto, "Campo obligatorio ausente")
-        else:
-            try:
-                if float(monto) <= 0:
-                    err("amount", monto, "Debe ser mayor a 0")
-            except (ValueError, TypeError):
-                err("amount", monto, "No es un valor numérico")
-
-        moneda = fila.get("moneda")
-        if pd.isna(moneda) or not re.fullmatch(r"[A-Z]{3}", str(moneda)):
-            err("moneda", moneda, "Debe ser exactamente 3 letras mayúsculas")
-
-        psptin = fila.get("psptin")
-        if psptin is not None and not pd.isna(psptin):
-            psptin_str = str(psptin).strip()
-            esperado = 28 if banco_codigo == "GMONEY" else 12
-            if not psptin_str.isdigit() or len(psptin_str) != esperado:
-                err("psptin", psptin, f"Debe tener exactamente {esperado} dígitos para {banco_codigo}")
-
-    COLUMNAS_EECC = [
-        # esquema eecc_unificado
-        "banco_codigo", "cuenta_origen", "operacion_id",
-        "pais", "fecha_operacion", "amount", "moneda", "psptin",
-        # passthrough → n8n los necesita
-        "created_at", "updated_at", "origin_name", "origin_type",
-        "origin_document", "operation", "fee", "status",
-    ]
-    df_mapeado = df[[col for col in COLUMNAS_EECC if col in df.columns]]
-    return df_mapeado, errores
-
-def enviar_a_n8n(df_mapeado, ciclo, operador):
-    df_send = df_mapeado.rename(columns={"operacion_id": "instruction_id"})
-    contenido_csv = df_send.to_csv(index=False)
-
-    payload = {
-        "ciclo_id":       ciclo["ciclo_id"],
-        "banco_codigo":   ciclo["banco_codigo"],
-        "cuenta_origen":  ciclo.get("cuenta_origen") or ciclo.get("cuenta"),
-        "origen_ingesta": "MANUAL",
-        "status":         "success",
-        "error_code":     "",
-        "total_records":  str(len(df_mapeado)),
-        "operador":       operador,
-        "contenido":      contenido_csv,
-    }
-
-    try:
-        resp = requests.post(config.N8N_WEBHOOK_EECC, json=payload, timeout=30)
-        return resp.status_code in (200, 201), resp.status_code
-    except Exception as e:
-        return False, str(e)
+@st.fragment(run_every=config.TRABAJOS_SONDEO_SEGUNDOS)
+def seguir_trabajo(trabajo_id, mensaje):
+    """Sondea el trabajo sin re-ejecutar la app; cuando termina re-ejecuta la app para mostrar el resultado"""
+    trabajo = obtener_trabajos().obtener(trabajo_id)
+    if trabajo is None or trabajo["estado"] in trabajos.ESTADOS_TERMINALES:
+        st.rerun()
+    posicion = obtener_planificador().posicion(trabajo["extra"]["turno"]) if trabajo["extra"].get("turno") else None
+    if posicion:
+        en_cola = f" (en cola, posición {posicion})"
+    else:
+        en_cola = " (en cola)" if posicion is None else ""
+    st.info(f"⏳ {mensaje}{en_cola} {int(time.time() - trabajo['creado'])} s · trabajo {trabajo_id[:8]}")
+
+def trabajo_del_flujo(flujo, mensaje):
+    """Último trabajo terminado del flujo para esta sesión (o del usuario, tras recargar o volver a
+    entrar). Si sigue en curso muestra su avance y devuelve None."""
+    trabajo = obtener_trabajos().ultimo(flujo, st.session_state.get("session_id"), st.session_state.get("user"))
+    if trabajo is None:
+        return None
+    if trabajo["estado"] not in trabajos.ESTADOS_TERMINALES:
+        seguir_trabajo(trabajo["id"], mensaje)
+        return None
+    # la medición del trabajo pasa al panel de tiempos una sola vez
+    vistos = st.session_state.setdefault("trabajos_vistos", set())
+    if trabajo["id"] not in vistos:
+        vistos.add(trabajo["id"])
+        if trabajo["extra"].get("medicion") is not None:
+            st.session_state.ultima_medicion = trabajo["extra"]["medicion"]
+    return trabajo
 
 @st.dialog("Resultado de validación", width="large")
 def mostrar_validacion(errores, df_mapeado):
@@ -243,6 +355,278 @@ def mostrar_validacion(errores, df_mapeado):
             st.rerun()
 
 
+def mostrar_tiempos_lectura(tiempos):
+    """Muestra el tiempo de parseo de cada archivo subido (o de servirlos desde el caché)"""
+    total = sum(t["segundos"] for t in tiempos)
+    with st.expander(f"⏱️ Lectura de {len(tiempos)} archivo(s) — {total:.2f} s"):
+        st.dataframe(pd.DataFrame(tiempos), use_container_width=True, hide_index=True)
+
+
+@st.cache_resource
+def obtener_cache_lecturas():
+    """Caché de archivos parseados compartido por todas las sesiones del servidor"""
+    return cache_lecturas.CacheLecturas(config.CACHE_LECTURAS_MB * 1024 ** 2)
+
+
+def _leer_con_cache(medicion, nombre, contenidos, lector, opciones, memoria_bytes, cargar):
+    """Pasa por el caché de lecturas y registra la etapa también cuando el archivo ya estaba en
+    caché (`en_cache`). Solo el parseo espera turno en el planificador (`espera_turno_segundos`);
+    `cargar()` devuelve (frame compactado, dtypes) armado en el pool de procesos."""
+    with (medicion.etapa(nombre) if medicion is not None else nullcontext({})) as et:
+        et["en_cache"] = True
+
+        def _cargar():
+            et["en_cache"] = False
+            t0 = time.perf_counter()
+            with turno_operacion("lectura", memoria_bytes):
+                et["espera_turno_segundos"] = round(time.perf_counter() - t0, 4)
+                return cargar()
+
+        df = obtener_cache_lecturas().obtener(contenidos, lector, opciones, _cargar, compactado=True)
+        et["filas"] = len(df)
+        et["bytes_recibidos"] = sum(len(c) for c in contenidos)
+    return df, et
+
+
+def leer_subido(archivo, lector, cargar, medicion=None):
+    """Parsea un archivo subido a lo sumo una vez por servidor (llave: hash del contenido + lector).
+    `cargar()` devuelve el frame compactado, p. ej. con `en_proceso_compactado`."""
+    df, _ = _leer_con_cache(medicion, f"lectura_{lector}", [archivo.getvalue()], lector,
+                            {"extension": archivo.name.rsplit(".", 1)[-1]}, memoria_estimada(archivo), cargar)
+    return df
+
+
+def leer_metabase_subido(archivos, medicion=None):
+    """Lee los exports de Metabase subidos pasando por el caché de lecturas"""
+    contenidos = [a.getvalue() for a in archivos]
+    tiempos_archivos = []
+
+    def _cargar():
+        compacto, t = ingesta.leer_metabase([(a.name, c) for a, c in zip(archivos, contenidos)],
+                                            mapear=mapear_en_procesos, compactado=True)
+        tiempos_archivos.extend(t)
+        return compacto
+
+    opciones = {"extensiones": tuple(a.name.rsplit(".", 1)[-1] for a in archivos)}
+    df, et = _leer_con_cache(medicion, "lectura_metabase", contenidos, "metabase", opciones,
+                             memoria_estimada(list(archivos)), _cargar)
+    if not et["en_cache"]:
+        mostrar_tiempos_lectura(tiempos_archivos)
+    elif "segundos" in et:
+        mostrar_tiempos_lectura([{"archivo": ", ".join(a.name for a in archivos), "motor": "caché",
+                                  "filas": len(df), "segundos": et["segundos"]}])
+    return df
+
+
+def medicion_en_curso(flujo):
+    """Medición de tiempos abierta del flujo; acumula las lecturas hasta que se ejecuta la conciliación"""
+    mediciones = st.session_state.setdefault("mediciones_en_curso", {})
+    if flujo not in mediciones or mediciones[flujo].session_id != st.session_state.get("session_id"):
+        mediciones[flujo] = tiempos.Medicion(flujo, st.session_state.get("session_id"), st.session_state.get("user"))
+    return mediciones[flujo]
+
+
+def cerrar_medicion(medicion):
+    """Escribe la corrida en el log de tiempos y la deja para el panel del admin"""
+    medicion.guardar(config.LOG_TIEMPOS)
+    st.session_state.ultima_medicion = medicion
+    st.session_state.setdefault("mediciones_en_curso", {}).pop(medicion.flujo, None)
+
+
+def mostrar_panel_tiempos(flujo):
+    """Desglose de tiempos de la última corrida del flujo (solo rol admin)"""
+    medicion = st.session_state.get("ultima_medicion")
+    if st.session_state.get("user_type") != "admin" or medicion is None or medicion.flujo != flujo:
+        return
+    with st.expander(f"⏱️ Tiempos de la última corrida — {medicion.total_segundos():.2f} s"):
+        st.dataframe(
+            pd.DataFrame(medicion.etapas)[["etapa", "segundos", "filas", "bytes_enviados", "bytes_recibidos"]],
+            use_container_width=True, hide_index=True,
+        )
+
+
+def actualizar_conciliador_horario(df_metabase, df_panda, medicion):
+    """Pasa los archivos actuales al conciliador por hora de la sesión (solo procesa filas y horas nuevas)"""
+    conciliador = st.session_state.setdefault("conciliador_horario", motor_conciliacion.ConciliadorHorario())
+    with medicion.etapa("conciliacion_por_hora", filas=len(df_metabase) + len(df_panda)) as et:
+        dt_met, dt_panda = conciliador.actualizar(df_metabase, df_panda, ejecutar=en_proceso)
+        et["filas"] = conciliador.filas_nuevas
+    return dt_met, dt_panda
+
+
+def obtener_metabase_consolidado(archivos, df_metabase):
+    """Devuelve el Metabase consolidado para n8n, serializado una sola vez por conjunto de archivos"""
+    clave = cache_lecturas.huella([a.getvalue() for a in archivos], "consolidado",
+                                  {"formato": config.FORMATO_METABASE_N8N})
+    cache = st.session_state.get("metabase_consolidado")
+    if cache is None or cache[0] != clave:
+        cache = (clave, ingesta.serializar_metabase(df_metabase, config.FORMATO_METABASE_N8N))
+        st.session_state.metabase_consolidado = cache
+    return cache[1]
+
+
+def mostrar_bandeja_compacta(ciclos, ahora):
+    """Bandeja como una sola tabla paginada (muchos fallos): filtro por banco y cuenta, selección por fila"""
+    por_id = {c["ciclo_id"]: c for c in ciclos}
+    tabla = bandeja.tabla_ciclos(ciclos, ahora)
+    fallos_banco = tabla["Banco"].value_counts()
+
+    col_banco, col_buscar, col_agrupar = st.columns([4, 3, 2])
+    bancos = col_banco.multiselect(
+        "Banco", fallos_banco.index.tolist(), key="bandeja_bancos", placeholder="Todos",
+        format_func=lambda b: f"{b} ({fallos_banco[b]})",
+    )
+    buscar = col_buscar.text_input("Buscar cuenta o ciclo", key="bandeja_buscar").strip()
+    agrupar = col_agrupar.toggle("Agrupar por banco", key="bandeja_agrupar")
+
+    if bancos:
+        tabla = tabla[tabla["Banco"].isin(bancos)]
+    if buscar:
+        tabla = tabla[tabla["Cuenta"].astype(str).str.contains(buscar, case=False, regex=False)
+                      | tabla["ciclo_id"].astype(str).str.contains(buscar, case=False, regex=False)]
+    if agrupar:
+        tabla = tabla.sort_values(["Banco", "segundos"], kind="stable")
+
+    # solo la página visible viaja al navegador
+    paginas = max(1, -(-len(tabla) // config.BANDEJA_FILAS_POR_VISTA))
+    if st.session_state.get("bandeja_pagina", 1) > paginas:
+        st.session_state.bandeja_pagina = paginas
+    pagina = st.number_input("Página", min_value=1, max_value=paginas, step=1, key="bandeja_pagina")
+    vista = tabla.iloc[(pagina - 1) * config.BANDEJA_FILAS_POR_VISTA:pagina * config.BANDEJA_FILAS_POR_VISTA]
+    st.caption(f"{len(tabla)} de {len(ciclos)} fallos · página {pagina} de {paginas} · "
+               "selecciona una fila para resolver la contingencia")
+
+    # la llave cambia tras cada selección para que la tabla vuelva sin fila marcada
+    version = st.session_state.get("bandeja_tabla_version", 0)
+    evento = st.dataframe(
+        vista,
+        column_order=["Banco", "Cuenta", "Monitoreo", "Detectado hace", "Restante"],
+        column_config={"Restante": st.column_config.TextColumn("⏱ Restante")},
+        hide_index=True,
+        use_container_width=True,
+        on_select="rerun",
+        selection_mode="single-row",
+        key=f"bandeja_tabla_{version}",
+    )
+    if evento.selection.rows:
+        st.session_state.bandeja_tabla_version = version + 1
+        st.session_state.ciclo_seleccionado = por_id[vista.iloc[evento.selection.rows[0]]["ciclo_id"]]
+        st.rerun()
+
+
+@st.fragment(run_every=config.BANDEJA_VISTA_SEGUNDOS)
+def mostrar_bandeja():
+    """Bandeja de fallos. Se re-renderiza sola cada BANDEJA_VISTA_SEGUNDOS leyendo la instantánea
+    compartida (sin red): las cuentas regresivas siguen vivas sin re-ejecutar la app"""
+    ciclos, edad_bandeja, error_bandeja = obtener_bandeja().instantanea(
+        esperar_segundos=config.TIMEOUTS_HTTP["supabase"][1]
+    )
+    if edad_bandeja is None:
+        st.error(f"No se pudo conectar con Supabase: {error_bandeja or 'sin respuesta'}")
+        return
+    if error_bandeja:
+        st.warning(f"⚠️ No se pudo actualizar la bandeja ({error_bandeja}); se muestran los últimos datos")
+    st.caption(f"Bandeja actualizada hace {int(edad_bandeja)} s")
+
+    ahora = datetime.now(TIMEZONE)
+
+    COLORES_BANCO = obtener_datos_referencia().obtener("colores_banco")
+
+    def _secs_restantes(ciclo):
+        try:
+            vf = datetime.fromisoformat(ciclo["ventana_fin"])
+            if vf.tzinfo is None:
+                vf = TIMEZONE.localize(vf)
+            return max(0.0, (vf - ahora).total_seconds())
+        except Exception:
+            return 0.0
+
+    ciclos_ordenados = sorted(ciclos, key=_secs_restantes)
+
+    # --- Métricas de cabecera ---
+    secs_urgente = _secs_restantes(ciclos_ordenados[0]) if ciclos_ordenados else 0
+    mm_u, ss_u   = int(secs_urgente // 60), int(secs_urgente % 60)
+    tiempo_str   = f"{mm_u:02d}:{ss_u:02d}" if ciclos_ordenados else "—"
+
+    m1, m2, m3 = st.columns(3)
+    m1.metric("Fallos pendientes",    len(ciclos_ordenados))
+    m2.metric("Resueltos hoy",        "—")
+    m3.metric("Tiempo máx. restante", tiempo_str)
+
+    st.divider()
+
+    if not ciclos_ordenados:
+        st.success("✅ Sin fallos activos — el sistema está operando con normalidad")
+    elif len(ciclos_ordenados) >= config.BANDEJA_COMPACTA_DESDE:
+        mostrar_bandeja_compacta(ciclos, ahora)
+    else:
+        st.markdown("**FALLOS ACTIVOS — ORDENADOS POR URGENCIA**")
+        st.caption("Selecciona un fallo para resolver la contingencia manualmente.")
+        st.write("")
+
+        for ciclo in ciclos_ordenados:
+            try:
+                vi    = datetime.fromisoformat(ciclo["ventana_inicio"]).strftime("%H:%M")
+                vf_dt = datetime.fromisoformat(ciclo["ventana_fin"])
+                if vf_dt.tzinfo is None:
+                    vf_dt = TIMEZONE.localize(vf_dt)
+                vf = vf_dt.strftime("%H:%M")
+            except (ValueError, TypeError):
+                vi, vf = "?", "?"
+
+            try:
+                created = datetime.fromisoformat(ciclo["created_at"])
+                if created.tzinfo is None:
+                    created = pytz.utc.localize(created)
+                mins_creado = int((ahora - created.astimezone(TIMEZONE)).total_seconds() // 60)
+                elapsed = f"{mins_creado} min" if mins_creado < 60 else f"{mins_creado // 60}h {mins_creado % 60}min"
+            except (ValueError, TypeError):
+                elapsed = "?"
+
+            cuenta  = ciclo.get("cuenta_origen") or "—"
+            banco   = ciclo["banco_codigo"]
+            color   = COLORES_BANCO.get(banco, "#6B7280")
+            secs_r  = _secs_restantes(ciclo)
+            mm_r, ss_r = int(secs_r // 60), int(secs_r % 60)
+            fecha_monitoreo = (
+                datetime.fromisoformat(ciclo["ventana_inicio"]).strftime("%H:%M")
+                + " · " + ahora.strftime("%d %b %Y")
+            )
+
+            with st.container(border=True):
+                col_info, col_accion = st.columns([7, 2])
+
+                with col_info:
+                    st.markdown(
+                        f"<div style='display:flex;align-items:center;gap:16px'>"
+                        f"<div style='background:{color};border-radius:10px;min-width:56px;height:56px;"
+                        f"display:flex;align-items:center;justify-content:center;"
+                        f"font-weight:700;font-size:16px;color:#fff;flex-shrink:0'>{banco[:3]}</div>"
+                        f"<div>"
+                        f"<div><strong>{banco}</strong> &nbsp;·&nbsp;"
+                        f"<span style='color:gray;font-size:0.85em'>{cuenta}</span></div>"
+                        f"<div style='color:gray;font-size:0.8em;margin-top:3px'>Hora de monitoreo {fecha_monitoreo}</div>"
+                        f"<div style='color:gray;font-size:0.8em;margin-top:2px'>Fallo detectado hace {elapsed}</div>"
+                        f"</div></div>",
+                        unsafe_allow_html=True
+                    )
+
+                with col_accion:
+                    st.markdown(
+                        f"<div style='color:#F59E0B;font-size:0.82em;text-align:right;"
+                        f"margin-bottom:6px'>⏱ {mm_r:02d}:{ss_r:02d} restantes</div>",
+                        unsafe_allow_html=True
+                    )
+                    if st.button("Resolver »", key=f"resolver_{ciclo['ciclo_id']}",
+                                 type="primary", use_container_width=True):
+                        st.session_state.ciclo_seleccionado = ciclo
+                        st.rerun()
+
+    st.write("")
+    if st.button("↻ Refrescar bandeja", key="refrescar_bandeja"):
+        obtener_bandeja().refrescar(esperar_segundos=config.TIMEOUTS_HTTP["supabase"][1])
+        st.rerun(scope="fragment")
+
 @st.dialog("Login – Conciliación GMoney")
 def login_dialog():
     st.markdown("### Inicio de Sesión")
@@ -305,6 +689,8 @@ def login_dialog():
 
 def logout():
     """Cierra la sesión del usuario"""
+    # lo que la sesión tenga en el pool de procesos ya no le sirve a nadie
+    obtener_pool_procesos().cancelar(st.session_state.get("session_id"))
     st.session_state.clear()
     st.rerun()
 
@@ -353,14 +739,10 @@ if 'df_mapeado' not in st.session_state:
     st.session_state.df_mapeado = None
 if 'carga_confirmada' not in st.session_state:
     st.session_state.carga_confirmada = False
-if 'met_online_key' not in st.session_state:
-    st.session_state.met_online_key = None
-    st.session_state.df_met_online_cache = None
-if 'panda_online_key' not in st.session_state:
-    st.session_state.panda_online_key = None
-    st.session_state.df_panda_cashin_cache = None
 if 'conciliacion_hora' not in st.session_state:
     st.session_state.conciliacion_hora = None
+if 'backfill_estado' not in st.session_state:
+    st.session_state.backfill_estado = None
 
 # -----------------------
 # TOPBAR
@@ -441,25 +823,8 @@ if st.session_state.modulo == "eecc":
         # Hardcodeado — descomentar bloque Supabase cuando esté disponible
         # colaboradores = config.OPERADORES
 
-        #BBDD externa (prod) — completar config.TABLA_COLABORADORES y config.COLUMNA_COLABORADORES y descomentar
-        try:
-            resp = requests.get(
-                f"{config.BBDD_COLABORADORES_URL}/rest/v1/{config.TABLA_COLABORADORES}",
-                headers={
-                    "apikey": config.BBDD_COLABORADORES_KEY,
-                    "Authorization": f"Bearer {config.BBDD_COLABORADORES_KEY}",
-                    "Accept": "application/json",
-                },
-                params={
-                    "select": config.COLUMNA_COLABORADORES,
-                    "order":  f"{config.COLUMNA_COLABORADORES}.asc",
-                },
-                timeout=10,
-            )
-            resp.raise_for_status()
-            colaboradores = [row[config.COLUMNA_COLABORADORES] for row in resp.json()]
-        except Exception:
-            colaboradores = config.OPERADORES  # fallback al hardcode
+        #BBDD externa (prod) — caché compartido; nunca espera a la BBDD (usa config.OPERADORES mientras carga)
+        colaboradores = list(obtener_datos_referencia().obtener("colaboradores"))
 
         operador = st.selectbox(
             "👤 Colaborador",
@@ -491,24 +856,30 @@ if st.session_state.modulo == "eecc":
             ):
                 st.session_state.archivo_eecc = archivo
                 st.session_state.operador_eecc = operador
-                if archivo.name.endswith(".xlsx"):
-                    df = pd.read_excel(archivo)
-                else:
-                    df = pd.read_csv(archivo, sep=None, engine="python")
-                df.columns = df.columns.str.strip()
-                # Limpiar formato de fórmula Excel: ="valor" → valor
-                for col in df.select_dtypes(include="object").columns:
-                    df[col] = df[col].str.replace(r'^="(.*)"$', r'\1', regex=True)
-                df_mapeado, errores = validar_y_mapear_eecc(df, ciclo["banco_codigo"], ciclo)
+                medicion = medicion_en_curso("eecc")
+                df = leer_subido(
+                    archivo, "eecc",
+                    lambda: en_proceso_compactado(ingesta.leer_eecc, archivo.name, archivo.getvalue()),
+                    medicion,
+                )
+                with turno_operacion("eecc", memoria_estimada(archivo)), \
+                        medicion.etapa("validar_y_mapear_eecc", filas=len(df)):
+                    df_mapeado, errores = en_proceso(
+                        validacion_eecc.validar_y_mapear_eecc, df, ciclo["banco_codigo"], ciclo
+                    )
                 mostrar_validacion(errores, df_mapeado)
         else:
             if st.session_state.carga_confirmada:
-                with st.spinner("Enviando operaciones al orquestador..."):
+                medicion = medicion_en_curso("eecc")
+                with turno_operacion("eecc", memoria_estimada(st.session_state.archivo_eecc)), \
+                        st.spinner("Enviando operaciones al orquestador..."):
                     exito, status = enviar_a_n8n(
                         st.session_state.df_mapeado,
                         st.session_state.ciclo_seleccionado,
                         st.session_state.operador_eecc,
+                        medicion,
                     )
+                cerrar_medicion(medicion)
 
                 if exito:
                     st.success(f"✅ {len(st.session_state.df_mapeado):,} operaciones enviadas — conciliación reanudada")
@@ -526,157 +897,14 @@ if st.session_state.modulo == "eecc":
                         st.session_state.carga_confirmada = False
                         st.rerun()
 
+        mostrar_panel_tiempos("eecc")
+
     else:
         # -----------------------------------------------
         # BANDEJA DE FALLOS
         # -----------------------------------------------
 
-        try:
-            resp = requests.get(
-                f"{config.SUPABASE_URL}/rest/v1/ciclo_ejecucion",
-                headers={
-                    "apikey": config.SUPABASE_KEY,
-                    "Authorization": f"Bearer {config.SUPABASE_KEY}",
-                    "Accept": "application/json",
-                    "Accept-Profile": config.SCHEMA,
-                },
-                params={
-                    "select": "ciclo_id,banco_codigo,fecha,hora,cuenta,estado,created_at",
-                    "estado": "eq.FALLIDO",
-                    "order": "created_at.asc",
-                },
-                timeout=10,
-            )
-            resp.raise_for_status()
-            raw = resp.json()
-            # Normalizar al esquema interno (ventana_inicio/fin desde fecha+hora)
-            ciclos = []
-            for row in raw:
-                try:
-                    vi = datetime.strptime(f"{row['fecha']}T{row['hora']}", "%Y-%m-%dT%H:%M:%S")
-                except Exception:
-                    try:
-                        vi = datetime.strptime(f"{row['fecha']}T{row['hora']}", "%Y-%m-%dT%H:%M")
-                    except Exception:
-                        vi = datetime.now(TIMEZONE).replace(tzinfo=None)
-                vf = vi + timedelta(hours=1)
-                ciclos.append({
-                    "ciclo_id":      row["ciclo_id"],
-                    "banco_codigo":  row["banco_codigo"],
-                    "ventana_inicio": vi.strftime("%Y-%m-%dT%H:%M:%S"),
-                    "ventana_fin":    vf.strftime("%Y-%m-%dT%H:%M:%S"),
-                    "cuenta_origen": row.get("cuenta"),
-                    "estado":        row["estado"],
-                    "created_at":    row["created_at"],
-                })
-        except requests.exceptions.HTTPError:
-            st.error(f"Error Supabase {resp.status_code}: {resp.text}")
-            st.stop()
-        except Exception as e:
-            st.error(f"No se pudo conectar con Supabase: {e}")
-            st.stop()
-
-        ahora = datetime.now(TIMEZONE)
-
-        COLORES_BANCO = {
-            "GMONEY":     "#F59E0B",
-            "BCP":        "#3B82F6",
-            "BBVA":       "#1D4ED8",
-            "INTERBANK":  "#10B981",
-            "SCOTIABANK": "#EF4444",
-        }
-
-        def _secs_restantes(ciclo):
-            try:
-                vf = datetime.fromisoformat(ciclo["ventana_fin"])
-                if vf.tzinfo is None:
-                    vf = TIMEZONE.localize(vf)
-                return max(0.0, (vf - ahora).total_seconds())
-            except Exception:
-                return 0.0
-
-        ciclos_ordenados = sorted(ciclos, key=_secs_restantes)
-
-        # --- Métricas de cabecera ---
-        secs_urgente = _secs_restantes(ciclos_ordenados[0]) if ciclos_ordenados else 0
-        mm_u, ss_u   = int(secs_urgente // 60), int(secs_urgente % 60)
-        tiempo_str   = f"{mm_u:02d}:{ss_u:02d}" if ciclos_ordenados else "—"
-
-        m1, m2, m3 = st.columns(3)
-        m1.metric("Fallos pendientes",    len(ciclos_ordenados))
-        m2.metric("Resueltos hoy",        "—")
-        m3.metric("Tiempo máx. restante", tiempo_str)
-
-        st.divider()
-
-        if not ciclos_ordenados:
-            st.success("✅ Sin fallos activos — el sistema está operando con normalidad")
-        else:
-            st.markdown("**FALLOS ACTIVOS — ORDENADOS POR URGENCIA**")
-            st.caption("Selecciona un fallo para resolver la contingencia manualmente.")
-            st.write("")
-
-            for ciclo in ciclos_ordenados:
-                try:
-                    vi    = datetime.fromisoformat(ciclo["ventana_inicio"]).strftime("%H:%M")
-                    vf_dt = datetime.fromisoformat(ciclo["ventana_fin"])
-                    if vf_dt.tzinfo is None:
-                        vf_dt = TIMEZONE.localize(vf_dt)
-                    vf = vf_dt.strftime("%H:%M")
-                except (ValueError, TypeError):
-                    vi, vf = "?", "?"
-
-                try:
-                    created = datetime.fromisoformat(ciclo["created_at"])
-                    if created.tzinfo is None:
-                        created = pytz.utc.localize(created)
-                    mins_creado = int((ahora - created.astimezone(TIMEZONE)).total_seconds() // 60)
-                    elapsed = f"{mins_creado} min" if mins_creado < 60 else f"{mins_creado // 60}h {mins_creado % 60}min"
-                except (ValueError, TypeError):
-                    elapsed = "?"
-
-                cuenta  = ciclo.get("cuenta_origen") or "—"
-                banco   = ciclo["banco_codigo"]
-                color   = COLORES_BANCO.get(banco, "#6B7280")
-                secs_r  = _secs_restantes(ciclo)
-                mm_r, ss_r = int(secs_r // 60), int(secs_r % 60)
-                fecha_monitoreo = (
-                    datetime.fromisoformat(ciclo["ventana_inicio"]).strftime("%H:%M")
-                    + " · " + ahora.strftime("%d %b %Y")
-                )
-
-                with st.container(border=True):
-                    col_info, col_accion = st.columns([7, 2])
-
-                    with col_info:
-                        st.markdown(
-                            f"<div style='display:flex;align-items:center;gap:16px'>"
-                            f"<div style='background:{color};border-radius:10px;min-width:56px;height:56px;"
-                            f"display:flex;align-items:center;justify-content:center;"
-                            f"font-weight:700;font-size:16px;color:#fff;flex-shrink:0'>{banco[:3]}</div>"
-                            f"<div>"
-                            f"<div><strong>{banco}</strong> &nbsp;·&nbsp;"
-                            f"<span style='color:gray;font-size:0.85em'>{cuenta}</span></div>"
-                            f"<div style='color:gray;font-size:0.8em;margin-top:3px'>Hora de monitoreo {fecha_monitoreo}</div>"
-                            f"<div style='color:gray;font-size:0.8em;margin-top:2px'>Fallo detectado hace {elapsed}</div>"
-                            f"</div></div>",
-                            unsafe_allow_html=True
-                        )
-
-                    with col_accion:
-                        st.markdown(
-                            f"<div style='color:#F59E0B;font-size:0.82em;text-align:right;"
-                            f"margin-bottom:6px'>⏱ {mm_r:02d}:{ss_r:02d} restantes</div>",
-                            unsafe_allow_html=True
-                        )
-                        if st.button("Resolver »", key=f"resolver_{ciclo['ciclo_id']}",
-                                     type="primary", use_container_width=True):
-                            st.session_state.ciclo_seleccionado = ciclo
-                            st.rerun()
-
-        st.write("")
-        if st.button("↻ Refrescar bandeja", key="refrescar_bandeja"):
-            st.rerun()
+        mostrar_bandeja()
 
 elif st.session_state.modulo == "conciliacion":
     if st.button("← Volver", key="volver_conciliacion"):
@@ -721,20 +949,12 @@ elif st.session_state.modulo == "conciliacion":
         st.divider()
 
         df_metabase = None
-        archivo_metabase_consolidado = None
+        medicion = medicion_en_curso("payouts_diaria")
 
         if archivo_metabase:
-            dfs = []
-            for archivo in archivo_metabase:
-                df_temp = pd.read_excel(archivo)
-                dfs.append(df_temp)
-            df_metabase = pd.concat(dfs, ignore_index=True)
-            buffer = BytesIO()
-            df_metabase.to_excel(buffer, index=False)
-            buffer.seek(0)
-            archivo_metabase_consolidado = buffer
-
-        archivos_listos = archivo_metabase_consolidado is not None and archivo_gmoney is not None
+            df_metabase = leer_metabase_subido(archivo_metabase, medicion)
+
+        archivos_listos = df_metabase is not None and archivo_gmoney is not None
 
         if st.button(
             "Conciliar",
@@ -742,56 +962,52 @@ elif st.session_state.modulo == "conciliacion":
             type="primary",
             use_container_width=True
         ):
-            files = {
-                "metabase": (
-                    "metabase_consolidado.xlsx",
-                    archivo_metabase_consolidado.getvalue(),
-                    "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-                ),
-                "gmoney_txt": (
-                    archivo_gmoney.name,
-                    archivo_gmoney.getvalue(),
-                    "text/plain"
+            if config.CONCILIACION_DIARIA_LOCAL:
+                df_gmoney = leer_subido(
+                    archivo_gmoney, "txt_gmoney",
+                    lambda: en_proceso_compactado(motor_conciliacion.leer_txt_gmoney, archivo_gmoney.getvalue()),
+                    medicion,
                 )
-            }
-
-            with st.spinner("Procesando conciliación..."):
-                try:
-                    session_metadata = {
-                        'session_id': st.session_state.session_id,
-                        'tipo_conciliacion': conciliacion_code,
-                        'conciliacion': 'payout_diaria'
-                    }
-                    response = requests.post(
-                        config.N8N_CONCILIACION,
-                        files=files,
-                        data=session_metadata,
-                        timeout=180
+                lanzar_trabajo("payouts_diaria", conciliar_diaria_local, df_metabase, df_gmoney,
+                               config.COLUMNAS_DIARIA["payout_diaria"], medicion, ejecutor_de_trabajo(),
+                               medicion=medicion, memoria_bytes=memoria_estimada(archivo_metabase, archivo_gmoney))
+            else:
+                # El consolidado se serializa solo al enviar y se reutiliza mientras no cambien los archivos
+                with medicion.etapa("serializar_metabase", filas=len(df_metabase)) as et:
+                    consolidado = obtener_metabase_consolidado(archivo_metabase, df_metabase)
+                    et["bytes_enviados"] = len(consolidado[1])
+                files = {
+                    "metabase": consolidado,
+                    "gmoney_txt": (
+                        archivo_gmoney.name,
+                        archivo_gmoney.getvalue(),
+                        "text/plain"
                     )
-                    response.raise_for_status()
-                    data = response.json()
-
-                except requests.exceptions.Timeout:
-                    st.error("La solicitud tardó demasiado. Intenta nuevamente.")
-                    st.stop()
-                except requests.exceptions.RequestException as e:
-                    st.error("Error al conectar con n8n")
-                    st.exception(e)
-                    st.stop()
-                except ValueError:
-                    st.error("El webhook no devolvió un JSON válido")
-                    st.write(response.text)
-                    st.stop()
-                except Exception as e:
-                    st.error("Error inesperado")
-                    st.exception(e)
-                    st.stop()
-
+                }
+                session_metadata = {
+                    'session_id': st.session_state.session_id,
+                    'tipo_conciliacion': conciliacion_code,
+                    'conciliacion': 'payout_diaria',
+                    'formato_metabase': ingesta.formato_transferencia(config.FORMATO_METABASE_N8N),
+                }
+                lanzar_trabajo("payouts_diaria", post_conciliacion_n8n, obtener_cliente_http(), files,
+                               session_metadata, medicion, medicion=medicion,
+                               memoria_bytes=memoria_estimada(archivo_metabase, archivo_gmoney))
+
+        # el trabajo corre en segundo plano; tras recargar o volver a entrar se re-engancha aquí
+        data = None
+        trabajo = trabajo_del_flujo("payouts_diaria", "Procesando conciliación...")
+        if trabajo is not None and trabajo["estado"] == trabajos.ESTADO_ERROR:
+            st.error(trabajo["error"])
+        elif trabajo is not None:
+            data = trabajo["resultado"]
             st.session_state.resultado_conciliacion = data
             st.session_state.archivos_subidos = True
 
-        if st.session_state.resultado_conciliacion:
-            resultado = st.session_state.resultado_conciliacion[0]
+        mostrar_panel_tiempos("payouts_diaria")
+
+        if data:
+            resultado = data[0]
             importes = resultado.get("importes", [])
             detalle = resultado.get("detalle", [])
 
@@ -857,45 +1073,24 @@ elif st.session_state.modulo == "conciliacion":
             )
 
         # ========================
-        # CARGA Y CACHÉ METABASE
+        # CARGA METABASE (caché de lecturas)
         # ========================
         df_metabase_online = None
+        medicion = medicion_en_curso("payins_online")
         if archivo_metabase_online:
-            met_key = [(f.name, f.size) for f in archivo_metabase_online]
-            if st.session_state.met_online_key != met_key:
-                dfs = []
-                for archivo in archivo_metabase_online:
-                    if archivo.name.endswith('.json'):
-                        t = pd.read_json(archivo, dtype={'PPY_external_id': str})
-                    elif archivo.name.endswith('.csv'):
-                        t = pd.read_csv(archivo, dtype={'PPY_external_id': str})
-                    else:
-                        t = pd.read_excel(archivo, dtype={'PPY_external_id': str})
-                    dfs.append(t)
-                df_metabase_online = pd.concat(dfs, ignore_index=True)
-                st.session_state.met_online_key = met_key
-                st.session_state.df_met_online_cache = df_metabase_online
-            else:
-                df_metabase_online = st.session_state.df_met_online_cache
+            df_metabase_online = leer_metabase_subido(archivo_metabase_online, medicion)
 
         # ========================
-        # CARGA Y CACHÉ PANDA EMPRESAS
+        # CARGA PANDA EMPRESAS (caché de lecturas)
         # ========================
+        df_panda_cashin = None
         if panda_empresas is not None:
-            panda_key = (panda_empresas.name, panda_empresas.size)
-            if st.session_state.panda_online_key != panda_key:
-                df_panda_cashin = pd.read_csv(BytesIO(panda_empresas.getvalue()), sep=";")
-                df_panda_cashin = df_panda_cashin[df_panda_cashin['operation'] == 'CASHIN']
-                # limpiar formato excel-style ="..."
-                df_panda_cashin['instruction_id'] = (
-                    df_panda_cashin['instruction_id']
-                    .astype(str)
-                    .str.replace('="', '', regex=False)
-                    .str.replace('"', '', regex=False)
-                    .str.strip()
-                )
-                st.session_state.panda_online_key = panda_key
-                st.session_state.df_panda_cashin_cache = df_panda_cashin
+            # lectura por bloques: solo columnas del modo online, CASHIN e instruction_id limpio
+            df_panda_cashin = leer_subido(
+                panda_empresas, "panda_cashin",
+                lambda: en_proceso_compactado(ingesta.leer_panda_cashin, panda_empresas.getvalue()),
+                medicion,
+            )
 
         # ========================
         # VISTA PREVIA
@@ -915,8 +1110,8 @@ elif st.session_state.modulo == "conciliacion":
                     except Exception:
                         st.error(f"Formato de fecha no reconocido en `PC_create_date_GMT_Peru`: `{muestra}`")
             with prev_col2:
-                if st.session_state.df_panda_cashin_cache is not None:
-                    st.caption(f"Vista previa Panda Empresas — {len(st.session_state.df_panda_cashin_cache)} filas (CASHIN)")
+                if df_panda_cashin is not None:
+                    st.caption(f"Vista previa Panda Empresas — {len(df_panda_cashin)} filas (CASHIN)")
 
         # ========================
         # BOTÓN CONCILIAR
@@ -924,140 +1119,109 @@ elif st.session_state.modulo == "conciliacion":
         st.divider()
         archivos_listos_online = (df_metabase_online is not None) and (panda_empresas is not None)
 
-        if st.button("Conciliar", disabled=not archivos_listos_online, type="primary", use_container_width=True):
+        modo_online = st.radio(
+            "Horas a conciliar",
+            ["Hora anterior", "Backfill (varias horas)"],
+            horizontal=True,
+            key="modo_payins_online",
+        )
+        horas_backfill = None
+        if modo_online == "Backfill (varias horas)":
+            hoy = datetime.now(TIMEZONE).date()
+            bf_col1, bf_col2 = st.columns(2)
+            with bf_col1:
+                rango_fechas = st.date_input("Fechas", value=(hoy, hoy), max_value=hoy, key="backfill_fechas")
+            with bf_col2:
+                horas_sel = st.multiselect("Horas", list(range(24)), default=list(range(24)), key="backfill_horas")
+            if isinstance(rango_fechas, (tuple, list)) and len(rango_fechas) == 2:
+                dias = pd.date_range(rango_fechas[0], rango_fechas[1], freq="D").date
+                horas_backfill = [(dia, hora) for dia in dias for hora in sorted(horas_sel)]
+            else:
+                horas_backfill = []
+            st.caption(f"{len(horas_backfill)} horas seleccionadas")
+
+        if horas_backfill is not None:
+            if st.button(
+                "Conciliar horas",
+                disabled=not (archivos_listos_online and horas_backfill),
+                type="primary",
+                use_container_width=True,
+            ):
+                with turno_operacion("payins_online", memoria_estimada(archivo_metabase_online, panda_empresas)), \
+                        st.spinner(f"Conciliando {len(horas_backfill)} horas..."):
+                    dt_met, dt_panda = actualizar_conciliador_horario(df_metabase_online, df_panda_cashin, medicion)
+                    with medicion.etapa("conciliar_backfill", filas=len(df_metabase_online) + len(df_panda_cashin)):
+                        df_detalle, df_estado = motor_conciliacion.conciliar_backfill(
+                            df_metabase_online, dt_met, df_panda_cashin, dt_panda, horas_backfill,
+                            mapear=mapear_en_procesos,
+                        )
+                st.session_state.resultado_conciliacion = {"detalle": df_detalle.to_dict("records")}
+                st.session_state.backfill_estado = df_estado
+                st.session_state.conciliacion_hora = None
+                st.session_state.archivos_subidos = True
+                cerrar_medicion(medicion)
+
+        elif st.button("Conciliar", disabled=not archivos_listos_online, type="primary", use_container_width=True):
 
             if not st.session_state.get('session_id'):
                 st.session_state.session_id = generate_session_id()
             session_id = st.session_state.session_id
+            medicion.session_id = session_id
 
-            hora_filtro = datetime.now(TIMEZONE).hour - 1
-
-            # ----------- METABASE -----------
-            dt_met = pd.to_datetime(
-                df_metabase_online['PC_create_date_GMT_Peru'].astype(str).str.replace(',', '', regex=False),
-                dayfirst=True, errors='coerce'
+            # hora cerrada anterior; a medianoche es la hora 23 del día previo
+            fecha_filtro, hora_filtro = motor_conciliacion.hora_anterior(
+                datetime.now(TIMEZONE).replace(tzinfo=None)
             )
-            df_met_filtrado = df_metabase_online[dt_met.dt.hour == hora_filtro].copy()
-            df_met_filtrado['_fecha_iso'] = dt_met[dt_met.dt.hour == hora_filtro].dt.strftime('%Y-%m-%d %H:%M:%S')
-
-            meta_rows = [{
-                "session_id": session_id,
-                "source": "metabase",
-                "join_key": str(r["PPY_external_id"]).strip(),
-                "amount": float(r["amount"]) if pd.notna(r.get("amount")) else None,
-                "currency": r.get("currency_code"),
-                "fecha": r.get("_fecha_iso"),
-                "comercio_nombre": r.get("Comercio_Nombre"),
-                "deudor_nombre": r.get("Deudor_Nombre"),
-                "deudor_documento": r.get("Deudor_Documento"),
-                "deuda_public_id": r.get("Deuda_public_id"),
-                "deuda_estado": r.get("Deuda_Estado"),
-            } for r in df_met_filtrado.where(df_met_filtrado.notna(), None).to_dict("records")]
-
-            # ----------- GMONEY -----------
-            df_panda_envio = st.session_state.df_panda_cashin_cache.copy()
-            df_panda_envio = df_panda_envio[df_panda_envio['movement_hour'].str[:2].astype(int) == hora_filtro]
-            df_panda_envio['_fecha_iso'] = pd.to_datetime(
-                df_panda_envio['movement_day'] + ' ' + df_panda_envio['movement_hour'],
-                dayfirst=True, errors='coerce'
-            ).dt.strftime('%Y-%m-%d %H:%M:%S')
-
-            gm_rows = [{
-                "session_id": session_id,
-                "source": "gmoney",
-                "join_key": str(r["instruction_id"]).strip().strip('"'),
-                "amount": float(r["amount"]) if pd.notna(r.get("amount")) else None,
-                "currency": r.get("currency"),
-                "fecha": r.get("_fecha_iso"),
-                "origin_name": r.get("origin_name"),
-                "origin_document": str(r["origin_document"]) if pd.notna(r.get("origin_document")) else None,
-                "target_name": r.get("target_name"),
-                "fee": float(r["fee"]) if pd.notna(r.get("fee")) else None,
-                "entity": r.get("entity"),
-                "operation": r.get("operation"),
-            } for r in df_panda_envio.where(df_panda_envio.notna(), None).to_dict("records")]
-
-            # Normalizar a las mismas keys
-            ALL_KEYS = [
-                "session_id", "source", "join_key", "amount", "currency", "fecha",
-                "comercio_nombre", "deudor_nombre", "deudor_documento", "deuda_public_id", "deuda_estado",
-                "origin_name", "origin_document", "target_name", "fee", "entity", "operation",
-            ]
-            def _normalize(r):
-                return {k: r.get(k) for k in ALL_KEYS}
-            meta_rows = [_normalize(r) for r in meta_rows]
-            gm_rows   = [_normalize(r) for r in gm_rows]
-
-            payload = {
-                "session_id": session_id,
-                "tipo_conciliacion": "payins_online",
-                "hora_filtro": hora_filtro,
-                "fecha_inicio_iso": datetime.now(TIMEZONE).isoformat(),
-                "rows": meta_rows + gm_rows,
-            }
-
-            with st.spinner("Procesando conciliación..."):
-                try:
-                    response = requests.post(
-                        config.N8N_PAYINS_ONLINE_V2,
-                        json=payload,
-                        timeout=180,
-                        headers={'Content-Type': 'application/json'}
-                    )
-                    response.raise_for_status()
-                    if not response.text.strip():
-                        st.warning("n8n respondió vacío.")
-                        st.stop()
-                    data = response.json()
-                except requests.exceptions.Timeout:
-                    st.error("La solicitud tardó demasiado."); st.stop()
-                except requests.exceptions.RequestException as e:
-                    st.error("Error al conectar con n8n"); st.exception(e); st.stop()
-                except ValueError:
-                    st.error("El webhook no devolvió un JSON válido"); st.write(response.text); st.stop()
-                except Exception as e:
-                    st.error("Error inesperado"); st.exception(e); st.stop()
 
-            st.session_state.resultado_conciliacion = data
-            st.session_state.archivos_subidos = True
+            # la parte pesada (fechas, filtro y conciliación) corre con turno del planificador
+            with turno_operacion("payins_online", memoria_estimada(archivo_metabase_online, panda_empresas)):
+                # fechas parseadas solo para filas nuevas desde la corrida anterior
+                dt_met, dt_panda = actualizar_conciliador_horario(df_metabase_online, df_panda_cashin, medicion)
 
-            # ----------- CONCILIACIÓN LOCAL POR HORA -----------
-            try:
-                grp_met = (
-                    df_metabase_online
-                    .assign(_fecha=dt_met.dt.date, _hora=dt_met.dt.hour)
-                    .groupby(['_fecha', '_hora'])['amount'].sum()
-                    .reset_index()
-                    .rename(columns={'_fecha': 'fecha_conciliacion', '_hora': 'hora', 'amount': 'total_amount_metabase'})
-                )
+                # ----------- METABASE / GMONEY -----------
+                with medicion.etapa("filtrar_hora", filas=len(df_metabase_online) + len(df_panda_cashin)):
+                    df_met_filtrado = motor_conciliacion.filtrar_hora(df_metabase_online, dt_met, hora_filtro, fecha_filtro)
+                    df_panda_envio = motor_conciliacion.filtrar_hora(df_panda_cashin, dt_panda, hora_filtro, fecha_filtro)
 
-                df_panda_hora = st.session_state.df_panda_cashin_cache.copy()
-                dt_panda = pd.to_datetime(
-                    df_panda_hora['movement_day'] + ' ' + df_panda_hora['movement_hour'],
-                    dayfirst=True, errors='coerce'
-                )
-                grp_panda = (
-                    df_panda_hora
-                    .assign(_fecha=dt_panda.dt.date, _hora=dt_panda.dt.hour)
-                    .groupby(['_fecha', '_hora'])['amount'].sum()
-                    .reset_index()
-                    .rename(columns={'_fecha': 'fecha_conciliacion', '_hora': 'hora', 'amount': 'total_amount_gmoney'})
-                )
+                # ----------- CONCILIACIÓN LOCAL POR OPERACIÓN -----------
+                with st.spinner("Procesando conciliación..."):
+                    try:
+                        with medicion.etapa("conciliar_payins_online", filas=len(df_met_filtrado) + len(df_panda_envio)):
+                            df_detalle = motor_conciliacion.conciliar_payins_online(df_met_filtrado, df_panda_envio)
+                    except Exception as e:
+                        st.error("Error en la conciliación por operación"); st.exception(e); st.stop()
+
+                detalle = motor_conciliacion.diferencias(df_detalle)
+            st.session_state.resultado_conciliacion = {"detalle": detalle.to_dict("records")}
+            st.session_state.backfill_estado = None
+            st.session_state.archivos_subidos = True
 
-                df_conc_hora = (
-                    grp_met.merge(grp_panda, on=['fecha_conciliacion', 'hora'], how='outer')
-                    .fillna(0)
-                    .sort_values(['fecha_conciliacion', 'hora'])
-                    .reset_index(drop=True)
+            # ----------- CONCILIACIÓN LOCAL POR HORA (solo horas cerradas) -----------
+            try:
+                st.session_state.conciliacion_hora = st.session_state.conciliador_horario.por_hora(
+                    hasta=datetime.now(TIMEZONE)
                 )
-                df_conc_hora['diferencia'] = df_conc_hora['total_amount_metabase'] - df_conc_hora['total_amount_gmoney']
-                df_conc_hora['estado'] = df_conc_hora['diferencia'].apply(lambda x: 'Conciliado' if x == 0 else 'Diferencias')
-                hora_actual = datetime.now(TIMEZONE).hour
-                df_conc_hora = df_conc_hora[df_conc_hora['hora'] < hora_actual].reset_index(drop=True)
-                st.session_state.conciliacion_hora = df_conc_hora
             except Exception as e:
                 st.error(f"Error en conciliación local: {e}")
 
+            # ----------- PERSISTENCIA EN n8n (opcional, en segundo plano) -----------
+            if config.PAYINS_ONLINE_PERSISTIR_N8N:
+                with medicion.etapa("construir_payload", filas=len(df_met_filtrado) + len(df_panda_envio)) as et:
+                    df_filas = motor_conciliacion.construir_filas_payins_online(df_met_filtrado, df_panda_envio, session_id)
+                    cuerpo = motor_conciliacion.cuerpo_payins_online(
+                        session_id, hora_filtro, df_filas, datetime.now(TIMEZONE).isoformat()
+                    )
+                    et["bytes_enviados"] = len(cuerpo)
+                # la medición se cierra cuando termina el envío
+                lanzar_trabajo("payins_online_registro", registrar_payins_online_n8n,
+                               obtener_cliente_http(), cuerpo, medicion, medicion=medicion)
+            else:
+                cerrar_medicion(medicion)
+
+        registro = trabajo_del_flujo("payins_online_registro", "Registrando la conciliación en n8n...")
+        if registro is not None and registro["estado"] == trabajos.ESTADO_ERROR:
+            st.warning("No se pudo registrar la conciliación en n8n — el resultado local sigue disponible.")
+
         # ========================
         # RESULTADOS
         # ========================
@@ -1067,6 +1231,17 @@ elif st.session_state.modulo == "conciliacion":
             st.write("Totales agregados por hora, Metabase vs GMoney (cálculo local).")
             st.dataframe(st.session_state.conciliacion_hora, use_container_width=True)
 
+        if st.session_state.backfill_estado is not None:
+            st.divider()
+            st.subheader("Estado por hora (backfill)")
+            df_estado = st.session_state.backfill_estado
+            con_error = df_estado[df_estado["estado"] == motor_conciliacion.ESTADO_HORA_ERROR]
+            if len(con_error):
+                st.error(f"{len(con_error)} horas no se pudieron conciliar; revisa la columna `error`.")
+            st.dataframe(df_estado, use_container_width=True, hide_index=True)
+
+        mostrar_panel_tiempos("payins_online")
+
         if st.session_state.resultado_conciliacion:
             raw = st.session_state.resultado_conciliacion
             resultado = raw[0] if isinstance(raw, list) else raw
@@ -1130,20 +1305,12 @@ elif st.session_state.modulo == "conciliacion":
         st.divider()
 
         df_metabase = None
-        archivo_metabase_consolidado = None
+        medicion = medicion_en_curso("payins_diaria")
 
         if archivo_metabase:
-            dfs = []
-            for archivo in archivo_metabase:
-                df_temp = pd.read_excel(archivo)
-                dfs.append(df_temp)
-            df_metabase = pd.concat(dfs, ignore_index=True)
-            buffer = BytesIO()
-            df_metabase.to_excel(buffer, index=False)
-            buffer.seek(0)
-            archivo_metabase_consolidado = buffer
-
-        archivos_listos = archivo_metabase_consolidado is not None and archivo_gmoney is not None
+            df_metabase = leer_metabase_subido(archivo_metabase, medicion)
+
+        archivos_listos = df_metabase is not None and archivo_gmoney is not None
 
         if st.button(
             "Conciliar",
@@ -1151,56 +1318,52 @@ elif st.session_state.modulo == "conciliacion":
             type="primary",
             use_container_width=True
         ):
-            files = {
-                "metabase": (
-                    "metabase_consolidado.xlsx",
-                    archivo_metabase_consolidado.getvalue(),
-                    "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-                ),
-                "gmoney_txt": (
-                    archivo_gmoney.name,
-                    archivo_gmoney.getvalue(),
-                    "text/plain"
+            if config.CONCILIACION_DIARIA_LOCAL:
+                df_gmoney = leer_subido(
+                    archivo_gmoney, "txt_gmoney",
+                    lambda: en_proceso_compactado(motor_conciliacion.leer_txt_gmoney, archivo_gmoney.getvalue()),
+                    medicion,
                 )
-            }
-
-            with st.spinner("Procesando conciliación..."):
-                try:
-                    session_metadata = {
-                        'session_id': st.session_state.session_id,
-                        'tipo_conciliacion': conciliacion_code,
-                        'conciliacion': 'payin_diaria'
-                    }
-                    response = requests.post(
-                        config.N8N_CONCILIACION,
-                        files=files,
-                        data=session_metadata,
-                        timeout=180
+                lanzar_trabajo("payins_diaria", conciliar_diaria_local, df_metabase, df_gmoney,
+                               config.COLUMNAS_DIARIA["payin_diaria"], medicion, ejecutor_de_trabajo(),
+                               medicion=medicion, memoria_bytes=memoria_estimada(archivo_metabase, archivo_gmoney))
+            else:
+                # El consolidado se serializa solo al enviar y se reutiliza mientras no cambien los archivos
+                with medicion.etapa("serializar_metabase", filas=len(df_metabase)) as et:
+                    consolidado = obtener_metabase_consolidado(archivo_metabase, df_metabase)
+                    et["bytes_enviados"] = len(consolidado[1])
+                files = {
+                    "metabase": consolidado,
+                    "gmoney_txt": (
+                        archivo_gmoney.name,
+                        archivo_gmoney.getvalue(),
+                        "text/plain"
                     )
-                    response.raise_for_status()
-                    data = response.json()
-
-                except requests.exceptions.Timeout:
-                    st.error("La solicitud tardó demasiado. Intenta nuevamente.")
-                    st.stop()
-                except requests.exceptions.RequestException as e:
-                    st.error("Error al conectar con n8n")
-                    st.exception(e)
-                    st.stop()
-                except ValueError:
-                    st.error("El webhook no devolvió un JSON válido")
-                    st.write(response.text)
-                    st.stop()
-                except Exception as e:
-                    st.error("Error inesperado")
-                    st.exception(e)
-                    st.stop()
-
+                }
+                session_metadata = {
+                    'session_id': st.session_state.session_id,
+                    'tipo_conciliacion': conciliacion_code,
+                    'conciliacion': 'payin_diaria',
+                    'formato_metabase': ingesta.formato_transferencia(config.FORMATO_METABASE_N8N),
+                }
+                lanzar_trabajo("payins_diaria", post_conciliacion_n8n, obtener_cliente_http(), files,
+                               session_metadata, medicion, medicion=medicion,
+                               memoria_bytes=memoria_estimada(archivo_metabase, archivo_gmoney))
+
+        # el trabajo corre en segundo plano; tras recargar o volver a entrar se re-engancha aquí
+        data = None
+        trabajo = trabajo_del_flujo("payins_diaria", "Procesando conciliación...")
+        if trabajo is not None and trabajo["estado"] == trabajos.ESTADO_ERROR:
+            st.error(trabajo["error"])
+        elif trabajo is not None:
+            data = trabajo["resultado"]
             st.session_state.resultado_conciliacion = data
             st.session_state.archivos_subidos = True
 
-        if st.session_state.resultado_conciliacion:
-            resultado = st.session_state.resultado_conciliacion[0]
+        mostrar_panel_tiempos("payins_diaria")
+
+        if data:
+            resultado = data[0]
             importes = resultado.get("importes", [])
             detalle = resultado.get("detalle", [])
 
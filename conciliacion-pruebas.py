@@ -6,6 +6,7 @@ import pytz
 from io import BytesIO
 import time
 import re
+import cliente_http
 
 
 # Configuración de la página
@@ -51,12 +52,7 @@ if "authenticated" not in st.session_state:
 def send_to_n8n(endpoint, data):
     """Envía datos al webhook de n8n"""
     try:
-        response = requests.post(
-            endpoint,
-            json=data,
-            timeout=5,
-            headers={'Content-Type': 'application/json'}
-        )
+        response = cliente_http.post_json(endpoint, data, timeout=5)
         return response.status_code == 200
     except Exception as e:
         st.warning(f"Error 008")
@@ -320,7 +316,7 @@ if tipo_conciliacion == "Conciliacion PayOuts - Diaria":
                     response.raise_for_status()
 
                     # ✅ El webhook ya devuelve JSON válido
-                    data = response.json()
+                    data = cliente_http.json_respuesta(response)
 
                 except requests.exceptions.Timeout:
                     st.error("La solicitud tardó demasiado. Intenta nuevamente.")
@@ -521,12 +517,7 @@ elif tipo_conciliacion == 'Conciliacion PayIns - Online':
                 step1.info("📤 Enviando archivo Metabase...")
 
                 try:
-                    resp_metabase = requests.post(
-                        N8N_CONCILIACION_TEST,
-                        json=payload_metabase,
-                        headers={'Content-Type': 'application/json'},
-                        timeout=30
-                    )
+                    resp_metabase = cliente_http.post_json(N8N_CONCILIACION_TEST, payload_metabase, timeout=30)
                     resp_metabase.raise_for_status()
                     step1.success("✅ Metabase enviado correctamente")
                 except Exception as e:
@@ -545,12 +536,7 @@ elif tipo_conciliacion == 'Conciliacion PayIns - Online':
                 step3.info("📤 Enviando archivo GMoney...")
 
                 try:
-                    resp_gmoney = requests.post(
-                        N8N_CONCILIACION_TEST,
-                        json=payload_gmoney,
-                        headers={'Content-Type': 'application/json'},
-                        timeout=30
-                    )
+                    resp_gmoney = cliente_http.post_json(N8N_CONCILIACION_TEST, payload_gmoney, timeout=30)
                     resp_gmoney.raise_for_status()
                     step3.success("✅ GMoney enviado correctamente")
                 except Exception as e:
@@ -652,7 +638,7 @@ elif tipo_conciliacion == "Conciliacion PayIns - Diaria":
                     response.raise_for_status()
 
                     # ✅ El webhook ya devuelve JSON válido
-                    data = response.json()
+                    data = cliente_http.json_respuesta(response)
 
                 except requests.exceptions.Timeout:
                     st.error("La solicitud tardó demasiado. Intenta nuevamente.")
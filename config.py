@@ -1,32 +1,165 @@
-import streamlit as st
+import os
+
 import pandas as pd
+import pytz
+
+try:
+    import streamlit as st
+except ImportError:  # CLI / jobs batch sin Streamlit instalado
+    st = None
+
+
+def _secreto(seccion: str, clave: str, requerido: bool = True) -> str:
+    """Lee un valor de st.secrets. Dentro de `streamlit run` un secreto requerido que falta corta
+    el arranque (KeyError); fuera del runtime (CLI, benchmarks, scripts) sin secrets.toml cae a la
+    variable de entorno SECCION_CLAVE (ej. SUPABASE_URL) y, si tampoco está, a vacío"""
+    if st is not None:
+        try:
+            return st.secrets[seccion][clave]
+        except (KeyError, FileNotFoundError):
+            if st.runtime.exists():
+                if requerido:
+                    raise
+                return ""
+    return os.environ.get(f"{seccion}_{clave}".upper(), "")
 
-# --- Entorno ---
-ENTORNO: str = st.secrets["general"]["entorno"]
+
+# --- Entorno (sin valor por defecto: apuntar a dev o a prod siempre es explícito) ---
+ENTORNO: str = _secreto("general", "entorno")
+if not ENTORNO:
+    raise RuntimeError("Falta general.entorno: definirlo en .streamlit/secrets.toml o en GENERAL_ENTORNO")
 IS_DEV: bool = ENTORNO == "dev"
 SCHEMA: str = "dev" if IS_DEV else "public"
 
 # --- Supabase (una sola instancia, schema cambia según entorno) ---
-SUPABASE_URL: str = st.secrets["supabase"]["url"]
-SUPABASE_KEY: str = st.secrets["supabase"]["key"]
+SUPABASE_URL: str = _secreto("supabase", "url")
+SUPABASE_KEY: str = _secreto("supabase", "key")
 
 # --- n8n Webhooks ---
 _n8n_env = "n8n_dev" if IS_DEV else "n8n_prod"
-N8N_WEBHOOK_EECC: str    = st.secrets[_n8n_env]["webhook_eecc"]
-N8N_LOGIN: str           = st.secrets[_n8n_env]["webhook_login"]
-N8N_CONCILIACION: str    = st.secrets[_n8n_env]["webhook_conciliacion"]
-N8N_PAYINS_ONLINE_V2: str = st.secrets[_n8n_env]["webhook_payins_online_v2"]
+N8N_WEBHOOK_EECC: str    = _secreto(_n8n_env, "webhook_eecc")
+N8N_LOGIN: str           = _secreto(_n8n_env, "webhook_login")
+N8N_CONCILIACION: str    = _secreto(_n8n_env, "webhook_conciliacion")
+N8N_PAYINS_ONLINE_V2: str = _secreto(_n8n_env, "webhook_payins_online_v2")
+
+# --- Datos de referencia (caché compartido con TTL, recarga en segundo plano) ---
+TTL_COLABORADORES_SEGUNDOS: int = 15 * 60
+TTL_METADATA_BANCOS_SEGUNDOS: int = 60 * 60
+COLORES_BANCO: dict[str, str] = {
+    "GMONEY":     "#F59E0B",
+    "BCP":        "#3B82F6",
+    "BBVA":       "#1D4ED8",
+    "INTERBANK":  "#10B981",
+    "SCOTIABANK": "#EF4444",
+}
+
+# --- Bandeja de fallos (instantánea compartida, un solo hilo consulta Supabase) ---
+BANDEJA_REFRESCO_SEGUNDOS: int = 15
+# Columna de último cambio de ciclo_ejecucion (mantenida por trigger al cambiar el estado). Con ella
+# cada refresco trae solo las filas que cambiaron desde la marca (columna, ciclo_id), en cualquier
+# estado: un ciclo que entra o sale de FALLIDO se ve en hasta BANDEJA_REFRESCO_SEGUNDOS (15 s) y el
+# costo sigue a la cantidad de cambios. Las filas borradas salen en la recarga completa, cada
+# BANDEJA_RESINCRONIZAR_CADA refrescos (15 s × 40 = 10 min). En None cada refresco recarga todos
+# los FALLIDO (misma latencia, costo proporcional al tamaño de la bandeja).
+BANDEJA_COLUMNA_CAMBIO: str | None = "updated_at"
+BANDEJA_FILAS_POR_PAGINA: int = 500
+BANDEJA_RESINCRONIZAR_CADA: int = 40
+# Cada cuánto se re-renderiza la bandeja (cuentas regresivas) sin re-ejecutar la app
+BANDEJA_VISTA_SEGUNDOS: int = 1
+# Desde cuántos fallos la bandeja pasa a tabla compacta paginada (en vez de una tarjeta por ciclo)
+BANDEJA_COMPACTA_DESDE: int = 25
+BANDEJA_FILAS_POR_VISTA: int = 100
+
+# --- Cliente HTTP (pool keep-alive por host) ---
+HTTP_CONEXIONES_POR_HOST: int = 10
+# Solo los GET se reintentan (429/5xx/errores de conexión), con backoff exponencial + jitter
+HTTP_REINTENTOS_GET: int = 3
+HTTP_BACKOFF_SEGUNDOS: float = 0.5
+# Timeout por endpoint: segundos o (conexión, lectura)
+TIMEOUTS_HTTP: dict[str, float | tuple[float, float]] = {
+    "supabase":      (3.05, 10),
+    "colaboradores": (3.05, 10),
+    "login":         5,
+    "eecc":          (3.05, 30),
+    "payins_online": (3.05, 60),
+    "conciliacion":  (3.05, 180),
+}
+
+# Compresión del cuerpo por webhook: None, "gzip" o "zstd" (zstd requiere el paquete zstandard;
+# sin él se usa gzip). El endpoint debe aceptar Content-Encoding: por defecto se envía sin comprimir.
+COMPRESION_WEBHOOKS: dict[str, str | None] = {
+    "eecc":          None,
+    "payins_online": None,
+    "conciliacion":  None,
+    "login":         None,
+}
+# Cuerpos más chicos que esto se envían sin comprimir
+COMPRESION_MIN_BYTES: int = 16 * 1024
+
+
+def compresion_webhook(nombre: str) -> dict:
+    """kwargs de compresión de cliente_http.post_json / post_multipart para un webhook"""
+    return {"compresion": COMPRESION_WEBHOOKS.get(nombre), "min_bytes": COMPRESION_MIN_BYTES}
+
+# Carga manual de EECC: filas por lote y lotes enviados en paralelo a N8N_WEBHOOK_EECC
+EECC_FILAS_POR_LOTE: int = 5_000
+EECC_LOTES_CONCURRENTES: int = 4
+
+# PayIns Online concilia localmente; n8n solo persiste las filas enviadas
+PAYINS_ONLINE_PERSISTIR_N8N: bool = True
+
+# Conciliaciones diarias: se calculan localmente; False = delegar en N8N_CONCILIACION
+CONCILIACION_DIARIA_LOCAL: bool = True
+
+# Formato del Metabase consolidado enviado a N8N_CONCILIACION: "xlsx", "csv.gz", "parquet" o "arrow".
+# El workflow de n8n hoy solo lee metabase_consolidado.xlsx: el campo `formato_metabase` es solo
+# informativo, así que cambiar a otro formato recién cuando el workflow lo soporte
+# (parquet/arrow requieren pyarrow)
+FORMATO_METABASE_N8N: str = "xlsx"
+
+# Caché de archivos parseados (por proceso, compartido entre sesiones), en MB
+CACHE_LECTURAS_MB: int = 1024
+
+# Log JSON-lines con el tiempo de cada etapa por corrida (vacío = no escribir)
+LOG_TIEMPOS: str = os.environ.get("LOG_TIEMPOS", "logs/tiempos.jsonl")
+
+# --- Pool de procesos para etapas pesadas de CPU (parseo, validación, conciliación) ---
+# 0 = todo en el proceso de Streamlit
+PROCESOS_CPU: int = int(os.environ.get("PROCESOS_CPU", max(1, (os.cpu_count() or 2) // 2)))
+# Tareas entre cola y ejecución; quien envía más espera su turno
+PROCESOS_EN_VUELO: int = 2 * max(1, PROCESOS_CPU)
+
+# --- Control de admisión de operaciones pesadas (planificador del servidor) ---
+# Máximo en curso a la vez por tipo de operación; las demás esperan turno en cola
+PLANIFICADOR_LIMITES: dict[str, int] = {
+    "lectura":                3,
+    "eecc":                   2,
+    "payouts_diaria":         2,
+    "payins_diaria":          2,
+    "payins_online":          2,
+    "payins_online_registro": 2,
+}
+PLANIFICADOR_LIMITE_USUARIO: int = 2
+# Presupuesto de memoria para operaciones en curso, estimado como tamaño subido × factor por extensión
+PLANIFICADOR_MEMORIA_MB: int = int(os.environ.get("PLANIFICADOR_MEMORIA_MB", 4096))
+PLANIFICADOR_FACTOR_MEMORIA: dict[str, float] = {"xlsx": 12.0, "csv": 5.0, "txt": 5.0, "json": 8.0}
+
+# --- Trabajos en segundo plano (conciliaciones largas, envíos a n8n) ---
+# Incluye los que esperan turno del planificador
+TRABAJOS_HILOS: int = 8
+TRABAJOS_RETENCION_SEGUNDOS: int = 6 * 60 * 60
+TRABAJOS_SONDEO_SEGUNDOS: int = 2
 
 # --- Sesión ---
 SESSION_TIMEOUT_MINUTES: int = 30
+TIMEZONE = pytz.timezone("America/Lima")
 
 # --- Operadores (provisional hasta Microsoft Auth) ---
 OPERADORES: list[str] = ["DU", "AA", "JK", "LK"]
 
 # --- Colaboradores de contingencia (base de datos externa, solo prod) ---
-_bbdd_col = st.secrets.get("bbdd_colaboradores", {})
-BBDD_COLABORADORES_URL: str = _bbdd_col.get("url", "")
-BBDD_COLABORADORES_KEY: str = _bbdd_col.get("key", "")
+BBDD_COLABORADORES_URL: str = _secreto("bbdd_colaboradores", "url", requerido=False)
+BBDD_COLABORADORES_KEY: str = _secreto("bbdd_colaboradores", "key", requerido=False)
 TABLA_COLABORADORES:    str = "colaboradores"   # nombre de la tabla
 COLUMNA_COLABORADORES:  str = "nombre_completo"   # columna que contiene el nombre del colaborador
 
@@ -69,3 +202,18 @@ def _preprocesar_gmoney(df: pd.DataFrame) -> pd.DataFrame:
 PREPROCESADORES_BANCO: dict[str, object] = {
     "GMONEY": _preprocesar_gmoney,
 }
+
+# --- Columnas usadas por la conciliación diaria local (Metabase xlsx vs TXT GMoney) ---
+# "filtros" solo se aplica si la columna existe en el archivo
+COLUMNAS_DIARIA: dict[str, dict] = {
+    "payout_diaria": {
+        "metabase": {"id": "PPY_external_id", "monto": "amount", "fecha": "PC_create_date_GMT_Peru"},
+        "gmoney":   {"id": "instruction_id",  "monto": "amount", "fecha": "movement_day",
+                     "filtros": {"operation": "CASHOUT"}},
+    },
+    "payin_diaria": {
+        "metabase": {"id": "PPY_external_id", "monto": "amount", "fecha": "PC_create_date_GMT_Peru"},
+        "gmoney":   {"id": "instruction_id",  "monto": "amount", "fecha": "movement_day",
+                     "filtros": {"operation": "CASHIN"}},
+    },
+}
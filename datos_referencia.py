@@ -0,0 +1,84 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable
+
+
+class DatosReferencia:
+    """Caché de datos de referencia (colaboradores, metadata por banco…) compartido por el servidor.
+
+    Cada fuente se registra con su función de carga, un TTL y un valor de respaldo. `obtener()`
+    nunca espera a la red: devuelve el último valor (aunque esté vencido) o el respaldo, y si
+    el valor venció lanza la recarga en segundo plano (stale-while-revalidate, una sola recarga
+    en curso por fuente). Si la carga falla se conserva el último valor bueno.
+    """
+
+    def __init__(self, max_hilos: int = 2):
+        self._fuentes: dict[str, dict] = {}
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=max_hilos, thread_name_prefix="referencia")
+
+    def registrar(self, nombre: str, cargar: Callable[[], Any], ttl_segundos: float,
+                  respaldo: Any = None, ttl_error_segundos: float | None = None) -> None:
+        """Registra una fuente; la primera carga arranca de inmediato en segundo plano"""
+        with self._lock:
+            self._fuentes[nombre] = {
+                "cargar": cargar,
+                "ttl": ttl_segundos,
+                # tras un error se reintenta antes que el TTL normal
+                "ttl_error": ttl_segundos / 10 if ttl_error_segundos is None else ttl_error_segundos,
+                "respaldo": respaldo,
+                "valor": None,
+                "cargado": False,
+                "vence": 0.0,
+                "actualizado": None,
+                "error": None,
+                "en_curso": False,
+            }
+        self._refrescar(nombre)
+
+    def _refrescar(self, nombre: str) -> None:
+        with self._lock:
+            fuente = self._fuentes[nombre]
+            if fuente["en_curso"]:
+                return
+            fuente["en_curso"] = True
+        self._pool.submit(self._cargar, nombre)
+
+    def _cargar(self, nombre: str) -> None:
+        fuente = self._fuentes[nombre]
+        try:
+            valor = fuente["cargar"]()
+        except Exception as e:
+            with self._lock:
+                fuente.update(error=str(e), vence=time.monotonic() + fuente["ttl_error"], en_curso=False)
+            return
+        with self._lock:
+            fuente.update(valor=valor, cargado=True, error=None, actualizado=time.time(),
+                          vence=time.monotonic() + fuente["ttl"], en_curso=False)
+
+    def obtener(self, nombre: str) -> Any:
+        """Valor actual (o respaldo si aún no cargó); si está vencido se recarga en segundo plano"""
+        with self._lock:
+            fuente = self._fuentes[nombre]
+            valor = fuente["valor"] if fuente["cargado"] else fuente["respaldo"]
+            vencido = time.monotonic() >= fuente["vence"]
+        if vencido:
+            self._refrescar(nombre)
+        return valor
+
+    def invalidar(self, nombre: str) -> None:
+        """Fuerza la recarga en segundo plano (el valor actual se sigue sirviendo mientras tanto)"""
+        with self._lock:
+            self._fuentes[nombre]["vence"] = 0.0
+        self._refrescar(nombre)
+
+    def estado(self, nombre: str) -> dict:
+        """Antigüedad, último error y si se está sirviendo el respaldo"""
+        with self._lock:
+            fuente = self._fuentes[nombre]
+            return {
+                "respaldo": not fuente["cargado"],
+                "edad_segundos": None if fuente["actualizado"] is None else round(time.time() - fuente["actualizado"], 1),
+                "error": fuente["error"],
+            }
@@ -0,0 +1,72 @@
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable
+
+import pandas as pd
+
+import validacion_eecc
+
+
+def huella_envio(df_mapeado: pd.DataFrame, ciclo_id: str) -> str:
+    """Identifica un envío (ciclo + contenido mapeado) para retomar su progreso"""
+    h = hashlib.blake2b(digest_size=16)
+    h.update(str(ciclo_id).encode())
+    h.update(pd.util.hash_pandas_object(df_mapeado, index=False).to_numpy().tobytes())
+    return h.hexdigest()
+
+
+def llave_idempotencia(ciclo_id: str, secuencia: int, contenido: str) -> str:
+    """Misma llave para el mismo lote del mismo ciclo: n8n puede descartar reenvíos"""
+    h = hashlib.blake2b(digest_size=16)
+    h.update(f"{ciclo_id}|{secuencia}|".encode())
+    h.update(contenido.encode("utf-8"))
+    return f"{ciclo_id}-{secuencia:05d}-{h.hexdigest()}"
+
+
+def payloads_lotes(df_mapeado: pd.DataFrame, ciclo: dict, operador: str, filas_por_lote: int) -> list[dict]:
+    """Parte el EECC mapeado en lotes; cada payload lleva ciclo_id, secuencia, total y llave de idempotencia"""
+    total_lotes = max(1, -(-len(df_mapeado) // filas_por_lote))
+    payloads = []
+    for secuencia in range(total_lotes):
+        lote = df_mapeado.iloc[secuencia * filas_por_lote:(secuencia + 1) * filas_por_lote]
+        payload = validacion_eecc.payload_eecc(lote, ciclo, operador)
+        payload.update({
+            "total_records":   str(len(df_mapeado)),
+            "lote_records":    str(len(lote)),
+            "lote_secuencia":  secuencia,
+            "total_lotes":     total_lotes,
+            "idempotency_key": llave_idempotencia(ciclo["ciclo_id"], secuencia, payload["contenido"]),
+        })
+        payloads.append(payload)
+    return payloads
+
+
+def enviar_lotes(payloads: list[dict], enviar: Callable[[dict], bool], confirmados: set[int],
+                 max_concurrentes: int) -> dict[int, str]:
+    """Envía los lotes que no están en `confirmados`, hasta `max_concurrentes` a la vez.
+
+    `enviar(payload)` devuelve True si n8n confirmó el lote (o lanza una excepción). Cada
+    confirmación se agrega a `confirmados` apenas llega, así un reintento retoma desde el primer
+    lote sin confirmar. Devuelve {secuencia: error} de los lotes que fallaron.
+    """
+    pendientes = [p for p in payloads if p["lote_secuencia"] not in confirmados]
+    errores: dict[int, str] = {}
+    lock = threading.Lock()
+
+    def _enviar(payload):
+        try:
+            ok = enviar(payload)
+            error = None if ok else "rechazado"
+        except Exception as e:
+            error = str(e)
+        with lock:
+            if error is None:
+                confirmados.add(payload["lote_secuencia"])
+            else:
+                errores[payload["lote_secuencia"]] = error
+
+    with ThreadPoolExecutor(max_workers=max(1, max_concurrentes)) as pool:
+        for futuro in as_completed([pool.submit(_enviar, p) for p in pendientes]):
+            futuro.result()
+    return errores
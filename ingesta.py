@@ -0,0 +1,193 @@
+import gzip
+import importlib.util
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+
+import pandas as pd
+
+import cache_lecturas
+
+# --- Panda Empresas (CSV ';' con celdas ="…") ---
+# Únicas columnas que usa el modo PayIns Online
+COLUMNAS_PANDA_ONLINE: list[str] = [
+    "instruction_id", "operation", "amount", "currency", "fee",
+    "movement_day", "movement_hour",
+    "origin_name", "origin_document", "target_name", "entity",
+]
+# Se leen como texto para no perder ceros a la izquierda ni formatos de fecha/hora
+TIPOS_TEXTO_PANDA: dict[str, type] = {
+    "instruction_id": str, "operation": str, "origin_document": str,
+    "movement_day": str, "movement_hour": str,
+}
+FILAS_POR_BLOQUE_PANDA: int = 100_000
+
+
+def _filtrar_bloque_panda(bloque: pd.DataFrame, hora: int | None) -> pd.DataFrame:
+    """Deja solo CASHIN (y opcionalmente una hora) y limpia el instruction_id ="…" del bloque"""
+    bloque = bloque[bloque["operation"] == "CASHIN"]
+    if hora is not None:
+        hora_mov = pd.to_numeric(bloque["movement_hour"].str[:2], errors="coerce")
+        bloque = bloque[hora_mov == hora]
+    bloque = bloque.copy()
+    bloque["instruction_id"] = (
+        bloque["instruction_id"]
+        .astype(str)
+        .str.replace('="', '', regex=False)
+        .str.replace('"', '', regex=False)
+        .str.strip()
+    )
+    return bloque
+
+
+def leer_panda_cashin(contenido: bytes, hora: int | None = None,
+                      filas_por_bloque: int = FILAS_POR_BLOQUE_PANDA) -> pd.DataFrame:
+    """Lee el CSV de Panda Empresas por bloques, solo con las columnas del modo online.
+
+    Cada bloque se filtra a CASHIN (y a `hora` si se indica) antes de acumularse, así la
+    memoria pico depende del tamaño del resultado filtrado y no del archivo completo.
+    """
+    lector = pd.read_csv(
+        BytesIO(contenido),
+        sep=";",
+        usecols=lambda c: c in COLUMNAS_PANDA_ONLINE,
+        dtype=TIPOS_TEXTO_PANDA,
+        chunksize=filas_por_bloque,
+    )
+    bloques = [_filtrar_bloque_panda(bloque, hora) for bloque in lector]
+    if not bloques:
+        return pd.DataFrame(columns=COLUMNAS_PANDA_ONLINE)
+    return pd.concat(bloques, ignore_index=True)
+
+
+# --- EECC del banco (carga manual de contingencia) ---
+def leer_eecc(nombre: str, contenido: bytes) -> pd.DataFrame:
+    """Lee el EECC subido (xlsx, o csv/txt con separador autodetectado) y limpia celdas ="valor" """
+    if nombre.endswith(".xlsx"):
+        df = pd.read_excel(BytesIO(contenido))
+    else:
+        df = pd.read_csv(BytesIO(contenido), sep=None, engine="python")
+    df.columns = df.columns.str.strip()
+    # Limpiar formato de fórmula Excel: ="valor" → valor
+    for col in df.select_dtypes(include="object").columns:
+        df[col] = df[col].str.replace(r'^="(.*)"$', r'\1', regex=True)
+    return df
+
+
+# --- Metabase (xlsx / csv / json, uno o varios archivos) ---
+TIPOS_METABASE: dict[str, type] = {"PPY_external_id": str}
+
+
+def motor_excel() -> str:
+    """Motor de lectura xlsx: calamine (solo lectura, en Rust) si está instalado, si no openpyxl"""
+    if importlib.util.find_spec("python_calamine") is not None:
+        return "calamine"
+    return "openpyxl"
+
+
+def _leer_archivo_metabase(nombre: str, contenido: bytes, dtype: dict | None) -> tuple[pd.DataFrame, dict]:
+    """Parsea un archivo de Metabase y devuelve el frame junto con su tiempo de lectura"""
+    inicio = time.perf_counter()
+    if nombre.endswith(".json"):
+        motor = "json"
+        df = pd.read_json(BytesIO(contenido), dtype=dtype)
+    elif nombre.endswith(".csv"):
+        motor = "csv"
+        df = pd.read_csv(BytesIO(contenido), dtype=dtype)
+    else:
+        motor = motor_excel()
+        try:
+            df = pd.read_excel(BytesIO(contenido), dtype=dtype, engine=motor)
+        except (ImportError, ValueError):
+            # pandas < 2.2 no reconoce calamine
+            if motor == "openpyxl":
+                raise
+            motor = "openpyxl"
+            df = pd.read_excel(BytesIO(contenido), dtype=dtype, engine=motor)
+    tiempo = {
+        "archivo":  nombre,
+        "motor":    motor,
+        "filas":    len(df),
+        "segundos": round(time.perf_counter() - inicio, 3),
+    }
+    return df, tiempo
+
+
+def _leer_archivo_metabase_compactado(nombre: str, contenido: bytes,
+                                      dtype: dict | None) -> tuple[tuple[pd.DataFrame, dict], dict]:
+    """Como `_leer_archivo_metabase`, pero compacta el frame en el mismo worker que lo parsea"""
+    df, tiempo = _leer_archivo_metabase(nombre, contenido, dtype)
+    return cache_lecturas.compactar(df), tiempo
+
+
+def leer_metabase(archivos: list[tuple[str, bytes]], dtype: dict | None = None,
+                  max_procesos: int | None = None, mapear=None, compactado: bool = False):
+    """Lee uno o varios exports de Metabase y los concatena.
+
+    `archivos` es una lista de (nombre, bytes). Con más de un archivo el parseo se reparte en
+    un pool de procesos. `mapear(funcion, lista_args)` permite usar un pool ya levantado (p. ej.
+    el compartido del servidor). Devuelve el frame concatenado y los tiempos por archivo; con
+    `compactado` cada worker compacta su archivo y en lugar del frame devuelve (frame
+    compactado, dtypes) para el caché de lecturas.
+    """
+    dtype = TIPOS_METABASE if dtype is None else dtype
+    procesos = min(len(archivos), max_procesos or os.cpu_count() or 1)
+    leer = _leer_archivo_metabase_compactado if compactado else _leer_archivo_metabase
+
+    if mapear is not None:
+        resultados = mapear(leer, [(nombre, contenido, dtype) for nombre, contenido in archivos])
+    elif procesos <= 1:
+        resultados = [leer(nombre, contenido, dtype) for nombre, contenido in archivos]
+    else:
+        # spawn: el servidor de Streamlit tiene hilos vivos y un fork podría heredar locks tomados
+        contexto = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=procesos, mp_context=contexto) as pool:
+            futuros = [pool.submit(leer, nombre, contenido, dtype) for nombre, contenido in archivos]
+            resultados = [f.result() for f in futuros]
+
+    tiempos = [t for _, t in resultados]
+    if compactado:
+        return cache_lecturas.concatenar([parte for parte, _ in resultados]), tiempos
+    return pd.concat([df for df, _ in resultados], ignore_index=True), tiempos
+
+
+# --- Serialización del Metabase consolidado para n8n ---
+MIME_FORMATOS: dict[str, str] = {
+    "xlsx":    "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    "csv.gz":  "application/gzip",
+    "parquet": "application/vnd.apache.parquet",
+    "arrow":   "application/vnd.apache.arrow.stream",
+}
+
+
+def formato_transferencia(formato: str) -> str:
+    """Formato efectivo de envío: parquet/arrow bajan a csv.gz si pyarrow no está instalado"""
+    if formato in ("parquet", "arrow") and importlib.util.find_spec("pyarrow") is None:
+        return "csv.gz"
+    return formato
+
+
+def serializar_metabase(df: pd.DataFrame, formato: str) -> tuple[str, bytes, str]:
+    """Serializa el Metabase consolidado en el formato de transferencia pedido.
+
+    Devuelve la tupla (nombre, bytes, mime) que espera `requests` en `files=`.
+    """
+    formato = formato_transferencia(formato)
+    buffer = BytesIO()
+    if formato == "xlsx":
+        df.to_excel(buffer, index=False)
+    elif formato == "parquet":
+        df.to_parquet(buffer, index=False)
+    elif formato == "arrow":
+        import pyarrow as pa
+        tabla = pa.Table.from_pandas(df, preserve_index=False)
+        with pa.ipc.new_stream(buffer, tabla.schema) as escritor:
+            escritor.write_table(tabla)
+    elif formato == "csv.gz":
+        buffer.write(gzip.compress(df.to_csv(index=False).encode("utf-8"), compresslevel=6))
+    else:
+        raise ValueError(f"Formato de transferencia no soportado: {formato}")
+
+    return f"metabase_consolidado.{formato}", buffer.getvalue(), MIME_FORMATOS[formato]
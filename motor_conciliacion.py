@@ -0,0 +1,604 @@
+import json
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime, timedelta
+from io import BytesIO
+
+import numpy as np
+import pandas as pd
+
+# --- Resultados posibles de la conciliación por operación ---
+RESULTADO_CONCILIADO: str        = "Conciliado"
+RESULTADO_DIFERENCIA_MONTO: str  = "Diferencia de monto"
+RESULTADO_NO_EN_METABASE: str    = "No existe en Metabase"
+RESULTADO_NO_EN_GMONEY: str      = "No existe en GMoney"
+
+# Tolerancia para comparar montos (centavos)
+TOLERANCIA_MONTO: float = 0.005
+
+# Columnas del detalle PayIns Online (mismo esquema que devolvía n8n)
+COLUMNAS_DETALLE_PAYINS_ONLINE: list[str] = [
+    "ppy_external_id", "fecha", "hora",
+    "amount_metabase", "monto_gmoney", "diferencia", "resultado",
+    "moneda_metabase", "comercio_nombre",
+    "gmoney_currency", "gmoney_target_name", "gmoney_entity",
+    "gmoney_origin_name", "gmoney_origin_document",
+]
+
+
+def _texto(serie: pd.Series) -> pd.Series:
+    """Convierte una columna a texto limpio conservando los nulos"""
+    return serie.astype("string").str.strip()
+
+
+def _columna(df: pd.DataFrame, nombre: str) -> pd.Series:
+    """Devuelve la columna o una serie vacía si el archivo no la trae"""
+    if nombre in df.columns:
+        return df[nombre]
+    return pd.Series(None, index=df.index, dtype=object)
+
+
+def _llave_vacia(df: pd.DataFrame, llaves: list[str]) -> pd.Series:
+    """Filas con alguna llave nula o en blanco (no identifican una operación)"""
+    vacia = df[llaves].isna().any(axis=1)
+    return vacia | (df[llaves].astype("string") == "").fillna(False).any(axis=1)
+
+
+def _cruzar(izq: pd.DataFrame, der: pd.DataFrame, llaves: list[str],
+            sufijos: tuple[str, str] = ("_x", "_y")) -> pd.DataFrame:
+    """Outer merge con `_merge` (left_only / right_only / both) seguro ante llaves sucias.
+
+    Las filas con llave nula o en blanco no se cruzan entre sí: quedan como left_only /
+    right_only. Los ids repetidos se emparejan por orden de aparición (la k-ésima vez en un
+    lado con la k-ésima en el otro) y los sobrantes quedan sin pareja, en vez de un producto
+    cartesiano.
+    """
+    vacia_izq, vacia_der = _llave_vacia(izq, llaves), _llave_vacia(der, llaves)
+    con_izq, con_der = izq[~vacia_izq], der[~vacia_der]
+    cruce = (
+        con_izq.assign(_ocurrencia=con_izq.groupby(llaves, sort=False).cumcount())
+        .merge(con_der.assign(_ocurrencia=con_der.groupby(llaves, sort=False).cumcount()),
+               on=llaves + ["_ocurrencia"], how="outer", suffixes=sufijos, indicator=True, sort=False)
+        .drop(columns="_ocurrencia")
+    )
+    if not (vacia_izq.any() or vacia_der.any()):
+        return cruce
+    comunes = (set(izq.columns) & set(der.columns)) - set(llaves)
+    sueltas_izq = izq[vacia_izq].rename(columns={c: c + sufijos[0] for c in comunes}).assign(_merge="left_only")
+    sueltas_der = der[vacia_der].rename(columns={c: c + sufijos[1] for c in comunes}).assign(_merge="right_only")
+    return pd.concat([cruce, sueltas_izq, sueltas_der], ignore_index=True)
+
+
+def conciliar_payins_online(df_met: pd.DataFrame, df_panda: pd.DataFrame) -> pd.DataFrame:
+    """Cruza Metabase (PPY_external_id) con Panda (instruction_id) y clasifica cada operación.
+
+    El cruce es un hash join (pd.merge outer, ver `_cruzar`) sobre la llave normalizada; las
+    operaciones sin id quedan como no existentes del otro lado. Ambos frames deben traer la
+    columna `_fecha_iso` ya calculada. Devuelve una fila por operación con las
+    columnas de COLUMNAS_DETALLE_PAYINS_ONLINE.
+    """
+    met = pd.DataFrame({
+        "ppy_external_id": _texto(_columna(df_met, "PPY_external_id")),
+        "amount_metabase": pd.to_numeric(_columna(df_met, "amount"), errors="coerce"),
+        "moneda_metabase": _columna(df_met, "currency_code"),
+        "comercio_nombre": _columna(df_met, "Comercio_Nombre"),
+        "_fecha_met":      _columna(df_met, "_fecha_iso"),
+    })
+    gm = pd.DataFrame({
+        "ppy_external_id":        _texto(_columna(df_panda, "instruction_id")).str.strip('"'),
+        "monto_gmoney":           pd.to_numeric(_columna(df_panda, "amount"), errors="coerce"),
+        "gmoney_currency":        _columna(df_panda, "currency"),
+        "gmoney_target_name":     _columna(df_panda, "target_name"),
+        "gmoney_entity":          _columna(df_panda, "entity"),
+        "gmoney_origin_name":     _columna(df_panda, "origin_name"),
+        "gmoney_origin_document": _texto(_columna(df_panda, "origin_document")),
+        "_fecha_gm":              _columna(df_panda, "_fecha_iso"),
+    })
+
+    df = _cruzar(met, gm, ["ppy_external_id"])
+
+    solo_met = (df["_merge"] == "left_only").to_numpy()
+    solo_gm  = (df["_merge"] == "right_only").to_numpy()
+    diferencia = (df["amount_metabase"].fillna(0) - df["monto_gmoney"].fillna(0)).round(2)
+    df["diferencia"] = diferencia
+    df["resultado"] = np.select(
+        [solo_met, solo_gm, diferencia.abs().to_numpy() > TOLERANCIA_MONTO],
+        [RESULTADO_NO_EN_GMONEY, RESULTADO_NO_EN_METABASE, RESULTADO_DIFERENCIA_MONTO],
+        default=RESULTADO_CONCILIADO,
+    )
+
+    df["fecha"] = df["_fecha_met"].fillna(df["_fecha_gm"])
+    df["hora"]  = df["fecha"].astype("string").str[11:19]
+    return df[COLUMNAS_DETALLE_PAYINS_ONLINE].reset_index(drop=True)
+
+
+def diferencias(df_detalle: pd.DataFrame) -> pd.DataFrame:
+    """Filtra el detalle a las operaciones que no concilian"""
+    return df_detalle[df_detalle["resultado"] != RESULTADO_CONCILIADO].reset_index(drop=True)
+
+
+# ============================================================
+# PAYINS ONLINE — fechas, filtro por hora, payload y totales por hora
+# ============================================================
+# Esquema común de filas enviadas a n8n (Metabase y GMoney)
+COLUMNAS_FILAS_PAYINS_ONLINE: list[str] = [
+    "session_id", "source", "join_key", "amount", "currency", "fecha",
+    "comercio_nombre", "deudor_nombre", "deudor_documento", "deuda_public_id", "deuda_estado",
+    "origin_name", "origin_document", "target_name", "fee", "entity", "operation",
+]
+
+
+def fechas_metabase(df_met: pd.DataFrame) -> pd.Series:
+    """Parsea PC_create_date_GMT_Peru (dd/mm/yyyy, con coma opcional antes de la hora)"""
+    return pd.to_datetime(
+        df_met['PC_create_date_GMT_Peru'].astype(str).str.replace(',', '', regex=False),
+        dayfirst=True, errors='coerce'
+    )
+
+
+def fechas_panda(df_panda: pd.DataFrame) -> pd.Series:
+    """Parsea movement_day + movement_hour de Panda Empresas"""
+    return pd.to_datetime(
+        df_panda['movement_day'] + ' ' + df_panda['movement_hour'],
+        dayfirst=True, errors='coerce'
+    )
+
+
+def hora_anterior(ahora: datetime) -> tuple[date, int]:
+    """(fecha, hora) de la hora cerrada previa a `ahora`; a las 00:xx es la hora 23 del día anterior"""
+    previa = ahora - timedelta(hours=1)
+    return previa.date(), previa.hour
+
+
+def filtrar_hora(df: pd.DataFrame, dt: pd.Series, hora: int, fecha: date | None = None) -> pd.DataFrame:
+    """Filtra las filas de una hora (y opcionalmente de una fecha) y agrega `_fecha_iso` para el payload"""
+    mascara = dt.dt.hour == hora
+    if fecha is not None:
+        mascara &= dt.dt.normalize() == pd.Timestamp(fecha)
+    df_hora = df[mascara].copy()
+    df_hora['_fecha_iso'] = dt[mascara].dt.strftime('%Y-%m-%d %H:%M:%S')
+    return df_hora
+
+
+def construir_filas_payins_online(df_met: pd.DataFrame, df_panda: pd.DataFrame, session_id: str) -> pd.DataFrame:
+    """Arma las filas Metabase + GMoney que se envían a n8n como un frame con COLUMNAS_FILAS_PAYINS_ONLINE.
+
+    Se proyecta, renombra y castea columna a columna (sin dicts por fila); las columnas que
+    no aplican a una fuente quedan nulas.
+    """
+    met = pd.DataFrame({
+        "session_id":       session_id,
+        "source":           "metabase",
+        "join_key":         _texto(_columna(df_met, "PPY_external_id")),
+        "amount":           pd.to_numeric(_columna(df_met, "amount"), errors="coerce"),
+        "currency":         _columna(df_met, "currency_code"),
+        "fecha":            _columna(df_met, "_fecha_iso"),
+        "comercio_nombre":  _columna(df_met, "Comercio_Nombre"),
+        "deudor_nombre":    _columna(df_met, "Deudor_Nombre"),
+        "deudor_documento": _columna(df_met, "Deudor_Documento"),
+        "deuda_public_id":  _columna(df_met, "Deuda_public_id"),
+        "deuda_estado":     _columna(df_met, "Deuda_Estado"),
+    }, index=df_met.index)
+    gm = pd.DataFrame({
+        "session_id":      session_id,
+        "source":          "gmoney",
+        "join_key":        _texto(_columna(df_panda, "instruction_id")).str.strip('"'),
+        "amount":          pd.to_numeric(_columna(df_panda, "amount"), errors="coerce"),
+        "currency":        _columna(df_panda, "currency"),
+        "fecha":           _columna(df_panda, "_fecha_iso"),
+        "origin_name":     _columna(df_panda, "origin_name"),
+        "origin_document": _columna(df_panda, "origin_document").astype("string"),
+        "target_name":     _columna(df_panda, "target_name"),
+        "fee":             pd.to_numeric(_columna(df_panda, "fee"), errors="coerce"),
+        "entity":          _columna(df_panda, "entity"),
+        "operation":       _columna(df_panda, "operation"),
+    }, index=df_panda.index)
+    return pd.concat(
+        [met.reindex(columns=COLUMNAS_FILAS_PAYINS_ONLINE), gm.reindex(columns=COLUMNAS_FILAS_PAYINS_ONLINE)],
+        ignore_index=True,
+    )
+
+
+def codificar_filas_json(df_filas: pd.DataFrame) -> bytes:
+    """Serializa las filas a un arreglo JSON (nulos/NaN → null) sin pasar por objetos Python"""
+    if df_filas.empty:
+        return b"[]"
+    return df_filas.to_json(orient="records", force_ascii=False, double_precision=15).encode("utf-8")
+
+
+def cuerpo_payins_online(session_id: str, hora_filtro: int, df_filas: pd.DataFrame, fecha_inicio_iso: str) -> bytes:
+    """Cuerpo JSON del webhook N8N_PAYINS_ONLINE_V2 (persistencia de las filas de la hora)"""
+    encabezado = json.dumps({
+        "session_id": session_id,
+        "tipo_conciliacion": "payins_online",
+        "hora_filtro": hora_filtro,
+        "fecha_inicio_iso": fecha_inicio_iso,
+    })
+    return encabezado[:-1].encode("utf-8") + b', "rows": ' + codificar_filas_json(df_filas) + b"}"
+
+
+def conciliar_por_hora(df_met: pd.DataFrame, dt_met: pd.Series,
+                       df_panda: pd.DataFrame, dt_panda: pd.Series,
+                       hora_actual: int | None = None) -> pd.DataFrame:
+    """Totales por (fecha, hora) Metabase vs GMoney; si se indica `hora_actual` deja solo horas cerradas"""
+    grp_met = (
+        df_met
+        .assign(_fecha=dt_met.dt.date, _hora=dt_met.dt.hour)
+        .groupby(['_fecha', '_hora'])['amount'].sum()
+        .reset_index()
+        .rename(columns={'_fecha': 'fecha_conciliacion', '_hora': 'hora', 'amount': 'total_amount_metabase'})
+    )
+    grp_panda = (
+        df_panda
+        .assign(_fecha=dt_panda.dt.date, _hora=dt_panda.dt.hour)
+        .groupby(['_fecha', '_hora'])['amount'].sum()
+        .reset_index()
+        .rename(columns={'_fecha': 'fecha_conciliacion', '_hora': 'hora', 'amount': 'total_amount_gmoney'})
+    )
+
+    df_conc_hora = (
+        grp_met.merge(grp_panda, on=['fecha_conciliacion', 'hora'], how='outer')
+        .fillna(0)
+        .sort_values(['fecha_conciliacion', 'hora'])
+        .reset_index(drop=True)
+    )
+    df_conc_hora['diferencia'] = df_conc_hora['total_amount_metabase'] - df_conc_hora['total_amount_gmoney']
+    df_conc_hora['estado'] = np.where(df_conc_hora['diferencia'] == 0, 'Conciliado', 'Diferencias')
+    if hora_actual is not None:
+        df_conc_hora = df_conc_hora[df_conc_hora['hora'] < hora_actual].reset_index(drop=True)
+    return df_conc_hora
+
+# ============================================================
+# PAYINS ONLINE — backfill de varias horas
+# ============================================================
+ESTADO_HORA_CONCILIADA: str  = "Conciliado"
+ESTADO_HORA_DIFERENCIAS: str = "Diferencias"
+ESTADO_HORA_SIN_DATOS: str   = "Sin datos"
+ESTADO_HORA_ERROR: str       = "Error"
+
+# Por debajo de estas filas (Metabase + Panda) el backfill corre en el proceso actual:
+# levantar el pool con spawn cuesta más que conciliar
+FILAS_MIN_BACKFILL_PARALELO: int = 200_000
+
+
+def horas_rango(inicio: datetime, fin: datetime) -> list[tuple[date, int]]:
+    """Horas (fecha, hora) desde la hora de `inicio` hasta la de `fin`, ambas incluidas"""
+    actual = inicio.replace(minute=0, second=0, microsecond=0)
+    horas = []
+    while actual <= fin:
+        horas.append((actual.date(), actual.hour))
+        actual += timedelta(hours=1)
+    return horas
+
+
+def particionar_por_hora(df: pd.DataFrame, dt: pd.Series) -> dict[tuple[date, int], pd.DataFrame]:
+    """Parte el frame por (fecha, hora) en una sola pasada; cada parte trae `_fecha_iso`.
+    Las filas sin fecha válida se descartan."""
+    df = df.assign(_fecha_iso=dt.dt.strftime('%Y-%m-%d %H:%M:%S'))
+    grupos = df.groupby([dt.dt.normalize().rename("_dia"), dt.dt.hour.rename("_hora")], sort=True)
+    return {(dia.date(), int(hora)): parte for (dia, hora), parte in grupos}
+
+
+def _conciliar_particion(clave: tuple[date, int], df_met: pd.DataFrame, df_panda: pd.DataFrame):
+    """Concilia una hora del backfill y resume su estado (se ejecuta también en los workers)"""
+    fecha, hora = clave
+    estado = {
+        "fecha": fecha.isoformat(), "hora": hora,
+        "filas_metabase": len(df_met), "filas_gmoney": len(df_panda),
+        "total_amount_metabase": float(pd.to_numeric(_columna(df_met, "amount"), errors="coerce").sum()),
+        "total_amount_gmoney": float(pd.to_numeric(_columna(df_panda, "amount"), errors="coerce").sum()),
+        "conciliadas": 0, "diferencias": 0, "estado": ESTADO_HORA_SIN_DATOS, "error": None,
+    }
+    if df_met.empty and df_panda.empty:
+        return clave, None, estado
+    try:
+        detalle = conciliar_payins_online(df_met, df_panda)
+    except Exception as e:
+        estado.update(estado=ESTADO_HORA_ERROR, error=str(e))
+        return clave, None, estado
+    no_conciliadas = detalle["resultado"] != RESULTADO_CONCILIADO
+    estado["conciliadas"] = int((~no_conciliadas).sum())
+    estado["diferencias"] = int(no_conciliadas.sum())
+    estado["estado"] = ESTADO_HORA_DIFERENCIAS if estado["diferencias"] else ESTADO_HORA_CONCILIADA
+    return clave, detalle[no_conciliadas], estado
+
+
+def conciliar_backfill(df_met: pd.DataFrame, dt_met: pd.Series,
+                       df_panda: pd.DataFrame, dt_panda: pd.Series,
+                       horas: list[tuple[date, int]] | None = None,
+                       max_procesos: int | None = None, mapear=None) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """Concilia PayIns Online para varias horas (fecha, hora) de una vez.
+
+    Metabase y Panda se parten por hora en una sola pasada y cada hora se concilia por
+    separado, en un pool de procesos cuando el volumen lo justifica (`mapear(funcion,
+    lista_args)` usa un pool ya levantado en vez de uno propio). `horas=None` concilia
+    todas las horas presentes en los archivos. Devuelve (diferencias de todas las horas,
+    estado por hora con totales, conteos y `estado`).
+    """
+    part_met = particionar_por_hora(df_met, dt_met)
+    part_panda = particionar_por_hora(df_panda, dt_panda)
+    if horas is None:
+        horas = sorted(set(part_met) | set(part_panda))
+    vacio_met, vacio_panda = df_met.iloc[:0], df_panda.iloc[:0]
+    tareas = [(clave, part_met.get(clave, vacio_met), part_panda.get(clave, vacio_panda)) for clave in horas]
+
+    filas = sum(len(m) + len(p) for _, m, p in tareas)
+    procesos = min(len(tareas), max_procesos or os.cpu_count() or 1)
+    if procesos <= 1 or filas < FILAS_MIN_BACKFILL_PARALELO:
+        resultados = [_conciliar_particion(*t) for t in tareas]
+    elif mapear is not None:
+        resultados = mapear(_conciliar_particion, tareas)
+    else:
+        # spawn: el servidor de Streamlit tiene hilos vivos y un fork podría heredar locks tomados
+        contexto = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=procesos, mp_context=contexto) as pool:
+            futuros = [pool.submit(_conciliar_particion, *t) for t in tareas]
+            resultados = [f.result() for f in futuros]
+
+    detalles = [d for _, d, _ in resultados if d is not None and len(d)]
+    detalle = (pd.concat(detalles, ignore_index=True) if detalles
+               else pd.DataFrame(columns=COLUMNAS_DETALLE_PAYINS_ONLINE))
+    estado = pd.DataFrame([e for _, _, e in resultados])
+    if len(estado):
+        estado["diferencia"] = (estado["total_amount_metabase"] - estado["total_amount_gmoney"]).round(2)
+    return detalle, estado
+
+
+# ============================================================
+# PAYINS ONLINE — conciliación por hora incremental
+# ============================================================
+# Columnas que identifican una fila para detectar filas nuevas o modificadas entre corridas
+COLUMNAS_HUELLA_METABASE: list[str] = ["PPY_external_id", "amount", "PC_create_date_GMT_Peru"]
+COLUMNAS_HUELLA_PANDA: list[str]    = ["instruction_id", "amount", "movement_day", "movement_hour"]
+# Columnas que leen fechas_metabase / fechas_panda
+COLUMNAS_FECHA_METABASE: list[str] = ["PC_create_date_GMT_Peru"]
+COLUMNAS_FECHA_PANDA: list[str]    = ["movement_day", "movement_hour"]
+
+_SIN_HORA = np.iinfo(np.int64).min
+
+
+def _huellas_filas(df: pd.DataFrame, columnas: list[str]) -> np.ndarray:
+    """Hash uint64 por fila de las columnas relevantes"""
+    presentes = [c for c in columnas if c in df.columns]
+    return pd.util.hash_pandas_object(df[presentes], index=False).to_numpy()
+
+
+def _codigos_hora(dt: np.ndarray) -> np.ndarray:
+    """Horas desde epoch (int64) de cada fecha; las fechas inválidas quedan en _SIN_HORA"""
+    codigos = dt.astype("datetime64[h]").astype(np.int64)
+    codigos[np.isnat(dt)] = _SIN_HORA
+    return codigos
+
+
+def _firmas_hora(codigos: np.ndarray, huellas: np.ndarray) -> pd.DataFrame:
+    """Firma (filas, suma de hashes) por hora: si cambia, cambió alguna fila de esa hora"""
+    df = pd.DataFrame({
+        "codigo": codigos,
+        "lo": (huellas & 0xFFFFFFFF).astype(np.int64),
+        "hi": (huellas >> 32).astype(np.int64),
+    })
+    df = df[df["codigo"] != _SIN_HORA]
+    return df.groupby("codigo").agg(filas=("lo", "size"), lo=("lo", "sum"), hi=("hi", "sum"))
+
+
+class ConciliadorHorario:
+    """Conciliación por hora de PayIns Online que conserva el trabajo de corridas anteriores.
+
+    Guarda la fecha parseada de cada fila (por hash), los totales por hora y las llaves
+    conciliadas / sin conciliar de cada hora. En cada corrida solo parsea las filas nuevas y
+    solo recalcula las horas cuya firma cambió, así el costo sigue a los datos nuevos y no al
+    tamaño del archivo acumulado del día.
+    """
+
+    def __init__(self):
+        self._fechas: dict[str, pd.Series] = {}      # fuente -> fecha parseada indexada por hash de fila
+        self._firmas: dict[str, pd.DataFrame] = {}   # fuente -> firma por código de hora
+        self._agregados = pd.DataFrame(
+            columns=["total_amount_metabase", "total_amount_gmoney", "conciliadas", "sin_conciliar"]
+        ).rename_axis("codigo")
+        self._claves: dict[int, dict[str, np.ndarray]] = {}
+        self.filas_nuevas = 0
+        self.horas_recalculadas: list[int] = []
+
+    def _fechas_fuente(self, fuente: str, df: pd.DataFrame, columnas: list[str], parsear,
+                       columnas_fecha: list[str], ejecutar) -> tuple[np.ndarray, np.ndarray]:
+        """Fechas de todas las filas: las ya vistas salen del caché, solo se parsean las nuevas"""
+        huellas = _huellas_filas(df, columnas)
+        previas = self._fechas.get(fuente)
+        dt = np.full(len(df), np.datetime64("NaT"), dtype="datetime64[ns]")
+        if previas is None or previas.empty:
+            nuevas = np.ones(len(df), dtype=bool)
+        else:
+            pos = previas.index.get_indexer(huellas)
+            nuevas = pos < 0
+            dt[~nuevas] = previas.to_numpy()[pos[~nuevas]]
+        if nuevas.any():
+            dt[nuevas] = ejecutar(parsear, df.loc[nuevas, columnas_fecha]).to_numpy(dtype="datetime64[ns]")
+        self.filas_nuevas += int(nuevas.sum())
+
+        cache = pd.Series(dt, index=huellas)
+        self._fechas[fuente] = cache[~cache.index.duplicated()]
+        return dt, huellas
+
+    def actualizar(self, df_met: pd.DataFrame, df_panda: pd.DataFrame, ejecutar=None) -> tuple[pd.Series, pd.Series]:
+        """Incorpora los archivos actuales y recalcula las horas nuevas o modificadas.
+
+        `ejecutar(funcion, df)` corre el parseo de fechas de las filas nuevas (p. ej. en el pool de
+        procesos del servidor; solo viajan las columnas de fecha). Devuelve las fechas parseadas
+        de Metabase y Panda (alineadas con cada frame) para reutilizarlas en el filtro por hora.
+        """
+        ejecutar = ejecutar or (lambda funcion, df: funcion(df))
+        self.filas_nuevas = 0
+        dt_met, h_met = self._fechas_fuente("metabase", df_met, COLUMNAS_HUELLA_METABASE, fechas_metabase,
+                                            COLUMNAS_FECHA_METABASE, ejecutar)
+        dt_panda, h_panda = self._fechas_fuente("panda", df_panda, COLUMNAS_HUELLA_PANDA, fechas_panda,
+                                                COLUMNAS_FECHA_PANDA, ejecutar)
+        cod_met, cod_panda = _codigos_hora(dt_met), _codigos_hora(dt_panda)
+
+        cambiadas = set()
+        vigentes = set()
+        for fuente, codigos, huellas in (("metabase", cod_met, h_met), ("panda", cod_panda, h_panda)):
+            firmas = _firmas_hora(codigos, huellas)
+            previas = self._firmas.get(fuente, firmas.iloc[:0])
+            union = firmas.index.union(previas.index)
+            distintas = firmas.reindex(union).fillna(-1).ne(previas.reindex(union).fillna(-1)).any(axis=1)
+            cambiadas.update(int(c) for c in union[distintas.to_numpy()])
+            vigentes.update(int(c) for c in firmas.index)
+            self._firmas[fuente] = firmas
+
+        # Horas que ya no están en ningún archivo
+        for codigo in cambiadas - vigentes:
+            self._claves.pop(codigo, None)
+        self._agregados = self._agregados.drop(index=list(cambiadas), errors="ignore")
+
+        recalcular = sorted(cambiadas & vigentes)
+        if recalcular:
+            self._recalcular(recalcular, df_met, cod_met, df_panda, cod_panda)
+        self.horas_recalculadas = recalcular
+        return pd.Series(dt_met, index=df_met.index), pd.Series(dt_panda, index=df_panda.index)
+
+    def _recalcular(self, codigos: list[int], df_met, cod_met, df_panda, cod_panda) -> None:
+        """Totales y llaves conciliadas / sin conciliar de las horas indicadas"""
+        m_met = np.isin(cod_met, codigos)
+        m_panda = np.isin(cod_panda, codigos)
+        met = pd.DataFrame({
+            "codigo": cod_met[m_met],
+            "id":     _texto(_columna(df_met, "PPY_external_id")[m_met]).to_numpy(),
+            "amount": pd.to_numeric(_columna(df_met, "amount")[m_met], errors="coerce").to_numpy(),
+        })
+        gm = pd.DataFrame({
+            "codigo": cod_panda[m_panda],
+            "id":     _texto(_columna(df_panda, "instruction_id")[m_panda]).str.strip('"').to_numpy(),
+            "amount": pd.to_numeric(_columna(df_panda, "amount")[m_panda], errors="coerce").to_numpy(),
+        })
+
+        cruce = _cruzar(met, gm, ["codigo", "id"], sufijos=("_met", "_gm"))
+        diferencia = (cruce["amount_met"].fillna(0) - cruce["amount_gm"].fillna(0)).abs()
+        cruce["conciliada"] = (cruce["_merge"] == "both") & (diferencia <= TOLERANCIA_MONTO)
+
+        agregados = pd.DataFrame({
+            "total_amount_metabase": met.groupby("codigo")["amount"].sum(),
+            "total_amount_gmoney":   gm.groupby("codigo")["amount"].sum(),
+            "conciliadas":           cruce.groupby("codigo")["conciliada"].sum(),
+            "sin_conciliar":         (~cruce["conciliada"]).groupby(cruce["codigo"]).sum(),
+        }).reindex(codigos).fillna(0)
+        self._agregados = pd.concat([self._agregados, agregados]).sort_index()
+
+        for codigo, grupo in cruce.groupby("codigo"):
+            self._claves[int(codigo)] = {
+                "conciliadas":    grupo.loc[grupo["conciliada"], "id"].to_numpy(),
+                "no_en_gmoney":   grupo.loc[grupo["_merge"] == "left_only", "id"].to_numpy(),
+                "no_en_metabase": grupo.loc[grupo["_merge"] == "right_only", "id"].to_numpy(),
+                "diferencia_monto": grupo.loc[(grupo["_merge"] == "both") & ~grupo["conciliada"], "id"].to_numpy(),
+            }
+
+    def claves(self, fecha: date, hora: int) -> dict[str, np.ndarray]:
+        """Llaves conciliadas / sin conciliar de una hora (vacío si la hora no tiene datos)"""
+        codigo = int(np.datetime64(datetime.combine(fecha, datetime.min.time()).replace(hour=hora), "h").astype(np.int64))
+        return self._claves.get(codigo, {})
+
+    def por_hora(self, hasta: datetime | None = None) -> pd.DataFrame:
+        """Totales por (fecha, hora) con el esquema de conciliar_por_hora; con `hasta` deja solo
+        las horas que terminan antes de esa fecha/hora"""
+        df = self._agregados
+        if hasta is not None:
+            limite = np.datetime64(hasta.replace(tzinfo=None), "h").astype(np.int64)
+            df = df[df.index < limite]
+        inicio = pd.to_datetime(df.index.to_numpy(dtype=np.int64), unit="h")
+        salida = pd.DataFrame({
+            "fecha_conciliacion":    inicio.date,
+            "hora":                  inicio.hour,
+            "total_amount_metabase": df["total_amount_metabase"].to_numpy(dtype=float),
+            "total_amount_gmoney":   df["total_amount_gmoney"].to_numpy(dtype=float),
+        })
+        salida["diferencia"] = salida["total_amount_metabase"] - salida["total_amount_gmoney"]
+        salida["estado"] = np.where(salida["diferencia"] == 0, "Conciliado", "Diferencias")
+        salida["operaciones_conciliadas"] = df["conciliadas"].to_numpy(dtype=np.int64)
+        salida["operaciones_sin_conciliar"] = df["sin_conciliar"].to_numpy(dtype=np.int64)
+        return salida
+
+
+# ============================================================
+# CONCILIACIÓN DIARIA (PayOuts / PayIns) — detalle e importes
+# ============================================================
+RESULTADO_DIARIA_OK: str              = "OK"
+RESULTADO_DIARIA_DIFERENCIA: str      = "DIFERENCIA_MONTO"
+RESULTADO_DIARIA_NO_EN_METABASE: str  = "NO_EXISTE_METABASE"
+RESULTADO_DIARIA_NO_EN_GMONEY: str    = "NO_EXISTE_GMONEY"
+# Fecha de los importes de las filas cuya fecha no se pudo leer
+FECHA_DIARIA_SIN_FECHA: str = "sin fecha"
+
+
+def limpiar_formula_excel(df: pd.DataFrame) -> pd.DataFrame:
+    """Limpia el formato de fórmula Excel ="valor" → valor en las columnas de texto"""
+    df = df.copy()
+    for col in df.select_dtypes(include=["object", "string"]).columns:
+        df[col] = df[col].str.replace(r'^="(.*)"$', r'\1', regex=True).str.strip()
+    return df
+
+
+def leer_txt_gmoney(contenido: bytes, sep: str = ";") -> pd.DataFrame:
+    """Lee el TXT de GMoney (delimitado, con celdas ="…") directamente desde los bytes subidos"""
+    df = pd.read_csv(BytesIO(contenido), sep=sep, dtype=str, keep_default_na=False, na_values=[""])
+    df.columns = df.columns.str.strip()
+    return limpiar_formula_excel(df)
+
+
+def _proyectar_diaria(df: pd.DataFrame, columnas: dict) -> pd.DataFrame:
+    """Reduce un archivo a (id, monto, fecha) aplicando los filtros configurados"""
+    for col, valor in columnas.get("filtros", {}).items():
+        if col in df.columns:
+            df = df[df[col].astype(str).str.strip() == valor]
+    fecha_txt = df[columnas["fecha"]].astype(str).str.replace(',', '', regex=False).str.strip()
+    return pd.DataFrame({
+        "id":    df[columnas["id"]].astype("string").str.strip(),
+        "monto": pd.to_numeric(df[columnas["monto"]], errors="coerce").fillna(0.0),
+        "fecha": pd.to_datetime(fecha_txt, dayfirst=True, errors="coerce").dt.strftime("%Y-%m-%d"),
+    })
+
+
+def conciliar_diaria(df_metabase: pd.DataFrame, df_gmoney: pd.DataFrame, columnas: dict) -> dict:
+    """Concilia un día completo Metabase vs GMoney.
+
+    `columnas` es la entrada de config.COLUMNAS_DIARIA para el tipo de conciliación. Devuelve
+    el mismo dict que respondía n8n: `importes` (totales por día con diferencia) y `detalle`
+    (operaciones con `resultado_conciliacion` distinto de OK y su `diferencia`). Los montos de
+    filas con fecha ilegible van a `importes` como FECHA_DIARIA_SIN_FECHA, siempre visibles.
+    """
+    met = _proyectar_diaria(df_metabase, columnas["metabase"])
+    gm  = _proyectar_diaria(df_gmoney, columnas["gmoney"])
+
+    # --- Importes por día ---
+    tot_met = met.groupby("fecha", sort=False, dropna=False)["monto"].sum().rename("total_metabase")
+    tot_gm  = gm.groupby("fecha", sort=False, dropna=False)["monto"].sum().rename("total_gmoney")
+    importes = (
+        pd.concat([tot_met, tot_gm], axis=1)
+        .fillna(0.0)
+        .rename_axis("fecha")
+        .reset_index()
+    )
+    importes["fecha"] = importes["fecha"].fillna(FECHA_DIARIA_SIN_FECHA)
+    importes = importes.sort_values("fecha")
+    importes["diferencia"] = (importes["total_metabase"] - importes["total_gmoney"]).round(2)
+    importes = importes[(importes["diferencia"].abs() > TOLERANCIA_MONTO)
+                        | (importes["fecha"] == FECHA_DIARIA_SIN_FECHA)]
+
+    # --- Detalle por operación ---
+    det = _cruzar(met, gm, ["id"], sufijos=("_metabase", "_gmoney"))
+    solo_met = (det["_merge"] == "left_only").to_numpy()
+    solo_gm  = (det["_merge"] == "right_only").to_numpy()
+    det["diferencia"] = (det["monto_metabase"].fillna(0) - det["monto_gmoney"].fillna(0)).round(2)
+    det["resultado_conciliacion"] = np.select(
+        [solo_met, solo_gm, det["diferencia"].abs().to_numpy() > TOLERANCIA_MONTO],
+        [RESULTADO_DIARIA_NO_EN_GMONEY, RESULTADO_DIARIA_NO_EN_METABASE, RESULTADO_DIARIA_DIFERENCIA],
+        default=RESULTADO_DIARIA_OK,
+    )
+    det = det[det["resultado_conciliacion"] != RESULTADO_DIARIA_OK]
+    det = det[["id", "fecha_metabase", "fecha_gmoney", "monto_metabase", "monto_gmoney",
+               "diferencia", "resultado_conciliacion"]]
+
+    return {
+        "importes": importes.to_dict("records"),
+        "detalle":  det.astype(object).where(det.notna(), None).to_dict("records"),
+    }
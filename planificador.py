@@ -0,0 +1,125 @@
+import itertools
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable
+
+
+def estimar_memoria(archivos: list[tuple[str, int]], factores: dict[str, float], factor_defecto: float = 6.0) -> int:
+    """Memoria pico estimada (bytes) de procesar los archivos subidos: tamaño × factor por extensión"""
+    total = 0.0
+    for nombre, tamano in archivos:
+        extension = nombre.rsplit(".", 1)[-1].lower() if "." in nombre else ""
+        total += tamano * factores.get(extension, factor_defecto)
+    return int(total)
+
+
+class Planificador:
+    """Control de admisión de las operaciones pesadas del servidor (validación/envío de EECC,
+    conciliaciones Diaria, PayIns Online).
+
+    Cada operación pide un turno con su tipo, usuario y memoria estimada, y espera hasta que
+    haya lugar: como mucho `limites_tipo[tipo]` del mismo tipo, `limite_usuario` del mismo
+    usuario y `memoria_bytes` estimados en curso a la vez. La cola es justa entre usuarios:
+    primero pasa el usuario con menos operaciones en curso y, entre iguales, el que llegó
+    antes. Un turno que solo espera memoria no se deja adelantar, para que los archivos
+    grandes no se queden esperando para siempre; si no hay nada en curso pasa aunque supere
+    el presupuesto.
+    """
+
+    def __init__(self, limites_tipo: dict[str, int], limite_usuario: int, memoria_bytes: int,
+                 limite_tipo_defecto: int = 1):
+        self.limites_tipo = limites_tipo
+        self.limite_usuario = limite_usuario
+        self.memoria_bytes = memoria_bytes
+        self.limite_tipo_defecto = limite_tipo_defecto
+        self._secuencia = itertools.count()
+        self._esperando: dict[str, dict] = {}
+        self._en_curso: dict[str, dict] = {}
+        self._cambio = threading.Condition()
+
+    def _conteo(self, campo: str, valor: str) -> int:
+        return sum(1 for t in self._en_curso.values() if t[campo] == valor)
+
+    def _orden(self) -> list[dict]:
+        """Turnos en espera en el orden en que pasarían"""
+        return sorted(self._esperando.values(),
+                      key=lambda t: (self._conteo("usuario", t["usuario"]), t["orden"]))
+
+    def _despachar(self) -> None:
+        """Admite todo lo que entra con los límites actuales (llamar con el lock tomado)"""
+        admitidos = False
+        for turno in self._orden():
+            if self._conteo("tipo", turno["tipo"]) >= self.limites_tipo.get(turno["tipo"], self.limite_tipo_defecto):
+                continue
+            if self._conteo("usuario", turno["usuario"]) >= self.limite_usuario:
+                continue
+            memoria_en_curso = sum(t["memoria"] for t in self._en_curso.values())
+            if self._en_curso and memoria_en_curso + turno["memoria"] > self.memoria_bytes:
+                break
+            del self._esperando[turno["id"]]
+            turno["admitido"] = time.time()
+            self._en_curso[turno["id"]] = turno
+            admitidos = True
+        if admitidos:
+            self._cambio.notify_all()
+
+    def solicitar(self, tipo: str, usuario: str | None, memoria_bytes: int = 0) -> str:
+        """Pide un turno y devuelve su id (puede quedar admitido de inmediato)"""
+        with self._cambio:
+            orden = next(self._secuencia)
+            turno_id = f"{tipo}-{orden}"
+            self._esperando[turno_id] = {
+                "id": turno_id, "orden": orden, "tipo": tipo, "usuario": usuario or "",
+                "memoria": int(memoria_bytes), "solicitado": time.time(), "admitido": None,
+            }
+            self._despachar()
+        return turno_id
+
+    def esperar(self, turno_id: str, timeout: float | None = None) -> bool:
+        """Espera a que el turno sea admitido; False si venció el timeout"""
+        with self._cambio:
+            return self._cambio.wait_for(lambda: turno_id not in self._esperando, timeout)
+
+    def posicion(self, turno_id: str) -> int | None:
+        """0 si ya está en curso, 1.. su lugar en la cola, None si no existe"""
+        with self._cambio:
+            if turno_id in self._en_curso:
+                return 0
+            for i, turno in enumerate(self._orden(), start=1):
+                if turno["id"] == turno_id:
+                    return i
+            return None
+
+    def liberar(self, turno_id: str) -> None:
+        """Devuelve el lugar del turno (o lo saca de la cola) y admite a los siguientes"""
+        with self._cambio:
+            self._esperando.pop(turno_id, None)
+            self._en_curso.pop(turno_id, None)
+            self._despachar()
+
+    @contextmanager
+    def turno(self, tipo: str, usuario: str | None, memoria_bytes: int = 0,
+              al_esperar: Callable[[int], None] | None = None, cada_segundos: float = 0.5):
+        """Bloque que corre con turno admitido; mientras espera llama a `al_esperar(posición)`"""
+        turno_id = self.solicitar(tipo, usuario, memoria_bytes)
+        try:
+            while not self.esperar(turno_id, cada_segundos):
+                if al_esperar is not None:
+                    al_esperar(self.posicion(turno_id) or 0)
+            yield turno_id
+        finally:
+            self.liberar(turno_id)
+
+    def estado(self) -> dict:
+        """Operaciones en curso por tipo, en cola y memoria estimada en uso"""
+        with self._cambio:
+            en_curso: dict[str, int] = {}
+            for t in self._en_curso.values():
+                en_curso[t["tipo"]] = en_curso.get(t["tipo"], 0) + 1
+            return {
+                "en_curso": en_curso,
+                "en_cola": len(self._esperando),
+                "memoria_mb": round(sum(t["memoria"] for t in self._en_curso.values()) / 1024 ** 2, 1),
+                "presupuesto_mb": round(self.memoria_bytes / 1024 ** 2, 1),
+            }
@@ -0,0 +1,153 @@
+import multiprocessing
+import threading
+from concurrent.futures import CancelledError, Future, InvalidStateError, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable
+
+import pandas as pd
+
+import cache_lecturas
+
+
+def _compactar_resultado(resultado: Any) -> Any:
+    """DataFrames (también dentro de una tupla/lista) con texto repetitivo como category, para
+    que el pickle de vuelta al proceso de la UI sea chico"""
+    if isinstance(resultado, pd.DataFrame):
+        return ("__df__",) + cache_lecturas.compactar(resultado)
+    if isinstance(resultado, (tuple, list)):
+        return type(resultado)(_compactar_resultado(r) for r in resultado)
+    return resultado
+
+
+def _expandir_resultado(resultado: Any) -> Any:
+    if isinstance(resultado, tuple) and len(resultado) == 3 and resultado[0] == "__df__":
+        return cache_lecturas.expandir(resultado[1], resultado[2])
+    if isinstance(resultado, (tuple, list)):
+        return type(resultado)(_expandir_resultado(r) for r in resultado)
+    return resultado
+
+
+def _resolver(futuro: Future, resultado: Any = None, error: BaseException | None = None) -> None:
+    """Completa el Future si nadie lo completó antes (la cancelación y el worker compiten)"""
+    try:
+        if error is not None:
+            futuro.set_exception(error)
+        else:
+            futuro.set_result(resultado)
+    except InvalidStateError:
+        pass
+
+
+def _en_worker(funcion: Callable[..., Any], args: tuple, kwargs: dict) -> Any:
+    return _compactar_resultado(funcion(*args, **kwargs))
+
+
+class PoolProcesos:
+    """Pool de procesos del servidor para las etapas pesadas de CPU (parseo, validación, conciliación).
+
+    Así el GIL del proceso de Streamlit queda libre para las páginas de los demás operadores.
+    Cada tarea se registra bajo una clave (el session_id) y `cancelar(clave)` la corta al cerrar
+    la sesión: las que esperan en cola no llegan a correr y las que ya corren dejan de esperarse
+    (su resultado se descarta). A lo sumo `max_en_vuelo` tareas entre cola y ejecución; quien
+    envía más espera su turno. Con `max_procesos <= 0` todo corre en el proceso actual.
+    """
+
+    def __init__(self, max_procesos: int, max_en_vuelo: int | None = None):
+        self.max_procesos = max_procesos
+        self._cupos = threading.BoundedSemaphore(max_en_vuelo or 2 * max(1, max_procesos))
+        self._pool: ProcessPoolExecutor | None = None
+        self._tareas: dict[str | None, dict[Future, Future]] = {}   # clave -> {tarea del pool: resultado}
+        self._lock = threading.Lock()
+
+    def _ejecutor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                # spawn: el servidor de Streamlit tiene hilos vivos y un fork podría heredar locks tomados
+                self._pool = ProcessPoolExecutor(max_workers=self.max_procesos,
+                                                 mp_context=multiprocessing.get_context("spawn"))
+            return self._pool
+
+    def _descartar_pool(self, pool: ProcessPoolExecutor) -> None:
+        """Un worker murió (p. ej. por memoria): el próximo envío levanta un pool nuevo"""
+        with self._lock:
+            if self._pool is pool:
+                self._pool = None
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    def enviar(self, clave: str | None, funcion: Callable[..., Any], *args, **kwargs) -> Future:
+        """Encola `funcion(*args, **kwargs)` en un worker. El Future trae el resultado compactado;
+        `ejecutar`/`mapear` lo devuelven expandido."""
+        resultado: Future = Future()
+        if self.max_procesos <= 0:
+            try:
+                resultado.set_result(funcion(*args, **kwargs))
+            except Exception as e:
+                resultado.set_exception(e)
+            return resultado
+
+        self._cupos.acquire()
+        try:
+            pool = self._ejecutor()
+            try:
+                tarea = pool.submit(_en_worker, funcion, args, kwargs)
+            except BrokenProcessPool:
+                self._descartar_pool(pool)
+                pool = self._ejecutor()
+                tarea = pool.submit(_en_worker, funcion, args, kwargs)
+        except BaseException:
+            # sin tarea no hay callback que devuelva el cupo
+            self._cupos.release()
+            raise
+        with self._lock:
+            self._tareas.setdefault(clave, {})[tarea] = resultado
+
+        def _terminada(t: Future) -> None:
+            self._cupos.release()
+            with self._lock:
+                propias = self._tareas.get(clave, {})
+                propias.pop(t, None)
+                if not propias:
+                    self._tareas.pop(clave, None)
+            if t.cancelled():
+                _resolver(resultado, error=CancelledError())
+            elif t.exception() is not None:
+                if isinstance(t.exception(), BrokenProcessPool):
+                    self._descartar_pool(pool)
+                _resolver(resultado, error=t.exception())
+            else:
+                _resolver(resultado, t.result())
+
+        tarea.add_done_callback(_terminada)
+        return resultado
+
+    def ejecutar(self, clave: str | None, funcion: Callable[..., Any], *args, **kwargs) -> Any:
+        """Corre `funcion` en un worker y espera el resultado (CancelledError si se canceló la clave)"""
+        return _expandir_resultado(self.enviar(clave, funcion, *args, **kwargs).result())
+
+    def ejecutar_compactado(self, clave: str | None, funcion: Callable[..., Any], *args,
+                            **kwargs) -> tuple[pd.DataFrame, dict]:
+        """Como `ejecutar` para una `funcion` que devuelve un DataFrame, pero lo entrega compactado tal
+        como lo armó el worker: (frame, dtypes originales), ver cache_lecturas.compactar"""
+        resultado = self.enviar(clave, funcion, *args, **kwargs).result()
+        if isinstance(resultado, pd.DataFrame):   # sin pool (max_procesos <= 0) no pasó por un worker
+            return cache_lecturas.compactar(resultado)
+        return resultado[1], resultado[2]
+
+    def mapear(self, clave: str | None, funcion: Callable[..., Any], lista_args: list[tuple]) -> list:
+        """`funcion(*args)` para cada tupla de `lista_args`, en paralelo; resultados en el mismo orden"""
+        futuros = [self.enviar(clave, funcion, *args) for args in lista_args]
+        return [_expandir_resultado(f.result()) for f in futuros]
+
+    def cancelar(self, clave: str | None) -> int:
+        """Cancela las tareas de la clave; devuelve cuántas se cortaron"""
+        with self._lock:
+            tareas = self._tareas.pop(clave, {})
+        for tarea, resultado in tareas.items():
+            tarea.cancel()
+            _resolver(resultado, error=CancelledError())
+        return len(tareas)
+
+    def en_vuelo(self) -> dict[str | None, int]:
+        """Tareas en cola o en ejecución por clave"""
+        with self._lock:
+            return {clave: len(tareas) for clave, tareas in self._tareas.items()}
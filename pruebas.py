@@ -1,7 +1,7 @@
 import streamlit as st
 import pandas as pd
-import requests
 from datetime import datetime
+import cliente_http
 
 WEBHOOK_URL = "https://infraestructura.app.n8n.cloud/webhook-test/rocketbot-callback"
 
@@ -45,7 +45,7 @@ if archivo:
         }
         
         with st.spinner("Enviando registros..."):
-            response = requests.post(WEBHOOK_URL, json=payload)
+            response = cliente_http.post_json(WEBHOOK_URL, payload)
         
         if response.status_code == 200:
             st.success(f"✅ {len(registros)} registros enviados correctamente")
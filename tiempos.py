@@ -0,0 +1,65 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+_lock_log = threading.Lock()
+
+
+class Medicion:
+    """Registra la duración de cada etapa de una corrida (lectura, parseo, payload, envío…).
+
+    Cada etapa guarda segundos, filas y bytes enviados/recibidos; la corrida completa se puede
+    volcar como JSON-lines con `guardar()` para analizarla fuera de la app.
+    """
+
+    def __init__(self, flujo: str, session_id: str | None, usuario: str | None = None):
+        self.flujo = flujo
+        self.session_id = session_id
+        self.usuario = usuario
+        self.inicio = datetime.now().isoformat(timespec="seconds")
+        self.etapas: list[dict] = []
+
+    @contextmanager
+    def etapa(self, nombre: str, filas: int | None = None):
+        """Mide el bloque; se pueden completar `filas`, `bytes_enviados` y `bytes_recibidos` en el dict devuelto"""
+        registro = {"etapa": nombre, "filas": filas, "bytes_enviados": None, "bytes_recibidos": None}
+        t0 = time.perf_counter()
+        try:
+            yield registro
+        finally:
+            registro["segundos"] = round(time.perf_counter() - t0, 4)
+            # Una etapa repetida (p. ej. re-subir un archivo antes de conciliar) reemplaza a la anterior
+            self.etapas = [e for e in self.etapas if e["etapa"] != nombre]
+            self.etapas.append(registro)
+
+    def total_segundos(self) -> float:
+        return round(sum(e["segundos"] for e in self.etapas), 4)
+
+    def registros(self) -> list[dict]:
+        """Una fila por etapa con los datos de la corrida"""
+        return [
+            {"session_id": self.session_id, "usuario": self.usuario, "flujo": self.flujo,
+             "inicio": self.inicio, **e}
+            for e in self.etapas
+        ]
+
+    def guardar(self, ruta: str) -> None:
+        """Agrega las etapas de la corrida al log JSON-lines (no interrumpe el flujo si falla)"""
+        if not ruta or not self.etapas:
+            return
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(ruta)), exist_ok=True)
+            lineas = "".join(json.dumps(r, ensure_ascii=False, default=str) + "\n" for r in self.registros())
+            with _lock_log, open(ruta, "a", encoding="utf-8") as f:
+                f.write(lineas)
+        except OSError:
+            pass
+
+
+def bytes_respuesta(response) -> tuple[int, int]:
+    """Bytes enviados (cuerpo del request) y recibidos (cuerpo de la respuesta) de un `requests.Response`"""
+    cuerpo = getattr(response.request, "body", None) or b""
+    return len(cuerpo), len(response.content or b"")
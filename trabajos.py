@@ -0,0 +1,87 @@
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable
+
+ESTADO_EN_COLA: str = "EN_COLA"
+ESTADO_EN_CURSO: str = "EN_CURSO"
+ESTADO_OK: str = "OK"
+ESTADO_ERROR: str = "ERROR"
+ESTADOS_TERMINALES: frozenset[str] = frozenset({ESTADO_OK, ESTADO_ERROR})
+
+
+class GestorTrabajos:
+    """Trabajos largos (conciliaciones, envíos a n8n) que corren fuera del hilo del script.
+
+    `enviar()` devuelve el id del trabajo al instante; la UI consulta su estado con `obtener()`.
+    Los trabajos quedan indexados por session_id y por usuario, así una recarga del navegador o
+    un nuevo login puede re-engancharse con `ultimo()` sin volver a subir los archivos. Los
+    trabajos terminados se descartan pasados `retencion_segundos`.
+    """
+
+    def __init__(self, max_hilos: int = 4, retencion_segundos: float = 6 * 3600):
+        self.retencion_segundos = retencion_segundos
+        self._trabajos: dict[str, dict] = {}
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=max_hilos, thread_name_prefix="trabajo")
+
+    def enviar(self, tipo: str, session_id: str | None, usuario: str | None,
+               funcion: Callable[..., Any], *args, extra: dict | None = None, **kwargs) -> str:
+        """Encola `funcion(*args, **kwargs)`; su valor de retorno queda como resultado del trabajo.
+        `extra` viaja con el trabajo para quien lo recoja (p. ej. la medición de tiempos)."""
+        self._purgar()
+        trabajo_id = uuid.uuid4().hex
+        with self._lock:
+            self._trabajos[trabajo_id] = {
+                "id":         trabajo_id,
+                "tipo":       tipo,
+                "session_id": session_id,
+                "usuario":    usuario,
+                "estado":     ESTADO_EN_COLA,
+                "resultado":  None,
+                "error":      None,
+                "extra":      extra or {},
+                "creado":     time.time(),
+                "inicio":     None,
+                "fin":        None,
+            }
+        self._pool.submit(self._ejecutar, trabajo_id, funcion, args, kwargs)
+        return trabajo_id
+
+    def _ejecutar(self, trabajo_id: str, funcion: Callable[..., Any], args: tuple, kwargs: dict) -> None:
+        with self._lock:
+            self._trabajos[trabajo_id].update(estado=ESTADO_EN_CURSO, inicio=time.time())
+        try:
+            resultado = funcion(*args, **kwargs)
+        except Exception as e:
+            with self._lock:
+                self._trabajos[trabajo_id].update(estado=ESTADO_ERROR, error=str(e) or type(e).__name__,
+                                                  fin=time.time())
+            return
+        with self._lock:
+            self._trabajos[trabajo_id].update(estado=ESTADO_OK, resultado=resultado, fin=time.time())
+
+    def obtener(self, trabajo_id: str) -> dict | None:
+        """Copia del estado del trabajo (None si no existe o ya se descartó)"""
+        with self._lock:
+            trabajo = self._trabajos.get(trabajo_id)
+            return dict(trabajo) if trabajo is not None else None
+
+    def ultimo(self, tipo: str, session_id: str | None, usuario: str | None) -> dict | None:
+        """Último trabajo del tipo para la sesión; si la sesión no tiene, el último del usuario"""
+        with self._lock:
+            candidatos = [t for t in self._trabajos.values() if t["tipo"] == tipo]
+        for filtro in (lambda t: session_id is not None and t["session_id"] == session_id,
+                       lambda t: usuario is not None and t["usuario"] == usuario):
+            propios = [t for t in candidatos if filtro(t)]
+            if propios:
+                return dict(max(propios, key=lambda t: t["creado"]))
+        return None
+
+    def _purgar(self) -> None:
+        limite = time.time() - self.retencion_segundos
+        with self._lock:
+            for trabajo_id in [i for i, t in self._trabajos.items()
+                               if t["estado"] in ESTADOS_TERMINALES and t["fin"] < limite]:
+                del self._trabajos[trabajo_id]
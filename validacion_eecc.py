@@ -0,0 +1,157 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+import config
+
+
+def _validar_columnas_eecc(df, banco_codigo):
+    """Valida el EECC con máscaras por columna y arma la lista de errores (fila/columna/valor/motivo).
+    Los errores salen en el mismo orden que la validación fila por fila: por fila y, dentro de
+    cada fila, en el orden de las reglas.
+    """
+    def _col(nombre):
+        if nombre in df.columns:
+            return df[nombre]
+        return pd.Series(None, index=df.index, dtype=object)
+
+    reglas = []  # (columna, valores, máscara, motivo)
+
+    operacion_id = _col("operacion_id")
+    reglas.append(("operacion_id", operacion_id, operacion_id.isna(), "Campo obligatorio ausente"))
+
+    fecha = _col("fecha_operacion")
+    fecha_nula = fecha.isna()
+    fecha_invalida = ~fecha_nula & pd.to_datetime(fecha, errors="coerce", format="mixed").isna()
+    reglas.append(("fecha_operacion", fecha, fecha_nula, "Campo obligatorio ausente"))
+    reglas.append(("fecha_operacion", fecha, fecha_invalida, "No es una fecha válida"))
+
+    monto = _col("amount")
+    monto_nulo = monto.isna()
+    monto_num = pd.to_numeric(monto, errors="coerce")
+    monto_no_numerico = ~monto_nulo & monto_num.isna()
+    reglas.append(("amount", monto, monto_nulo, "Campo obligatorio ausente"))
+    reglas.append(("amount", monto, monto_no_numerico, "No es un valor numérico"))
+    reglas.append(("amount", monto, monto_num.le(0), "Debe ser mayor a 0"))
+
+    moneda = _col("moneda")
+    moneda_ok = moneda.astype(str).str.fullmatch(r"[A-Z]{3}").fillna(False).astype(bool)
+    reglas.append(("moneda", moneda, moneda.isna() | ~moneda_ok,
+                   "Debe ser exactamente 3 letras mayúsculas"))
+
+    psptin = _col("psptin")
+    esperado = 28 if banco_codigo == "GMONEY" else 12
+    psptin_str = psptin.astype(str).str.strip()
+    psptin_ok = (psptin_str.str.isdigit() & psptin_str.str.len().eq(esperado)).fillna(False).astype(bool)
+    reglas.append(("psptin", psptin, psptin.notna() & ~psptin_ok,
+                   f"Debe tener exactamente {esperado} dígitos para {banco_codigo}"))
+
+    # Juntar las posiciones marcadas por cada regla y ordenarlas como fila → regla
+    nros = np.asarray(df.index) + 2
+    posiciones, ordenes, columnas, valores, motivos = [], [], [], [], []
+    for orden, (columna, serie, mascara, motivo) in enumerate(reglas):
+        pos = np.flatnonzero(mascara.to_numpy(dtype=bool))
+        if not len(pos):
+            continue
+        posiciones.append(pos)
+        ordenes.append(np.full(len(pos), orden))
+        columnas.extend([columna] * len(pos))
+        valores.extend(serie.to_numpy(dtype=object)[pos].tolist())
+        motivos.extend([motivo] * len(pos))
+
+    if not posiciones:
+        return []
+
+    posiciones = np.concatenate(posiciones)
+    orden_final = np.lexsort((np.concatenate(ordenes), posiciones))
+    filas = nros[posiciones].tolist()
+    return [
+        {"fila": filas[k], "columna": columnas[k], "valor": valores[k], "motivo": motivos[k]}
+        for k in orden_final.tolist()
+    ]
+
+def validar_y_mapear_eecc(df, banco_codigo, ciclo, ahora=None):
+    """Valida el EECC subido y lo mapea al esquema eecc_unificado.
+    `ahora` (hora de Lima, sin tz) fija la ventana a validar; por defecto la hora actual.
+    """
+    # Verificar que el banco tiene mapeo definido
+    if banco_codigo not in config.COLUMNAS_BANCO:
+        return df, [{"fila": "-", "columna": banco_codigo, "valor": None,
+                     "motivo": "Banco sin mapeo de columnas definido — contactar al equipo técnico"}]
+
+    mapa = config.COLUMNAS_BANCO[banco_codigo]
+
+    # Columnas que deben venir del archivo (valor != None)
+    cols_archivo = {k: v for k, v in mapa.items() if v is not None}
+
+    # Verificar columnas nativas requeridas
+    df.columns = df.columns.str.strip()
+    if banco_codigo in config.PREPROCESADORES_BANCO:
+        try:
+            df = config.PREPROCESADORES_BANCO[banco_codigo](df)
+        except ValueError as e:
+            return df, [{"fila": "-", "columna": "preprocesador", "valor": None, "motivo": str(e)}]
+    faltantes = [v for v in cols_archivo.values() if v not in df.columns]
+    if faltantes:
+        cols_reales = ", ".join(str(c) for c in df.columns.tolist())
+        return df, [{"fila": "-", "columna": ", ".join(faltantes), "valor": None,
+                     "motivo": f"Columnas requeridas ausentes. Columnas reales del archivo: {cols_reales}"}]
+
+    # Renombrar al esquema eecc_unificado
+    df = df.rename(columns={v: k for k, v in cols_archivo.items()})
+
+    # Agregar columnas hardcodeadas
+    df["banco_codigo"]  = ciclo["banco_codigo"]
+    df["cuenta_origen"] = ciclo.get("cuenta_origen")
+    df["pais"]          = "PE"
+
+    # Ventana dinámica: hora anterior a la hora actual en Lima
+    if ahora is None:
+        ahora = datetime.now(config.TIMEZONE).replace(tzinfo=None)
+    hora_fin    = ahora.replace(minute=0, second=0, microsecond=0)
+    hora_inicio = hora_fin - timedelta(hours=1)
+
+    df["_datetime_op"] = pd.to_datetime(
+        df["fecha_operacion"].astype(str).str.strip(),
+        dayfirst=True, errors="coerce"
+    )
+
+    df = df[(df["_datetime_op"] >= hora_inicio) & (df["_datetime_op"] < hora_fin)].copy()
+    df["fecha_operacion"] = df["_datetime_op"].dt.strftime("%Y-%m-%d %H:%M:%S")
+    df = df.drop(columns=["_datetime_op"], errors="ignore")
+
+    if df.empty:
+        return df, [{"fila": "-", "columna": "ventana",
+                     "valor": f"{ciclo['ventana_inicio']} → {ciclo['ventana_fin']}",
+                     "motivo": "Ningún registro del archivo corresponde a la fecha de esta ventana"}]
+
+    # Validar columna a columna
+    errores = _validar_columnas_eecc(df, banco_codigo)
+
+    COLUMNAS_EECC = [
+        # esquema eecc_unificado
+        "banco_codigo", "cuenta_origen", "operacion_id",
+        "pais", "fecha_operacion", "amount", "moneda", "psptin",
+        # passthrough → n8n los necesita
+        "created_at", "updated_at", "origin_name", "origin_type",
+        "origin_document", "operation", "fee", "status",
+    ]
+    df_mapeado = df[[col for col in COLUMNAS_EECC if col in df.columns]]
+    return df_mapeado, errores
+
+
+def payload_eecc(df_mapeado, ciclo, operador):
+    """Arma el cuerpo del webhook de carga manual de EECC (operaciones como CSV en `contenido`)"""
+    df_send = df_mapeado.rename(columns={"operacion_id": "instruction_id"})
+    return {
+        "ciclo_id":       ciclo["ciclo_id"],
+        "banco_codigo":   ciclo["banco_codigo"],
+        "cuenta_origen":  ciclo.get("cuenta_origen") or ciclo.get("cuenta"),
+        "origen_ingesta": "MANUAL",
+        "status":         "success",
+        "error_code":     "",
+        "total_records":  str(len(df_mapeado)),
+        "operador":       operador,
+        "contenido":      df_send.to_csv(index=False),
+    }